@@ -0,0 +1,68 @@
+"""
+Benchmark for the cost of importing the package, from `python -X importtime`.
+
+Each statement runs in a fresh interpreter. Its cost is the time spent importing
+modules an empty interpreter doesn't already import on startup, and the median
+over the runs is reported along with the modules it spent most of that time on.
+
+Usage:
+
+  uv run python benchmarks/import_time.py
+  uv run python benchmarks/import_time.py --repeat 10 --top 10 \
+    "from pydantic_ai_chat_ui.messages.full import UIMessage"
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+DEFAULT_STATEMENTS = [
+  "import pydantic_ai_chat_ui",
+  "from pydantic_ai_chat_ui import ChatRequest",
+  "from pydantic_ai_chat_ui.messages.full import from_pydantic_ai_messages",
+  "from pydantic_ai_chat_ui import stream_results",
+]
+
+
+def import_times(statement: str) -> dict[str, int]:
+  """Microseconds spent importing each module, excluding its own imports."""
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", statement],
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  times = {}
+  for line in result.stderr.splitlines():
+    if not line.startswith("import time:") or "self [us]" in line:
+      continue
+    self_us, _, name = line.removeprefix("import time:").split("|")
+    times[name.strip()] = int(self_us)
+  return times
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("statements", nargs="*", default=DEFAULT_STATEMENTS)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--top", type=int, default=5, help="slowest modules shown")
+  args = parser.parse_args()
+
+  startup = import_times("pass").keys()
+  for statement in args.statements:
+    runs = [import_times(statement) for _ in range(args.repeat)]
+    runs = [{k: v for k, v in run.items() if k not in startup} for run in runs]
+    total = statistics.median(sum(run.values()) for run in runs) / 1e3
+    print(f"{total:8.1f}ms  {statement}  ({len(runs[-1])} modules)")
+
+    slowest = Counter()
+    for run in runs:
+      slowest.update(run)
+    for name, us in slowest.most_common(args.top):
+      print(f"{us / len(runs) / 1e3:14.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+  main()
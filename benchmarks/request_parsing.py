@@ -0,0 +1,134 @@
+"""
+Benchmark for parsing `ChatRequest` bodies as sent by `useChat`.
+
+`useChat` sends the whole conversation with every turn, so request parsing grows
+with the thread. This times the discriminated `UIMessagePart` union against the
+plain union it replaced, for requests of growing size, validating either from a
+dict (as after `json.loads`) or straight from the raw bytes, and against
+`LazyChatRequest`, which only validates the last message.
+
+Usage:
+
+  uv run python benchmarks/request_parsing.py
+  uv run python benchmarks/request_parsing.py --messages 10 100 1000 --repeat 20
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any
+
+from pydantic import BaseModel
+
+from pydantic_ai_chat_ui.messages.full import (
+  AnyPart,
+  ArtifactPart,
+  EventPart,
+  FilePart,
+  MessageRole,
+  SourcesPart,
+  SuggestionPart,
+  TextPart,
+)
+from pydantic_ai_chat_ui.requests import (
+  CHAT_REQUEST_ADAPTER,
+  LAZY_CHAT_REQUEST_ADAPTER,
+)
+
+
+class PlainUnionMessage(BaseModel):
+  id: str
+  role: MessageRole
+  parts: list[
+    TextPart
+    | FilePart
+    | ArtifactPart
+    | EventPart
+    | SourcesPart
+    | SuggestionPart
+    | AnyPart
+  ]
+
+
+class PlainUnionRequest(BaseModel):
+  id: Any = None
+  messages: list[PlainUnionMessage]
+
+
+def build_request(messages: int) -> dict:
+  thread = []
+  for i in range(messages):
+    if i % 2 == 0:
+      parts = [{"type": "text", "id": f"t{i}", "text": f"question {i} " * 10}]
+      thread.append({"id": f"m{i}", "role": "user", "parts": parts})
+      continue
+
+    parts = [
+      {
+        "type": "data-event",
+        "id": f"e{i}",
+        "data": {"title": "Searching documents", "status": "success"},
+      },
+      {
+        "type": "data-sources",
+        "id": f"s{i}",
+        "data": {
+          "sources": [
+            {"id": f"n{i}-{n}", "url": f"https://example.com/{n}"} for n in range(3)
+          ]
+        },
+      },
+      {"type": "text", "id": f"t{i}", "text": f"answer {i} " * 40},
+      {
+        "type": "data-suggested_questions",
+        "id": f"q{i}",
+        "data": {"questions": ["and then?", "why?"]},
+      },
+      {"type": "data-custom", "id": f"c{i}", "data": {"value": i}},
+    ]
+    thread.append({"id": f"m{i}", "role": "assistant", "parts": parts})
+  return {"id": "chat", "messages": thread}
+
+
+def timed(parse, payload, repeat: int) -> float:
+  parse(payload)
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    parse(payload)
+    times.append(time.perf_counter() - start)
+  return statistics.median(times) * 1e3
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 1000])
+  parser.add_argument("--repeat", type=int, default=10)
+  args = parser.parse_args()
+
+  print(f"{'messages':>8} {'plain dict':>12} {'dict':>12} {'bytes':>12} {'lazy':>12}")
+  for messages in args.messages:
+    request = build_request(messages)
+    body = json.dumps(request).encode()
+
+    plain = timed(
+      lambda body: PlainUnionRequest.model_validate(json.loads(body)),
+      body,
+      args.repeat,
+    )
+    from_dict = timed(
+      lambda body: CHAT_REQUEST_ADAPTER.validate_python(json.loads(body)),
+      body,
+      args.repeat,
+    )
+    from_bytes = timed(CHAT_REQUEST_ADAPTER.validate_json, body, args.repeat)
+    lazy = timed(LAZY_CHAT_REQUEST_ADAPTER.validate_json, body, args.repeat)
+    print(
+      f"{messages:>8} {plain:>10.2f}ms {from_dict:>10.2f}ms "
+      f"{from_bytes:>10.2f}ms {lazy:>10.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,294 @@
+"""
+Offline benchmark for the `stream_results` adapter.
+
+Drives a real `Agent` with a scripted `FunctionModel`, so no network or API keys
+are needed, and measures what the adapter adds on top of the bare agent run:
+
+- events/sec: frames yielded per second of wall time
+- adapter CPU per token: CPU time of the adapter run minus a baseline run that
+  consumes the same agent events without the adapter, divided by tokens, the
+  chunks the model streams (text, or the arguments of an artifact, which is
+  streamed with `ArtifactStreaming`). Runs are paired with a baseline each, and
+  the median difference reported
+- time to first frame
+- peak traced memory (measured in a separate pass, as tracing skews timings)
+
+Usage:
+
+  uv run python benchmarks/streaming.py --output bench.json
+  uv run python benchmarks/streaming.py --tokens 5000 --fan-out 16 \
+    --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass
+from importlib.metadata import version
+from pathlib import Path
+
+from pydantic_ai import Agent
+from pydantic_ai import messages as pydantic_ai_messages
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_chat_ui.artifacts import ArtifactStreaming
+from pydantic_ai_chat_ui.coalescing import Coalescing
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.shared import CodeArtifactData
+from pydantic_ai_chat_ui.streaming import StreamOptions, stream_results
+
+# tokens of scenarios not given any, enough for the CPU difference to be signal
+DEFAULT_TOKENS = 1_000
+
+
+@dataclass(frozen=True)
+class Scenario:
+  name: str
+  tokens: int = DEFAULT_TOKENS
+  fan_out: int = 0
+  artifact_size: int = 0
+
+
+@dataclass
+class Result:
+  scenario: str
+  frames: int
+  bytes: int
+  events_per_sec: float
+  adapter_cpu_per_token_us: float
+  time_to_first_frame_ms: float
+  wall_ms: float
+  peak_memory_kib: float
+
+
+DEFAULT_SCENARIOS = [
+  Scenario("text", tokens=2_000),
+  Scenario("tools", tokens=200, fan_out=8),
+  # ~100 characters a chunk, streamed like the text
+  Scenario("artifact", tokens=2_000, artifact_size=200_000),
+]
+
+
+def build_agent(scenario: Scenario) -> Agent[None, str | CodeArtifactData]:
+  async def stream(
+    messages: list[pydantic_ai_messages.ModelMessage], info: AgentInfo
+  ) -> AsyncIterator[str | dict[int, DeltaToolCall]]:
+    tools_called = any(
+      isinstance(part, pydantic_ai_messages.ToolReturnPart)
+      for message in messages
+      for part in message.parts
+    )
+
+    if scenario.fan_out and not tools_called:
+      yield {
+        i: DeltaToolCall(name=f"tool_{i}", json_args="{}", tool_call_id=f"call_{i}")
+        for i in range(scenario.fan_out)
+      }
+      return
+
+    if scenario.artifact_size:
+      args = json.dumps(
+        {"file_name": "x.py", "code": "x" * scenario.artifact_size, "language": "py"}
+      )
+      chunk = -(-len(args) // scenario.tokens)
+      name = info.output_tools[0].name
+      yield {0: DeltaToolCall(name=name, tool_call_id="artifact")}
+      for start in range(0, len(args), chunk):
+        yield {0: DeltaToolCall(json_args=args[start : start + chunk])}
+      return
+
+    for i in range(scenario.tokens):
+      yield f"token{i} "
+
+  output_type = [str, CodeArtifactData] if scenario.artifact_size else str
+  agent = Agent(FunctionModel(stream_function=stream), output_type=output_type)
+
+  for i in range(scenario.fan_out):
+
+    @agent.tool_plain(name=f"tool_{i}")
+    def tool() -> str:
+      return "ok"
+
+  return agent
+
+
+USER_MESSAGE = UIMessage(
+  id="bench", role=MessageRole.USER, parts=[TextPart(id="bench", text="go")]
+)
+
+
+async def run_baseline(agent: Agent) -> float:
+  """CPU seconds spent running the agent and draining its events, no adapter."""
+  start = time.process_time()
+  async with agent.iter("go") as agent_run:
+    async for node in agent_run:
+      if Agent.is_model_request_node(node) or Agent.is_call_tools_node(node):
+        async with node.stream(agent_run.ctx) as stream:
+          async for _ in stream:
+            pass
+  return time.process_time() - start
+
+
+async def run_adapter(
+  agent: Agent, options: StreamOptions
+) -> tuple[float, float, float, int, int]:
+  frames = 0
+  size = 0
+  first_frame = None
+  start_wall = time.perf_counter()
+  start_cpu = time.process_time()
+
+  async for frame in stream_results(
+    USER_MESSAGE, agent, None, message_history=[], **options
+  ):
+    if first_frame is None:
+      first_frame = time.perf_counter() - start_wall
+    frames += 1
+    size += len(frame.encode())
+
+  wall = time.perf_counter() - start_wall
+  return time.process_time() - start_cpu, wall, first_frame or wall, frames, size
+
+
+async def peak_memory(agent: Agent, options: StreamOptions) -> float:
+  tracemalloc.start()
+  try:
+    async for _ in stream_results(
+      USER_MESSAGE, agent, None, message_history=[], **options
+    ):
+      pass
+    return tracemalloc.get_traced_memory()[1] / 1024
+  finally:
+    tracemalloc.stop()
+
+
+async def bench(scenario: Scenario, repeat: int, coalesce: Coalescing | None) -> Result:
+  agent = build_agent(scenario)
+  options: StreamOptions = {"coalesce": coalesce}
+  if scenario.artifact_size:
+    options["artifacts"] = ArtifactStreaming()
+
+  # warm up schemas, caches and imports
+  await run_baseline(agent)
+  await run_adapter(agent, options)
+
+  # paired, so drift over the runs cancels out of each difference
+  baselines, runs = [], []
+  for _ in range(repeat):
+    baselines.append(await run_baseline(agent))
+    runs.append(await run_adapter(agent, options))
+
+  adapter_cpu = statistics.median(
+    r[0] - b for r, b in zip(runs, baselines, strict=True)
+  )
+  wall = statistics.median(r[1] for r in runs)
+  first_frame = statistics.median(r[2] for r in runs)
+  frames, size = runs[-1][3], runs[-1][4]
+  tokens = scenario.tokens
+
+  return Result(
+    scenario=scenario.name,
+    frames=frames,
+    bytes=size,
+    events_per_sec=frames / wall,
+    adapter_cpu_per_token_us=adapter_cpu / tokens * 1e6,
+    time_to_first_frame_ms=first_frame * 1e3,
+    wall_ms=wall * 1e3,
+    peak_memory_kib=await peak_memory(agent, options),
+  )
+
+
+def git_commit() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"],
+      capture_output=True,
+      text=True,
+      check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def compare(results: list[Result], baseline_path: Path) -> None:
+  baseline = json.loads(baseline_path.read_text())
+  previous = {r["scenario"]: r for r in baseline["results"]}
+  print(f"\ncompared to {baseline.get('commit')} ({baseline_path}):")
+
+  for result in results:
+    before = previous.get(result.scenario)
+    if before is None:
+      continue
+    for metric, value in asdict(result).items():
+      if metric == "scenario" or not before.get(metric):
+        continue
+      change = (value - before[metric]) / abs(before[metric]) * 100
+      print(f"  {result.scenario:>10} {metric:<26} {change:+7.1f}%")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument(
+    "--tokens", type=int, help="chunks per answer, of text or artifact arguments"
+  )
+  parser.add_argument("--fan-out", type=int, default=0, help="tool calls per turn")
+  parser.add_argument("--artifact-size", type=int, default=0, help="artifact chars")
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--coalesce-window", type=float, help="enable coalescing")
+  parser.add_argument("--output", type=Path, help="write results as JSON")
+  parser.add_argument("--compare", type=Path, help="previous JSON results")
+  args = parser.parse_args()
+
+  scenarios = DEFAULT_SCENARIOS
+  if args.tokens is not None or args.fan_out or args.artifact_size:
+    scenarios = [
+      Scenario(
+        "custom",
+        tokens=args.tokens or DEFAULT_TOKENS,
+        fan_out=args.fan_out,
+        artifact_size=args.artifact_size,
+      )
+    ]
+
+  coalesce = None
+  if args.coalesce_window is not None:
+    coalesce = Coalescing(window=args.coalesce_window)
+
+  results = [asyncio.run(bench(s, args.repeat, coalesce)) for s in scenarios]
+
+  for result in results:
+    print(
+      f"{result.scenario:>10}: {result.frames} frames, "
+      f"{result.events_per_sec:,.0f} events/s, "
+      f"{result.adapter_cpu_per_token_us:.1f}us adapter CPU/token, "
+      f"first frame {result.time_to_first_frame_ms:.2f}ms, "
+      f"peak {result.peak_memory_kib:,.0f}KiB"
+    )
+
+  if args.compare is not None:
+    compare(results, args.compare)
+
+  if args.output is not None:
+    args.output.write_text(
+      json.dumps(
+        {
+          "commit": git_commit(),
+          "python": platform.python_version(),
+          "pydantic_ai": version("pydantic-ai-slim"),
+          "coalesce_window": args.coalesce_window,
+          "results": [asdict(r) for r in results],
+        },
+        indent=2,
+      )
+      + "\n"
+    )
+
+
+if __name__ == "__main__":
+  main()
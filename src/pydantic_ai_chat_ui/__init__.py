@@ -1,7 +1,54 @@
-from pydantic_ai_chat_ui.requests import ChatRequest
-from pydantic_ai_chat_ui.streaming import stream_results
+"""
+Exports are loaded on first use, so e.g. handling requests doesn't import the
+agent machinery `stream_results` needs.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+  from pydantic_ai_chat_ui.requests import (
+    ChatRequest,
+    LazyChatRequest,
+    RequestLimits,
+    RequestTooLarge,
+    parse_chat_request,
+    parse_lazy_chat_request,
+  )
+  from pydantic_ai_chat_ui.streaming import stream_results, stream_results_bytes
+
+_EXPORTS = {
+  "stream_results": "pydantic_ai_chat_ui.streaming",
+  "stream_results_bytes": "pydantic_ai_chat_ui.streaming",
+  "ChatRequest": "pydantic_ai_chat_ui.requests",
+  "parse_chat_request": "pydantic_ai_chat_ui.requests",
+  "LazyChatRequest": "pydantic_ai_chat_ui.requests",
+  "parse_lazy_chat_request": "pydantic_ai_chat_ui.requests",
+  "RequestLimits": "pydantic_ai_chat_ui.requests",
+  "RequestTooLarge": "pydantic_ai_chat_ui.requests",
+}
 
 __all__ = [
   "stream_results",
+  "stream_results_bytes",
   "ChatRequest",
+  "parse_chat_request",
+  "LazyChatRequest",
+  "parse_lazy_chat_request",
+  "RequestLimits",
+  "RequestTooLarge",
 ]
+
+
+def __getattr__(name: str) -> Any:
+  module = _EXPORTS.get(name)
+  if module is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+  value = getattr(importlib.import_module(module), name)
+  globals()[name] = value
+  return value
+
+
+def __dir__() -> list[str]:
+  return sorted([*globals(), *__all__])
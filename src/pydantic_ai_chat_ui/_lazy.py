@@ -0,0 +1,20 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+  """
+  Stands in for a module until one of its attributes is used. Importing
+  `pydantic_ai` loads the whole agent machinery, which code only handling
+  requests or converting messages shouldn't pay for up front.
+  """
+
+  def __init__(self, name: str):
+    super().__init__(name)
+    self.__module: ModuleType | None = None
+
+  def __getattr__(self, name: str) -> Any:
+    if self.__module is None:
+      self.__module = importlib.import_module(self.__name__)
+    return getattr(self.__module, name)
@@ -0,0 +1,84 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import aclosing, suppress
+from typing import Protocol
+
+
+class _End:
+  """Sentinel marking the end of a pumped iterator."""
+
+
+_END = _End()
+
+
+class PumpQueue[T](Protocol):
+  """
+  Queue interface a `Pump` writes into. Besides items, the pump puts the `_END`
+  sentinel and producer exceptions, which must always be accepted.
+  """
+
+  async def put(self, item: T | _End | Exception) -> None: ...
+
+  async def get(self) -> T | _End | Exception: ...
+
+
+class Pump[T]:
+  """
+  Drives an async iterator from a single dedicated task into a queue.
+
+  Agent runs hold context managers (tool sets, spans, context vars) that must be
+  entered and exited from the same task, so anything that needs to wait on the
+  run with a timeout reads from the pump instead of stepping the iterator from
+  short-lived tasks.
+  """
+
+  def __init__(
+    self,
+    source: AsyncIterator[T],
+    maxsize: int = 0,
+    queue: PumpQueue[T] | None = None,
+  ):
+    self.queue: PumpQueue[T] = asyncio.Queue(maxsize) if queue is None else queue
+    self._done = False
+    self._task = asyncio.create_task(self._run(source))
+
+  async def _run(self, source: AsyncIterator[T]) -> None:
+    try:
+      async with aclosing(source) as items:
+        async for item in items:
+          await self.queue.put(item)
+    except Exception as e:
+      await self.queue.put(e)
+    else:
+      await self.queue.put(_END)
+
+  @property
+  def running(self) -> bool:
+    return not self._task.done()
+
+  async def get(self, timeout: float | None = None) -> T:
+    """
+    Returns the next item, raising `TimeoutError` if none arrives within
+    `timeout` seconds and `StopAsyncIteration` once the source is exhausted.
+    """
+    if self._done:
+      raise StopAsyncIteration
+
+    if timeout is None:
+      item = await self.queue.get()
+    else:
+      item = await asyncio.wait_for(self.queue.get(), max(timeout, 0))
+
+    if isinstance(item, _End):
+      self._done = True
+      raise StopAsyncIteration
+    if isinstance(item, BaseException):
+      self._done = True
+      raise item
+    return item
+
+  async def aclose(self) -> None:
+    if not self._task.done():
+      self._task.cancel()
+    with suppress(asyncio.CancelledError):
+      await self._task
@@ -0,0 +1,251 @@
+"""
+Code and document artifacts streamed while the model writes them, rather than
+only once the whole output is generated and validated.
+
+Artifacts are output by calling an output tool, so its arguments are parsed as
+they stream in and sent as updates of the artifact. chat-ui replaces a data part
+with the same id wholesale, so every update carries the content so far. Updates
+are rate capped, in bytes as well as in time, so the bytes sent grow with the
+time the artifact takes rather than quadratically with its length. The
+validated artifact is sent last, under the same id.
+
+With `ArtifactChunking`, the validated artifact leaves out content over a frame:
+it's sent first in transient `data-artifact_chunk` parts, which the client gets
+in `onData` and reassembles, and the artifact references it by hash. Content the
+client has already, e.g. from a previous answer, isn't sent again at all.
+"""
+
+import math
+import time
+from collections.abc import Container, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from json.encoder import encode_basestring
+from typing import TYPE_CHECKING, Any
+
+from pydantic import ValidationError
+
+from pydantic_ai_chat_ui.messages.shared import (
+  ArtifactRef,
+  ArtifactType,
+  artifact_content,
+  content_hash,
+  without_content,
+)
+from pydantic_ai_chat_ui.messages.streamed import (
+  ArtifactChunk,
+  ArtifactChunkPart,
+  ArtifactPart,
+  CodeArtifact,
+  CodeArtifactData,
+  DocumentArtifact,
+  DocumentArtifactData,
+)
+from pydantic_ai_chat_ui.tool_args import PartialJson
+
+if TYPE_CHECKING:
+  from pydantic_ai.tools import ToolDefinition
+
+
+@dataclass(frozen=True)
+class ArtifactStreaming:
+  """
+  Sends partial artifacts at most every `interval` seconds, and no more than
+  `rate` bytes of them a second.
+  """
+
+  interval: float = 0.1
+  rate: int = 256 * 1024
+
+
+@dataclass(frozen=True)
+class ArtifactChunking:
+  """
+  Keeps artifact frames around `frame_bytes`, sending longer content in chunks.
+  Content whose hash is in `known` is referenced rather than sent.
+  """
+
+  frame_bytes: int = 32 * 1024
+  known: Container[str] = frozenset()
+
+
+_OUTPUT_TYPES = {
+  CodeArtifactData.__name__: ArtifactType.CODE,
+  DocumentArtifactData.__name__: ArtifactType.DOCUMENT,
+}
+
+
+# the names pydantic ai gives output tools: `final_result` for a single output
+# type, or followed by the type's name with several
+ARTIFACT_TOOLS = frozenset(
+  {"final_result", *(f"final_result_{name}" for name in _OUTPUT_TYPES)}
+)
+
+
+def artifact_type(tool_def: "ToolDefinition | None") -> ArtifactType | None:
+  """The artifact an output tool outputs, if it outputs one."""
+  if tool_def is None or tool_def.kind != "output":
+    return None
+  return _OUTPUT_TYPES.get(tool_def.parameters_json_schema.get("title", ""))
+
+
+def artifact_data(
+  args: dict[str, Any],
+) -> CodeArtifactData | DocumentArtifactData | None:
+  """
+  The artifact complete arguments of an artifact output tool output, e.g. from
+  history, which has no tool definitions: arguments of exactly an artifact's
+  shape.
+  """
+  for data_type in (CodeArtifactData, DocumentArtifactData):
+    if not args.keys() <= data_type.model_fields.keys():
+      continue
+    try:
+      return data_type.model_validate(args)
+    except ValidationError:
+      continue
+  return None
+
+
+def artifact(
+  data: CodeArtifactData | DocumentArtifactData, created_at: int | None = None
+) -> CodeArtifact | DocumentArtifact:
+  created_at = created_at or int(datetime.now().timestamp())
+  if isinstance(data, CodeArtifactData):
+    return CodeArtifact(data=data, created_at=created_at, type=ArtifactType.CODE)
+  return DocumentArtifact(data=data, created_at=created_at, type=ArtifactType.DOCUMENT)
+
+
+def artifact_part(
+  tool_call_id: str,
+  data: CodeArtifactData | DocumentArtifactData,
+  created_at: int | None = None,
+) -> ArtifactPart:
+  return ArtifactPart(id=tool_call_id, data=artifact(data, created_at))
+
+
+def _partial_data(
+  kind: ArtifactType, args: dict[str, Any]
+) -> CodeArtifactData | DocumentArtifactData:
+  """Artifact data from incomplete arguments, with fields not yet sent empty."""
+  if kind == ArtifactType.CODE:
+    return CodeArtifactData.model_construct(
+      file_name=str(args.get("file_name", "")),
+      code=str(args.get("code", "")),
+      language=str(args.get("language", "")),
+    )
+  sources = args.get("sources")
+  return DocumentArtifactData.model_construct(
+    title=str(args.get("title", "")),
+    content=str(args.get("content", "")),
+    type=str(args.get("type", "")),
+    sources=sources if isinstance(sources, list) else None,
+  )
+
+
+class _Artifact:
+  def __init__(self, kind: ArtifactType):
+    self.kind = kind
+    self.json = PartialJson()
+    self.created_at = int(datetime.now().timestamp())
+    self.sent: dict[str, Any] | None = None
+    self.next_at = -math.inf
+
+
+class ArtifactStream:
+  """The artifacts being output in a run, and when they may next be sent."""
+
+  def __init__(self, streaming: ArtifactStreaming):
+    self.streaming = streaming
+    self._artifacts: dict[str, _Artifact] = {}
+
+  def start(self, tool_call_id: str, kind: ArtifactType) -> None:
+    self._artifacts[tool_call_id] = _Artifact(kind)
+
+  def feed(
+    self, tool_call_id: str, args: str | dict[str, Any] | None
+  ) -> ArtifactPart | None:
+    """Adds to an artifact's arguments, returning an update if one is due."""
+    artifact = self._artifacts.get(tool_call_id)
+    if artifact is None or not args:
+      return None
+
+    if isinstance(args, dict):
+      # arguments sent as an object come in one go, the final artifact follows
+      return None
+    artifact.json.feed(args)
+
+    now = time.monotonic()
+    if now < artifact.next_at:
+      return None
+
+    value = artifact.json.value
+    if not isinstance(value, dict) or not value or value == artifact.sent:
+      return None
+
+    data = _partial_data(artifact.kind, value)
+    size = len(data.code if isinstance(data, CodeArtifactData) else data.content)
+    artifact.sent = value
+    artifact.next_at = now + max(self.streaming.interval, size / self.streaming.rate)
+    return artifact_part(tool_call_id, data, artifact.created_at)
+
+  def pop(self, tool_call_id: str) -> int | None:
+    """Forgets an artifact, returning when it was started."""
+    artifact = self._artifacts.pop(tool_call_id, None)
+    return artifact.created_at if artifact is not None else None
+
+
+# room for the rest of an artifact frame besides its content
+_FRAME_OVERHEAD = 1024
+
+
+def _escaped_size(text: str) -> int:
+  return len(encode_basestring(text).encode())
+
+
+def _split(content: str, size: int) -> Iterator[str]:
+  """Slices of `content` at most `size` bytes long once escaped for JSON."""
+  start = 0
+  while start < len(content):
+    piece = content[start : start + size]
+    escaped = _escaped_size(piece)
+    while escaped > size and len(piece) > 1:
+      # escapes and multi-byte characters grow it, shrink it proportionally
+      piece = piece[: max(len(piece) * size // escaped, 1)]
+      escaped = _escaped_size(piece)
+    yield piece
+    start += len(piece)
+
+
+def frame_artifact(
+  part: ArtifactPart, chunking: ArtifactChunking
+) -> Iterator[ArtifactPart | ArtifactChunkPart]:
+  """
+  `part` as is if it fits a frame. Otherwise its content in chunks, unless
+  `known`, then `part` referencing the content instead of carrying it.
+  """
+  artifact = part.data
+  content = artifact_content(artifact.data)
+  digest = content_hash(content)
+  size = chunking.frame_bytes - _FRAME_OVERHEAD
+
+  chunks = 0
+  if digest not in chunking.known:
+    if len(content) * 6 <= size or _escaped_size(content) <= size:
+      yield part
+      return
+
+    for index, text in enumerate(_split(content, size)):
+      yield ArtifactChunkPart(
+        id=f"{digest}-{index}",
+        data=ArtifactChunk(hash=digest, index=index, text=text),
+      )
+      chunks += 1
+
+  ref = ArtifactRef(hash=digest, size=len(content), chunks=chunks)
+  yield ArtifactPart(
+    id=part.id,
+    data=artifact.model_copy(
+      update={"data": without_content(artifact.data), "ref": ref}
+    ),
+  )
@@ -0,0 +1,241 @@
+"""
+In-process fan-out: one agent run per turn, streamed to any number of
+subscribers, e.g. the same thread open in two tabs or a shared live view.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import Unpack
+
+from pydantic_ai import Agent
+from pydantic_ai.output import OutputDataT
+from pydantic_ai.tools import AgentDepsT
+
+from pydantic_ai_chat_ui._utils import _END, _End
+from pydantic_ai_chat_ui.buffering import Buffering, OverflowPolicy, PartBuffer
+from pydantic_ai_chat_ui.heartbeat import Heartbeat
+from pydantic_ai_chat_ui.history import MessageHistory
+from pydantic_ai_chat_ui.messages.full import UIMessage
+from pydantic_ai_chat_ui.messages.streamed import (
+  StreamedMessagePartBase,
+  StreamedPart,
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+from pydantic_ai_chat_ui.streaming import (
+  StreamOptions,
+  _keepalive_frames,
+  _stream_batches,
+  format_event,
+)
+
+DEFAULT_SUBSCRIBER_BUFFERING = Buffering(policy=OverflowPolicy.SUMMARIZE)
+
+
+class SubscriberLagged(Exception):
+  """The subscriber fell too far behind the run and was dropped."""
+
+
+class _Text:
+  def __init__(self, id: str, start: TextPartStart | None = None):
+    self.id = id
+    self.start = start
+    self.chunks: list[str] = []
+    self.end: TextPartEnd | None = None
+
+
+class Snapshot:
+  """
+  Latest state of a run, replayed to late joiners as a handful of parts: the
+  text of each message so far as a single delta, and each data part at its
+  newest state, in the order they first appeared.
+  """
+
+  def __init__(self):
+    self._entries: dict[object, _Text | StreamedPart] = {}
+    # text parts can be started again under the same id, e.g. after a tool call,
+    # each start begins a segment of its own
+    self._segments: dict[str, int] = {}
+
+  def _text(self, id: str) -> _Text:
+    key = ("text", id, self._segments.get(id, 0))
+    text = self._entries.get(key)
+    if not isinstance(text, _Text):
+      text = self._entries[key] = _Text(id)
+    return text
+
+  def add(self, part: StreamedPart) -> None:
+    if isinstance(part, TextPartStart):
+      segment = self._segments.get(part.id)
+      if segment is None or ("text", part.id, segment) in self._entries:
+        segment = self._segments[part.id] = 0 if segment is None else segment + 1
+      self._entries[("text", part.id, segment)] = _Text(part.id, part)
+    elif isinstance(part, TextPartDelta):
+      self._text(part.id).chunks.append(part.delta)
+    elif isinstance(part, TextPartEnd):
+      self._text(part.id).end = part
+    elif isinstance(part, StreamedMessagePartBase):
+      # data parts with the same type and id replace each other on the client
+      self._entries[(part.type, part.id)] = part
+    else:
+      self._entries[object()] = part
+
+  def parts(self) -> list[StreamedPart]:
+    parts: list[StreamedPart] = []
+    for entry in self._entries.values():
+      if not isinstance(entry, _Text):
+        parts.append(entry)
+        continue
+
+      if entry.start is not None:
+        parts.append(entry.start)
+      if entry.chunks:
+        parts.append(TextPartDelta(id=entry.id, delta="".join(entry.chunks)))
+      if entry.end is not None:
+        parts.append(entry.end)
+    return parts
+
+
+class Broadcast:
+  """
+  Drives a stream of parts once, from its own task, fanning it out to every
+  subscriber. Each subscriber reads from its own buffer configured by
+  `buffering`; one that overflows it is dropped with `SubscriberLagged` rather
+  than holding up the others. The run is cancelled once its last subscriber
+  leaves. Each subscriber idle for `heartbeat.interval` gets a heartbeat.
+  """
+
+  def __init__(
+    self,
+    batches: AsyncIterator[list[StreamedPart]],
+    buffering: Buffering = DEFAULT_SUBSCRIBER_BUFFERING,
+    heartbeat: Heartbeat | None = None,
+  ):
+    self.buffering = buffering
+    self.heartbeat = heartbeat
+    self.snapshot = Snapshot()
+    self._subscribers: set[PartBuffer] = set()
+    self._done = False
+    self._task = asyncio.create_task(self._run(batches))
+
+  @property
+  def running(self) -> bool:
+    return not self._done
+
+  @property
+  def subscribers(self) -> int:
+    return len(self._subscribers)
+
+  async def _publish(self, item: StreamedPart | _End | Exception) -> None:
+    for subscriber in list(self._subscribers):
+      if isinstance(item, _End | Exception):
+        await subscriber.put(item)
+      elif not await subscriber.offer(item):
+        self._subscribers.discard(subscriber)
+        await subscriber.put(SubscriberLagged())
+
+  async def _run(self, batches: AsyncIterator[list[StreamedPart]]) -> None:
+    end: _End | Exception = _END
+    try:
+      async with aclosing(batches):
+        async for batch in batches:
+          for part in batch:
+            self.snapshot.add(part)
+            await self._publish(part)
+    except Exception as e:
+      end = e
+    finally:
+      self._done = True
+      await self._publish(end)
+
+  async def subscribe(self) -> AsyncIterator[StreamedPart]:
+    """Yields a snapshot of the run so far, then its parts as they're produced."""
+    buffer = PartBuffer(self.buffering.maxsize, self.buffering.policy)
+    catch_up = self.snapshot.parts()
+    live = not self._done
+    if live:
+      self._subscribers.add(buffer)
+
+    try:
+      for part in catch_up:
+        yield part
+
+      while live:
+        item = await buffer.get()
+        if isinstance(item, _End):
+          return
+        if isinstance(item, Exception):
+          raise item
+        yield item
+    finally:
+      self._subscribers.discard(buffer)
+      if not self._subscribers and not self._done:
+        self.cancel()
+
+  def cancel(self) -> None:
+    self._task.cancel()
+
+  async def aclose(self) -> None:
+    self.cancel()
+    await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def _format(parts: AsyncIterator[StreamedPart]) -> AsyncIterator[str]:
+  async with aclosing(parts):
+    async for part in parts:
+      yield format_event(part)
+
+
+def _frames(broadcast: Broadcast) -> AsyncIterator[str]:
+  return _keepalive_frames(_format(broadcast.subscribe()), broadcast.heartbeat)
+
+
+class Broadcasts:
+  """
+  Shares the run of each turn between everyone watching a chat, keyed by e.g.
+  the chat id. Create one per app.
+  """
+
+  def __init__(self, buffering: Buffering = DEFAULT_SUBSCRIBER_BUFFERING):
+    self.buffering = buffering
+    self._runs: dict[str, Broadcast] = {}
+
+  def start[D: AgentDepsT, R: OutputDataT](
+    self,
+    key: str,
+    user_message: UIMessage,
+    agent: Agent[D, R],
+    deps: D,
+    message_history: MessageHistory,
+    **options: Unpack[StreamOptions],
+  ) -> AsyncIterator[str]:
+    """
+    Starts a run shared under `key` and subscribes to it, see `stream_results`
+    for the options. Any earlier run under the key is cancelled.
+    """
+    previous = self._runs.get(key)
+    if previous is not None:
+      previous.cancel()
+
+    # heartbeats are sent to each subscriber by the time it's been idle
+    heartbeat = options.pop("heartbeat", None)
+    batches = _stream_batches(user_message, agent, deps, message_history, **options)
+    broadcast = self._runs[key] = Broadcast(batches, self.buffering, heartbeat)
+    broadcast._task.add_done_callback(lambda _: self._forget(key, broadcast))
+    return _frames(broadcast)
+
+  def _forget(self, key: str, broadcast: Broadcast) -> None:
+    if self._runs.get(key) is broadcast:
+      del self._runs[key]
+
+  def join(self, key: str) -> AsyncIterator[str]:
+    """Subscribes to the run under `key`, raising `KeyError` if there is none."""
+    broadcast = self._runs.get(key)
+    if broadcast is None or not broadcast.running:
+      raise KeyError(key)
+    return _frames(broadcast)
+
+  def get(self, key: str) -> Broadcast | None:
+    return self._runs.get(key)
@@ -0,0 +1,136 @@
+import asyncio
+import enum
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from pydantic_ai_chat_ui._utils import Pump, _End
+from pydantic_ai_chat_ui.messages.streamed import (
+  DataPart,
+  StreamedPart,
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+
+
+@enum.verify(enum.UNIQUE)
+class OverflowPolicy(enum.StrEnum):
+  """What a full buffer does with the next part from the agent run."""
+
+  # wait for the consumer to make room
+  BLOCK = "block"
+  # merge text deltas into the last pending delta, waiting only for other parts
+  COALESCE = "coalesce"
+  # collapse pending parts to their latest state: text deltas of a message are
+  # merged and data parts are replaced by newer ones with the same type and id
+  SUMMARIZE = "summarize"
+
+
+@dataclass(frozen=True)
+class Buffering:
+  """
+  Runs the agent in its own task, writing into a buffer of up to `maxsize` parts
+  that the HTTP side drains, so a slow client doesn't throttle the model stream.
+  """
+
+  maxsize: int = 256
+  policy: OverflowPolicy = OverflowPolicy.COALESCE
+
+
+class PartBuffer:
+  """Bounded buffer of streamed parts applying an `OverflowPolicy` when full."""
+
+  def __init__(self, maxsize: int, policy: OverflowPolicy):
+    self.maxsize = maxsize
+    self.policy = policy
+    self._items: deque[StreamedPart | _End | Exception] = deque()
+    self._changed = asyncio.Condition()
+
+  def qsize(self) -> int:
+    return len(self._items)
+
+  def full(self) -> bool:
+    return len(self._items) >= self.maxsize
+
+  def _merge_delta(self, delta: TextPartDelta, anywhere: bool) -> bool:
+    last = len(self._items) - 1
+    for index in range(last, -1 if anywhere else last - 1, -1):
+      item = self._items[index]
+      if isinstance(item, TextPartDelta) and item.id == delta.id:
+        # parts may be shared with other buffers, so they aren't changed in place
+        self._items[index] = TextPartDelta(id=item.id, delta=item.delta + delta.delta)
+        return True
+      if isinstance(item, TextPartStart | TextPartEnd) and item.id == delta.id:
+        # text of a message restarted under the same id stays after the restart
+        return False
+    return False
+
+  def _replace_data_part(self, part: DataPart) -> bool:
+    for index, item in enumerate(self._items):
+      if isinstance(item, DataPart) and (item.type, item.id) == (part.type, part.id):
+        self._items[index] = part
+        return True
+    return False
+
+  def _absorb(self, part: StreamedPart) -> bool:
+    """Folds `part` into pending parts according to the policy, if possible."""
+    if self.policy is OverflowPolicy.BLOCK or not self._items:
+      return False
+
+    summarize = self.policy is OverflowPolicy.SUMMARIZE
+    if isinstance(part, TextPartDelta):
+      return self._merge_delta(part, anywhere=summarize)
+    if summarize and isinstance(part, DataPart):
+      return self._replace_data_part(part)
+    return False
+
+  async def put(self, item: StreamedPart | _End | Exception) -> None:
+    async with self._changed:
+      # the end of the run and errors are never held back
+      if not isinstance(item, _End | Exception):
+        while self.full():
+          if self._absorb(item):
+            return
+          await self._changed.wait()
+
+      self._items.append(item)
+      self._changed.notify_all()
+
+  async def offer(self, item: StreamedPart) -> bool:
+    """Like `put`, but returns False instead of waiting when `item` doesn't fit."""
+    async with self._changed:
+      if self.full():
+        return self._absorb(item)
+
+      self._items.append(item)
+      self._changed.notify_all()
+      return True
+
+  async def get(self) -> StreamedPart | _End | Exception:
+    async with self._changed:
+      while not self._items:
+        await self._changed.wait()
+
+      item = self._items.popleft()
+      self._changed.notify_all()
+      return item
+
+
+async def decouple(
+  parts: AsyncIterator[StreamedPart], buffering: Buffering
+) -> AsyncIterator[StreamedPart]:
+  """
+  Drives `parts` from its own task into a `PartBuffer`, yielding from the buffer.
+  Closing the returned iterator cancels the run.
+  """
+  pump = Pump(parts, queue=PartBuffer(buffering.maxsize, buffering.policy))
+
+  try:
+    while True:
+      try:
+        yield await pump.get()
+      except StopAsyncIteration:
+        return
+  finally:
+    await pump.aclose()
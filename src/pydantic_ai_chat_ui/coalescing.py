@@ -0,0 +1,84 @@
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from pydantic_ai_chat_ui._utils import Pump
+from pydantic_ai_chat_ui.messages.streamed import StreamedPart, TextPartDelta
+
+
+@dataclass(frozen=True)
+class Coalescing:
+  """
+  Buffers consecutive text deltas for the same message and flushes them as a
+  single delta once `window` seconds have passed since the first buffered delta,
+  or once `max_bytes` of UTF-8 text is buffered. Any other part forces a flush.
+  """
+
+  window: float = 0.015
+  max_bytes: int = 2048
+
+
+class _DeltaBuffer:
+  def __init__(self):
+    self.id: str | None = None
+    self.chunks: list[str] = []
+    self.size = 0
+    self.started_at = 0.0
+
+  def add(self, delta: TextPartDelta) -> None:
+    if not self.chunks:
+      self.started_at = time.monotonic()
+    self.id = delta.id
+    self.chunks.append(delta.delta)
+    self.size += len(delta.delta.encode())
+
+  def flush(self) -> list[StreamedPart]:
+    if not self.chunks:
+      return []
+
+    part = TextPartDelta.model_construct(id=self.id, delta="".join(self.chunks))
+    self.chunks = []
+    self.size = 0
+    return [part]
+
+
+async def coalesce_text_deltas(
+  parts: AsyncIterator[StreamedPart], coalescing: Coalescing
+) -> AsyncIterator[list[StreamedPart]]:
+  """
+  Yields batches of parts, each batch being one flush. The source is driven from
+  its own task so that buffered text is flushed on time even while the agent is
+  quiet.
+  """
+  # bounded, so a fast producer yields to the consumer instead of running ahead
+  pump = Pump(parts, maxsize=64)
+  buffer = _DeltaBuffer()
+
+  try:
+    while True:
+      timeout = None
+      if buffer.chunks:
+        timeout = coalescing.window - (time.monotonic() - buffer.started_at)
+
+      try:
+        part = await pump.get(timeout)
+      except TimeoutError:
+        yield buffer.flush()
+        continue
+      except StopAsyncIteration:
+        if buffer.chunks:
+          yield buffer.flush()
+        return
+
+      if isinstance(part, TextPartDelta):
+        batch = buffer.flush() if buffer.id != part.id else []
+        buffer.add(part)
+        if buffer.size >= coalescing.max_bytes:
+          batch.extend(buffer.flush())
+        if batch:
+          yield batch
+        continue
+
+      yield [*buffer.flush(), part]
+  finally:
+    await pump.aclose()
@@ -0,0 +1,211 @@
+"""
+Rolling summaries for long threads: once history outgrows a threshold, older
+turns are replaced by a summary, so prompts stay small.
+
+Summaries come from a separate summarizer agent and are cached keyed by the last
+message they cover. Streaming only reads the cache. When the summary for the
+current cut isn't ready, the latest cached one is used with the turns after it
+kept verbatim. Once the answer has streamed, the summary is brought up to date
+in the background, building on the previous one.
+"""
+
+import asyncio
+import dataclasses
+import logging
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_ai import Agent
+from pydantic_ai import messages as pydantic_ai_messages
+
+from pydantic_ai_chat_ui.history import (
+  ModelMessage,
+  _starts_turn,
+  estimate_tokens,
+  message_key,
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+  "Summarize the conversation below for an assistant that will continue it. "
+  "Keep facts, decisions, names, numbers and open questions; drop small talk."
+)
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+class SummaryCache:
+  """Storage for summaries, keyed by the last message they cover."""
+
+  async def get(self, key: str) -> str | None:
+    raise NotImplementedError
+
+  async def set(self, key: str, summary: str) -> None:
+    raise NotImplementedError
+
+
+class InMemorySummaryCache(SummaryCache):
+  """Keeps the `maxsize` most recently used summaries in process."""
+
+  def __init__(self, maxsize: int = 1024):
+    self.maxsize = maxsize
+    self._summaries: OrderedDict[str, str] = OrderedDict()
+
+  async def get(self, key: str) -> str | None:
+    summary = self._summaries.get(key)
+    if summary is not None:
+      self._summaries.move_to_end(key)
+    return summary
+
+  async def set(self, key: str, summary: str) -> None:
+    self._summaries[key] = summary
+    self._summaries.move_to_end(key)
+    if len(self._summaries) > self.maxsize:
+      self._summaries.popitem(last=False)
+
+
+@dataclass(frozen=True)
+class Compaction:
+  """
+  Folds history older than the most recent `keep` tokens into a summary made by
+  `summarizer` once the whole history is over `threshold` tokens.
+  """
+
+  summarizer: Agent[Any, str]
+  threshold: int = 16_000
+  keep: int = 4_000
+  prompt: str = SUMMARY_PROMPT
+  cache: SummaryCache = field(default_factory=InMemorySummaryCache)
+  estimate: Callable[[ModelMessage], int] = estimate_tokens
+
+
+def _cut(history: Sequence[ModelMessage], compaction: Compaction) -> int:
+  """Index of the first message kept verbatim, 0 when nothing is folded."""
+  costs = [compaction.estimate(message) for message in history]
+  if sum(costs) <= compaction.threshold:
+    return 0
+
+  cut = tail = 0
+  for index in range(len(history) - 1, 0, -1):
+    tail += costs[index]
+    if _starts_turn(history[index]):
+      # the latest turn is always kept, even if it's over `keep` on its own
+      if cut and tail > compaction.keep:
+        break
+      cut = index
+  return cut
+
+
+async def _cached_summary(
+  history: Sequence[ModelMessage], cut: int, cache: SummaryCache
+) -> tuple[int, str] | None:
+  """The latest cached summary up to `cut`, with the index it covers up to."""
+  for index in range(cut, 0, -1):
+    if _starts_turn(history[index]):
+      summary = await cache.get(message_key(history[index - 1]))
+      if summary is not None:
+        return index, summary
+  return None
+
+
+def _with_summary(
+  history: Sequence[ModelMessage], covered: int, summary: str
+) -> list[ModelMessage]:
+  head = history[covered]
+  assert isinstance(head, pydantic_ai_messages.ModelRequest)
+
+  # pydantic ai only adds system prompts to empty histories
+  system_parts = [
+    part
+    for part in history[0].parts
+    if isinstance(part, pydantic_ai_messages.SystemPromptPart)
+  ]
+  summary_part = pydantic_ai_messages.SystemPromptPart(SUMMARY_HEADER + summary)
+  head = dataclasses.replace(head, parts=[*system_parts, summary_part, *head.parts])
+  return [head, *history[covered + 1 :]]
+
+
+async def compact_history(
+  history: list[ModelMessage], compaction: Compaction
+) -> list[ModelMessage]:
+  """`history` with older turns replaced by the latest cached summary."""
+  cut = _cut(history, compaction)
+  if not cut:
+    return history
+
+  found = await _cached_summary(history, cut, compaction.cache)
+  if found is None:
+    return history
+  return _with_summary(history, *found)
+
+
+def _transcript(messages: Sequence[ModelMessage]) -> str:
+  lines = []
+  for message in messages:
+    for part in message.parts:
+      match part:
+        case pydantic_ai_messages.UserPromptPart(content=str(content)):
+          lines.append(f"User: {content}")
+        case pydantic_ai_messages.UserPromptPart(content=content):
+          text = " ".join(c for c in content if isinstance(c, str))
+          lines.append(f"User: {text}")
+        case pydantic_ai_messages.TextPart(content=content):
+          lines.append(f"Assistant: {content}")
+        case pydantic_ai_messages.ToolCallPart():
+          lines.append(f"Assistant called {part.tool_name}({part.args_as_json_str()})")
+        case pydantic_ai_messages.ToolReturnPart():
+          lines.append(f"{part.tool_name} returned: {part.model_response_str()}")
+  return "\n".join(lines)
+
+
+_refreshing: set[str] = set()
+
+
+async def refresh_summary(
+  history: Sequence[ModelMessage], compaction: Compaction
+) -> None:
+  """Summarizes the turns of `history` to fold, unless that's cached already."""
+  cut = _cut(history, compaction)
+  if not cut:
+    return
+
+  key = message_key(history[cut - 1])
+  if key in _refreshing:
+    return
+
+  _refreshing.add(key)
+  try:
+    covered = 0
+    prompt = compaction.prompt
+    found = await _cached_summary(history, cut, compaction.cache)
+    if found is not None:
+      covered, previous = found
+      if covered == cut:
+        return
+      prompt += f"\n\nSummary so far:\n{previous}\n\nNew messages:"
+    prompt += f"\n\n{_transcript(history[covered:cut])}"
+
+    result = await compaction.summarizer.run(prompt)
+    await compaction.cache.set(key, result.output)
+  finally:
+    _refreshing.discard(key)
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _refresh(history: Sequence[ModelMessage], compaction: Compaction) -> None:
+  try:
+    await refresh_summary(history, compaction)
+  except Exception:
+    logger.error("Failed to refresh conversation summary", exc_info=True)
+
+
+def refresh_in_background(
+  history: Sequence[ModelMessage], compaction: Compaction
+) -> None:
+  task = asyncio.create_task(_refresh(history, compaction))
+  _background_tasks.add(task)
+  task.add_done_callback(_background_tasks.discard)
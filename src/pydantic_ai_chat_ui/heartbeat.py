@@ -0,0 +1,43 @@
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from pydantic_ai_chat_ui._utils import Pump
+from pydantic_ai_chat_ui.messages.streamed import AnyPart
+
+# SSE comment, ignored by EventSource and chat-ui
+COMMENT_FRAME = ": keepalive\n\n"
+HEARTBEAT_PART = AnyPart(type="data-heartbeat", id="heartbeat")
+
+
+@dataclass(frozen=True)
+class Heartbeat:
+  """
+  Sends a keepalive frame once the stream has been idle for `interval` seconds,
+  e.g. while a slow tool runs, so proxies don't cut the connection. The frame is
+  an SSE comment, or with `data_part` a `data-heartbeat` part, for clients that
+  want to tell a stall from work in progress.
+  """
+
+  interval: float = 15.0
+  data_part: bool = False
+
+
+async def keepalive[T](
+  items: AsyncIterator[T], interval: float, beat: T
+) -> AsyncIterator[T]:
+  """
+  Yields `items`, inserting `beat` after every `interval` seconds without one.
+  Items are read from a `Pump`, so waiting costs a timer per item, not polling.
+  """
+  pump = Pump(items, maxsize=64)
+
+  try:
+    while True:
+      try:
+        yield await pump.get(interval)
+      except TimeoutError:
+        yield beat
+      except StopAsyncIteration:
+        return
+  finally:
+    await pump.aclose()
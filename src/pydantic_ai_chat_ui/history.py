@@ -0,0 +1,204 @@
+"""
+Message history for `stream_results`, loaded lazily and trimmed to a budget.
+
+Besides a list, `message_history` may be a provider yielding messages from
+newest to oldest, e.g. paging through the database, so only the tail the model
+gets is ever loaded:
+
+  async def history():
+    async for row in db.messages(chat_id, order="desc"):
+      yield row.message
+
+  stream_results(..., message_history=history, history_budget=HistoryBudget(8000))
+
+History is only cut before a user prompt, so tool calls keep their returns.
+Pydantic AI only adds an agent's system prompts to empty histories: trimmed lists
+keep them, but agents paging through a provider should use `instructions`.
+"""
+
+import dataclasses
+import hashlib
+import inspect
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from pydantic_ai_chat_ui._lazy import LazyModule
+
+if TYPE_CHECKING:
+  from pydantic_ai import messages as pydantic_ai_messages
+else:
+  pydantic_ai_messages = LazyModule("pydantic_ai.messages")
+
+type ModelMessage = pydantic_ai_messages.ModelMessage
+# messages from newest to oldest, or a callable returning them, or returning a
+# list of them from oldest to newest
+type HistoryProvider = (
+  AsyncIterable[ModelMessage]
+  | Callable[[], AsyncIterable[ModelMessage] | Awaitable[Sequence[ModelMessage]]]
+)
+type MessageHistory = Sequence[ModelMessage] | HistoryProvider
+
+# rough size of an image or other file in a prompt, in characters
+_FILE_CHARS = 1024
+_PART_OVERHEAD_TOKENS = 4
+
+
+_KEY_FIELDS = ("content", "args", "tool_call_id", "tool_name")
+
+
+def message_key(message: ModelMessage) -> str:
+  """
+  Hash identifying `message` by its content and timestamps, the same whenever
+  it's loaded from storage. Hashes the fields directly, as serializing whole
+  messages costs several times more.
+  """
+  digest = hashlib.blake2b(message.kind.encode(), digest_size=16)
+  if isinstance(message, pydantic_ai_messages.ModelResponse):
+    digest.update(message.timestamp.isoformat().encode())
+
+  for part in message.parts:
+    digest.update(part.part_kind.encode())
+    for name in _KEY_FIELDS:
+      value = getattr(part, name, None)
+      if value is not None:
+        value = value if isinstance(value, str) else repr(value)
+        digest.update(value.encode(errors="surrogatepass") + b"\0")
+    if (timestamp := getattr(part, "timestamp", None)) is not None:
+      digest.update(timestamp.isoformat().encode())
+  return digest.hexdigest()
+
+
+def _content_chars(content: object) -> int:
+  if isinstance(content, str):
+    return len(content)
+  if isinstance(content, Sequence):
+    return sum(len(c) if isinstance(c, str) else _FILE_CHARS for c in content)
+  return _FILE_CHARS
+
+
+def count_chars(message: ModelMessage) -> int:
+  """Characters of text, tool arguments and tool results in `message`."""
+  chars = 0
+  for part in message.parts:
+    match part:
+      case pydantic_ai_messages.ToolCallPart(args=str(args)):
+        chars += len(args)
+      case pydantic_ai_messages.ToolCallPart():
+        chars += len(part.args_as_json_str())
+      case pydantic_ai_messages.ToolReturnPart(content=str(content)):
+        chars += len(content)
+      case pydantic_ai_messages.ToolReturnPart():
+        chars += len(part.model_response_str())
+      case _:
+        chars += _content_chars(getattr(part, "content", ""))
+  return chars
+
+
+def estimate_tokens(message: ModelMessage) -> int:
+  """Approximate token count of `message`, at ~4 characters a token."""
+  return count_chars(message) // 4 + _PART_OVERHEAD_TOKENS * len(message.parts)
+
+
+@dataclass(frozen=True)
+class HistoryBudget:
+  """
+  Keeps the most recent turns whose size fits `limit`, as measured by
+  `estimate`: tokens by default, or e.g. characters with `count_chars`.
+  """
+
+  limit: int
+  estimate: Callable[[ModelMessage], int] = estimate_tokens
+
+
+def _starts_turn(message: ModelMessage) -> bool:
+  """Whether history can start at `message` without orphaning tool results."""
+  return isinstance(message, pydantic_ai_messages.ModelRequest) and not any(
+    isinstance(
+      part,
+      pydantic_ai_messages.ToolReturnPart | pydantic_ai_messages.RetryPromptPart,
+    )
+    for part in message.parts
+  )
+
+
+async def _newest_first(
+  messages: Sequence[ModelMessage],
+) -> AsyncIterator[ModelMessage]:
+  for message in reversed(messages):
+    yield message
+
+
+async def _take_budget(
+  messages: AsyncIterable[ModelMessage], budget: HistoryBudget
+) -> tuple[list[ModelMessage], bool]:
+  """Pulls whole turns until the budget is spent, returning them and if cut."""
+  kept: list[ModelMessage] = []
+  turn: list[ModelMessage] = []
+  used = turn_cost = 0
+  cut = False
+
+  iterator = aiter(messages)
+  try:
+    async for message in iterator:
+      turn.append(message)
+      turn_cost += budget.estimate(message)
+      if used + turn_cost > budget.limit:
+        cut = True
+        break
+
+      if _starts_turn(message):
+        kept += turn
+        used += turn_cost
+        turn, turn_cost = [], 0
+    else:
+      # the start of the history, even if it isn't a clean turn
+      kept += turn
+  finally:
+    if (aclose := getattr(iterator, "aclose", None)) is not None:
+      await aclose()
+
+  kept.reverse()
+  return kept, cut
+
+
+def _with_system_prompt(
+  messages: list[ModelMessage], first: ModelMessage
+) -> list[ModelMessage]:
+  system_parts = [
+    part
+    for part in first.parts
+    if isinstance(part, pydantic_ai_messages.SystemPromptPart)
+  ]
+  if not system_parts or not messages:
+    return messages
+
+  head = messages[0]
+  assert isinstance(head, pydantic_ai_messages.ModelRequest)
+  messages[0] = dataclasses.replace(head, parts=[*system_parts, *head.parts])
+  return messages
+
+
+async def load_history(
+  history: MessageHistory, budget: HistoryBudget | None = None
+) -> list[ModelMessage]:
+  """Resolves `history` to a list, oldest first, trimmed to `budget`."""
+  if callable(history):
+    history = history()
+    if inspect.isawaitable(history):
+      history = await history
+
+  if isinstance(history, Sequence):
+    if budget is None:
+      return list(history)
+
+    messages, cut = await _take_budget(_newest_first(history), budget)
+    return _with_system_prompt(messages, history[0]) if cut else messages
+
+  if budget is None:
+    messages = [message async for message in history]
+    messages.reverse()
+    return messages
+
+  messages, _ = await _take_budget(history, budget)
+  return messages
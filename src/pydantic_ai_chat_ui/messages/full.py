@@ -5,20 +5,42 @@ deltas or streamed data. For those see pydantic_ai_chat_ui.streamed_messages.
 
 import enum
 import uuid
-from typing import Any, Literal
+from collections import OrderedDict
+from collections.abc import Callable, Container, Iterable, Iterator, Sequence
+from typing import TYPE_CHECKING, Annotated, Any, Literal
 
-from pydantic import BaseModel, Field
-from pydantic_ai import messages as pydantic_ai_messages
+from pydantic import BaseModel, ConfigDict, Discriminator, Field, Tag
+from pydantic_core import from_json
 
+from pydantic_ai_chat_ui._lazy import LazyModule
+from pydantic_ai_chat_ui.artifacts import ARTIFACT_TOOLS, artifact, artifact_data
+from pydantic_ai_chat_ui.history import ModelMessage, message_key
 from pydantic_ai_chat_ui.messages.shared import (
   Artifact,
+  ArtifactRef,
   ArtifactType,
   CodeArtifactData,
   DocumentArtifactData,
   FileData,
   SourceData,
+  artifact_content,
+  content_hash,
+  without_content,
 )
-from pydantic_ai_chat_ui.tools import DataPartState, ToolMessages, get_tool_message
+from pydantic_ai_chat_ui.tools import (
+  DataPartState,
+  ToolMessages,
+  ToolMessageTable,
+  as_tool_message_table,
+  get_tool_message,
+)
+
+if TYPE_CHECKING:
+  from pydantic_ai import messages as pydantic_ai_messages
+else:
+  pydantic_ai_messages = LazyModule("pydantic_ai.messages")
+
+type UserContent = pydantic_ai_messages.UserContent
 
 
 @enum.verify(enum.UNIQUE)
@@ -41,6 +63,8 @@ class PartType(enum.StrEnum):
 
 
 class MessagePartBase(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   type: str
   id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
@@ -62,11 +86,15 @@ class DataPart[T](MessagePartBase):
 
 
 class ChatEvent(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   title: str
   status: DataPartState
 
 
 class SuggestedQuestionsData(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   questions: list[str]
 
 
@@ -86,6 +114,27 @@ class EventPart(DataPart[ChatEvent]):
   type: Literal[PartType.EVENT] = PartType.EVENT
 
 
+def _artifact_part(
+  part: "pydantic_ai_messages.ToolCallPart",
+  created_at: int,
+  artifact_tools: Container[str],
+) -> ArtifactPart | None:
+  """The artifact an output tool call outputs, as streamed once it's complete."""
+  if part.tool_name not in artifact_tools:
+    return None
+  try:
+    args = from_json(part.args) if isinstance(part.args, str) else part.args
+  except ValueError:
+    return None
+  # e.g. a model's arguments that aren't an object, which tools would reject
+  if not isinstance(args, dict):
+    return None
+  data = artifact_data(args)
+  if data is None:
+    return None
+  return ArtifactPart(id=part.tool_call_id, data=artifact(data, created_at))
+
+
 class SourcesPart(DataPart[SourceData]):
   type: Literal[PartType.SOURCES] = PartType.SOURCES
 
@@ -100,24 +149,51 @@ class AnyPart(MessagePartBase):
   id: str
 
 
-UIMessagePart = (
-  TextPart
-  | FilePart
-  | ArtifactPart
-  | EventPart
-  | SourcesPart
-  | SuggestionPart
-  | AnyPart
-)
+_PART_TYPES = frozenset(PartType)
+_ANY_TAG = "any"
+
+
+def _part_tag(part: Any) -> str:
+  """The union member for `part`, from its `type`: unknown ones are `AnyPart`s."""
+  type_ = part.get("type") if isinstance(part, dict) else getattr(part, "type", None)
+  # anything but a string is invalid, and left to `AnyPart` to reject
+  return type_ if isinstance(type_, str) and type_ in _PART_TYPES else _ANY_TAG
+
+
+# Each part is validated against the model for its type alone, rather than every
+# member in turn. Parts that don't match it still fall back to `AnyPart`, as they
+# did with a plain union.
+UIMessagePart = Annotated[
+  Annotated[TextPart | AnyPart, Field(union_mode="left_to_right"), Tag(PartType.TEXT)]
+  | Annotated[FilePart | AnyPart, Field(union_mode="left_to_right"), Tag(PartType.FILE)]
+  | Annotated[
+    ArtifactPart | AnyPart, Field(union_mode="left_to_right"), Tag(PartType.ARTIFACT)
+  ]
+  | Annotated[
+    EventPart | AnyPart, Field(union_mode="left_to_right"), Tag(PartType.EVENT)
+  ]
+  | Annotated[
+    SourcesPart | AnyPart, Field(union_mode="left_to_right"), Tag(PartType.SOURCES)
+  ]
+  | Annotated[
+    SuggestionPart | AnyPart,
+    Field(union_mode="left_to_right"),
+    Tag(PartType.SUGGESTIONS),
+  ]
+  | Annotated[AnyPart, Tag(_ANY_TAG)],
+  Discriminator(_part_tag),
+]
 
 
 class UIMessage(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   id: str
   role: MessageRole
   parts: list[UIMessagePart]
 
 
-def from_ui_message(message: UIMessage) -> pydantic_ai_messages.UserContent | None:
+def from_ui_message(message: UIMessage) -> UserContent | None:
   """
   This is limited to supporting user-driven submissions. Longer sets of model
   messages should be loaded from your store of choice and included as message
@@ -142,9 +218,46 @@ def from_ui_message(message: UIMessage) -> pydantic_ai_messages.UserContent | No
   return "\n\n".join(texts)
 
 
+class _Ids:
+  """
+  Ids for a converted message and its parts: random, or derived from `key` so
+  converting the same stored messages again gives the same ids.
+  """
+
+  def __init__(self, key: str | None):
+    self.key = key
+    self.message = key or str(uuid.uuid4())
+    self._parts = 0
+
+  def part(self) -> str:
+    if self.key is None:
+      return str(uuid.uuid4())
+
+    self._parts += 1
+    return f"{self.key}-{self._parts}"
+
+
 def from_pydantic_ai_message(
-  message: pydantic_ai_messages.ModelMessage,
-  tool_messages: ToolMessages | None = None,
+  message: ModelMessage,
+  tool_messages: ToolMessages | ToolMessageTable | None = None,
+  stable_ids: bool = False,
+  artifact_tools: Container[str] = ARTIFACT_TOOLS,
+) -> UIMessage:
+  """
+  With `stable_ids`, ids are derived from the content of `message` rather than
+  random, e.g. for ETags, React keys or caching. Calls to the output tools named
+  in `artifact_tools` become artifacts, pydantic ai's default names unless the
+  agent names its own, e.g. `ToolOutput(CodeArtifactData, name="write_code")`.
+  """
+  ids = _Ids(message_key(message) if stable_ids else None)
+  return _convert_message(message, tool_messages, ids, artifact_tools)
+
+
+def _convert_message(
+  message: ModelMessage,
+  tool_messages: ToolMessages | ToolMessageTable | None,
+  ids: _Ids,
+  artifact_tools: Container[str],
 ) -> UIMessage:
   message_parts = []
 
@@ -154,7 +267,7 @@ def from_pydantic_ai_message(
     for part in message.parts:
       match part:
         case pydantic_ai_messages.UserPromptPart(content=content):
-          message_parts.append(TextPart(id=str(uuid.uuid4()), text=content))
+          message_parts.append(TextPart(id=ids.part(), text=content))
 
         case pydantic_ai_messages.ToolReturnPart(
           tool_call_id=tool_call_id, tool_name=tool_name
@@ -171,7 +284,7 @@ def from_pydantic_ai_message(
 
         case pydantic_ai_messages.RetryPromptPart(tool_name=tool_name) if tool_name:
           event = EventPart(
-            id=str(uuid.uuid4()),
+            id=ids.part(),
             data=ChatEvent(
               title=get_tool_message(tool_name, DataPartState.ERROR, tool_messages),
               status=DataPartState.ERROR,
@@ -184,7 +297,7 @@ def from_pydantic_ai_message(
 
     for part in message.parts:
       if isinstance(part, pydantic_ai_messages.TextPart):
-        message_parts.append(TextPart(id=str(uuid.uuid4()), text=part.content))
+        message_parts.append(TextPart(id=ids.part(), text=part.content))
 
       elif isinstance(part, pydantic_ai_messages.ToolCallPart):
         # Convert tool calls to data-event parts
@@ -199,6 +312,12 @@ def from_pydantic_ai_message(
         )
         message_parts.append(event)
 
+        artifact = _artifact_part(
+          part, int(message.timestamp.timestamp()), artifact_tools
+        )
+        if artifact is not None:
+          message_parts.append(artifact)
+
       elif isinstance(part, pydantic_ai_messages.ToolReturnPart):
         # Convert tool results to data-event parts
         event = EventPart(
@@ -213,7 +332,276 @@ def from_pydantic_ai_message(
         message_parts.append(event)
 
   return UIMessage(
-    id=str(uuid.uuid4()),
+    id=ids.message,
     role=role,
-    parts=message_parts or [TextPart(id=str(uuid.uuid4()), text="")],
+    parts=message_parts or [TextPart(id=ids.part(), text="")],
+  )
+
+
+def _user_prompt_text(content: str | Sequence[UserContent]) -> str:
+  if isinstance(content, str):
+    return content
+
+  return "\n\n".join(item for item in content if isinstance(item, str))
+
+
+def from_pydantic_ai_messages(
+  messages: Iterable[ModelMessage],
+  tool_messages: ToolMessages | ToolMessageTable | None = None,
+  stable_ids: bool = False,
+  artifact_tools: Container[str] = ARTIFACT_TOOLS,
+) -> Iterator[UIMessage]:
+  """
+  Lazily converts a whole thread, in the shape chat-ui renders it: one user
+  message per prompt, followed by a single assistant message grouping every model
+  response, tool call and tool return of that turn.
+
+  Each tool call becomes one event part carrying its latest status, and tool
+  titles are resolved once per tool and state for the whole thread. With
+  `stable_ids`, ids are derived from the content of the messages they come from.
+  Calls to the output tools in `artifact_tools` become artifacts.
+  """
+
+  def ids_for(message: ModelMessage) -> _Ids:
+    return _Ids(message_key(message) if stable_ids else None)
+
+  return _convert_thread(
+    messages, as_tool_message_table(tool_messages), ids_for, artifact_tools
   )
+
+
+def _convert_thread(
+  messages: Iterable[ModelMessage],
+  tool_message_table: ToolMessageTable,
+  ids_for: Callable[[ModelMessage], _Ids],
+  artifact_tools: Container[str],
+) -> Iterator[UIMessage]:
+  # ids of the assistant message being grouped, from its first model message
+  assistant_ids: _Ids | None = None
+
+  def tool_event(tool_call_id: str, tool_name: str, state: DataPartState) -> EventPart:
+    return EventPart(
+      id=tool_call_id,
+      data=ChatEvent(title=tool_message_table.get(tool_name, state), status=state),
+    )
+
+  assistant_parts: list[UIMessagePart] = []
+  # tool call id -> position of its event in assistant_parts
+  tool_events: dict[str, int] = {}
+
+  def set_tool_event(event: EventPart) -> None:
+    index = tool_events.get(event.id)
+    if index is None:
+      tool_events[event.id] = len(assistant_parts)
+      assistant_parts.append(event)
+    else:
+      assistant_parts[index] = event
+
+  def assistant_message() -> UIMessage:
+    nonlocal assistant_ids
+    assert assistant_ids is not None
+    message = UIMessage(
+      id=assistant_ids.message,
+      role=MessageRole.ASSISTANT,
+      parts=assistant_parts.copy(),
+    )
+    assistant_parts.clear()
+    tool_events.clear()
+    assistant_ids = None
+    return message
+
+  for message in messages:
+    if assistant_ids is None and (
+      isinstance(message, pydantic_ai_messages.ModelResponse)
+      or any(
+        isinstance(part, pydantic_ai_messages.ToolReturnPart)
+        or (isinstance(part, pydantic_ai_messages.RetryPromptPart) and part.tool_name)
+        for part in message.parts
+      )
+    ):
+      assistant_ids = ids_for(message)
+      if isinstance(message, pydantic_ai_messages.ModelRequest):
+        # the request may start a user message too, which gets the plain ids
+        assistant_ids = _Ids(assistant_ids.key and f"{assistant_ids.key}-tools")
+
+    if isinstance(message, pydantic_ai_messages.ModelRequest):
+      user_texts: list[str] = []
+
+      for part in message.parts:
+        match part:
+          case pydantic_ai_messages.UserPromptPart(content=content):
+            user_texts.append(_user_prompt_text(content))
+
+          case pydantic_ai_messages.ToolReturnPart():
+            set_tool_event(
+              tool_event(part.tool_call_id, part.tool_name, DataPartState.SUCCESS)
+            )
+
+          case pydantic_ai_messages.RetryPromptPart(tool_name=tool_name) if tool_name:
+            set_tool_event(
+              tool_event(part.tool_call_id, tool_name, DataPartState.ERROR)
+            )
+
+      if user_texts:
+        if assistant_parts:
+          yield assistant_message()
+
+        user_ids = ids_for(message)
+        yield UIMessage(
+          id=user_ids.message,
+          role=MessageRole.USER,
+          parts=[TextPart(id=user_ids.part(), text=text) for text in user_texts],
+        )
+
+    elif isinstance(message, pydantic_ai_messages.ModelResponse):
+      for part in message.parts:
+        if isinstance(part, pydantic_ai_messages.TextPart):
+          assert assistant_ids is not None
+          assistant_parts.append(TextPart(id=assistant_ids.part(), text=part.content))
+
+        elif isinstance(part, pydantic_ai_messages.ToolCallPart):
+          set_tool_event(
+            tool_event(part.tool_call_id, part.tool_name, DataPartState.PENDING)
+          )
+
+          artifact = _artifact_part(
+            part, int(message.timestamp.timestamp()), artifact_tools
+          )
+          if artifact is not None:
+            assistant_parts.append(artifact)
+
+  if assistant_parts:
+    yield assistant_message()
+
+
+def _turns(
+  messages: Iterable[ModelMessage],
+) -> Iterator[list[ModelMessage]]:
+  """Splits a thread before each user prompt."""
+  turn: list[ModelMessage] = []
+  for message in messages:
+    if (
+      turn
+      and isinstance(message, pydantic_ai_messages.ModelRequest)
+      and any(
+        isinstance(part, pydantic_ai_messages.UserPromptPart) for part in message.parts
+      )
+    ):
+      yield turn
+      turn = []
+    turn.append(message)
+
+  if turn:
+    yield turn
+
+
+class ConversionCache:
+  """
+  LRU of converted messages keyed by their content, so repeated history fetches
+  of a thread reuse the `UIMessage`s converted before, with stable ids. Cached
+  messages are shared between fetches and mustn't be modified.
+  """
+
+  def __init__(
+    self,
+    tool_messages: ToolMessages | ToolMessageTable | None = None,
+    maxsize: int = 4096,
+    artifact_tools: Container[str] = ARTIFACT_TOOLS,
+  ):
+    self.tool_messages = as_tool_message_table(tool_messages)
+    self.maxsize = maxsize
+    self.artifact_tools = artifact_tools
+    self._converted: OrderedDict[str, UIMessage | list[UIMessage]] = OrderedDict()
+
+  def _get(self, key: str) -> UIMessage | list[UIMessage] | None:
+    converted = self._converted.get(key)
+    if converted is not None:
+      self._converted.move_to_end(key)
+    return converted
+
+  def _put(self, key: str, converted: UIMessage | list[UIMessage]) -> None:
+    self._converted[key] = converted
+    if len(self._converted) > self.maxsize:
+      self._converted.popitem(last=False)
+
+  def message(self, message: ModelMessage) -> UIMessage:
+    """Cached `from_pydantic_ai_message` with stable ids."""
+    key = message_key(message)
+    # messages and turns are keyed apart, a one-message turn has the same hash
+    converted = self._get(f"m:{key}")
+    if not isinstance(converted, UIMessage):
+      converted = _convert_message(
+        message, self.tool_messages, _Ids(key), self.artifact_tools
+      )
+      self._put(f"m:{key}", converted)
+    return converted
+
+  def thread(self, messages: Iterable[ModelMessage]) -> Iterator[UIMessage]:
+    """Cached `from_pydantic_ai_messages` with stable ids, one entry per turn."""
+    for turn in _turns(messages):
+      keys = {id(message): message_key(message) for message in turn}
+      key = "t:" + "+".join(keys.values())
+
+      converted = self._get(key)
+      if not isinstance(converted, list):
+        converted = list(
+          _convert_thread(
+            turn,
+            self.tool_messages,
+            lambda message, keys=keys: _Ids(keys[id(message)]),
+            self.artifact_tools,
+          )
+        )
+        self._put(key, converted)
+      yield from converted
+
+
+def _artifact_hash(part: ArtifactPart) -> str:
+  artifact = part.data
+  if artifact.ref is not None:
+    return artifact.ref.hash
+  return content_hash(artifact_content(artifact.data))
+
+
+def artifact_hashes(messages: Iterable[UIMessage]) -> set[str]:
+  """
+  Hashes of the artifact content in `messages`, e.g. those a client has, for
+  `ArtifactChunking.known`.
+  """
+  return {
+    _artifact_hash(part)
+    for message in messages
+    for part in message.parts
+    if isinstance(part, ArtifactPart)
+  }
+
+
+def reference_artifacts(
+  messages: Iterable[UIMessage], known: Container[str]
+) -> Iterator[UIMessage]:
+  """
+  `messages` with the content of artifacts in `known` left out and referenced by
+  hash, for clients that have it already. Messages are copied rather than
+  modified, so cached ones can be passed in.
+  """
+  for message in messages:
+    parts: list[UIMessagePart] = []
+    for part in message.parts:
+      if isinstance(part, ArtifactPart) and part.data.ref is None:
+        artifact = part.data
+        content = artifact_content(artifact.data)
+        digest = content_hash(content)
+        if digest in known:
+          ref = ArtifactRef(hash=digest, size=len(content))
+          part = part.model_copy(
+            update={
+              "data": artifact.model_copy(
+                update={"data": without_content(artifact.data), "ref": ref}
+              )
+            }
+          )
+      parts.append(part)
+
+    if any(new is not old for new, old in zip(parts, message.parts, strict=True)):
+      message = message.model_copy(update={"parts": parts})
+    yield message
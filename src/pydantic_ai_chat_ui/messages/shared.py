@@ -1,7 +1,13 @@
 import enum
+import hashlib
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import (
+  BaseModel,
+  ConfigDict,
+  SerializerFunctionWrapHandler,
+  model_serializer,
+)
 
 
 @enum.verify(enum.UNIQUE)
@@ -11,25 +17,54 @@ class ArtifactType(enum.StrEnum):
 
 
 class FileData(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   name: str
   url: str
   type: str
   size: int
 
 
+class ArtifactRef(BaseModel):
+  """
+  Stands in for content left out of an artifact: sent before it in `chunks`
+  parts, or when there are none, already known to the client by its `hash`.
+  """
+
+  model_config = ConfigDict(defer_build=True)
+
+  hash: str
+  size: int  # characters
+  chunks: int = 0
+
+
 class Artifact[T, K: str](BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   type: K
   data: T
   created_at: int  # timestamp
+  ref: ArtifactRef | None = None
+
+  @model_serializer(mode="wrap")
+  def _omit_missing_ref(self, handler: SerializerFunctionWrapHandler) -> Any:
+    dumped = handler(self)
+    if self.ref is None:
+      dumped.pop("ref", None)
+    return dumped
 
 
 class CodeArtifactData(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   file_name: str
   code: str
   language: str
 
 
 class DocumentArtifactData(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   title: str
   content: str
   type: str
@@ -37,4 +72,20 @@ class DocumentArtifactData(BaseModel):
 
 
 class SourceData(BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   sources: list[dict[str, Any]]
+
+
+def artifact_content(data: CodeArtifactData | DocumentArtifactData) -> str:
+  return data.code if isinstance(data, CodeArtifactData) else data.content
+
+
+def without_content[D: CodeArtifactData | DocumentArtifactData](data: D) -> D:
+  field = "code" if isinstance(data, CodeArtifactData) else "content"
+  return data.model_copy(update={field: ""})
+
+
+def content_hash(content: str) -> str:
+  """Identifies artifact content, the same for the client and across runs."""
+  return hashlib.sha256(content.encode(errors="surrogatepass")).hexdigest()
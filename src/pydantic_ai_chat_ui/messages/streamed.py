@@ -1,7 +1,13 @@
 import enum
 from typing import Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import (
+  BaseModel,
+  ConfigDict,
+  Field,
+  SerializerFunctionWrapHandler,
+  model_serializer,
+)
 
 from pydantic_ai_chat_ui.messages.shared import (
   Artifact,
@@ -23,6 +29,7 @@ class StreamedPartType(enum.StrEnum):
   TEXT_END = "text-end"
   FILE = "data-file"
   ARTIFACT = "data-artifact"
+  ARTIFACT_CHUNK = "data-artifact_chunk"
   EVENT = "data-event"
   SOURCES = "data-sources"
   SUGGESTIONS = "data-suggested_questions"
@@ -64,6 +71,15 @@ class DataPart[T](StreamedMessagePartBase):
 class ChatEvent(BaseModel):
   title: str
   status: DataPartState
+  # e.g. a tool call's arguments, left out when there are none
+  data: Any | None = None
+
+  @model_serializer(mode="wrap")
+  def _omit_missing_data(self, handler: SerializerFunctionWrapHandler) -> Any:
+    dumped = handler(self)
+    if self.data is None:
+      dumped.pop("data", None)
+    return dumped
 
 
 class SuggestedQuestionsData(BaseModel):
@@ -82,6 +98,24 @@ class ArtifactPart(DataPart[CodeArtifact | DocumentArtifact]):
   type: Literal[StreamedPartType.ARTIFACT] = StreamedPartType.ARTIFACT
 
 
+class ArtifactChunk(BaseModel):
+  """Slice `index` of the content of an artifact, identified by its `hash`."""
+
+  hash: str
+  index: int
+  text: str
+
+
+class ArtifactChunkPart(DataPart[ArtifactChunk]):
+  """
+  Transient, so clients get it as data rather than keeping it in the message,
+  to reassemble into the `ArtifactPart` referencing it by hash.
+  """
+
+  type: Literal[StreamedPartType.ARTIFACT_CHUNK] = StreamedPartType.ARTIFACT_CHUNK
+  transient: bool = True
+
+
 class EventPart(DataPart[ChatEvent]):
   type: Literal[StreamedPartType.EVENT] = StreamedPartType.EVENT
 
@@ -107,3 +141,6 @@ class ErrorPart(BaseModel):
 
   def __str__(self):
     return self.model_dump_json(by_alias=True)
+
+
+StreamedPart = StreamedMessagePartBase | ErrorPart
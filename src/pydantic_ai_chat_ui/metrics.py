@@ -0,0 +1,250 @@
+"""
+Per-stream instrumentation for `stream_results`.
+
+Pass `observer=sink.observe()` for each stream; the observer gets callbacks over
+the stream's lifetime and reports timings to an app-wide sink. Streams without
+an observer skip instrumentation entirely.
+"""
+
+import bisect
+import time
+from collections.abc import Mapping
+from typing import Any
+
+from pydantic_ai_chat_ui.tools import DataPartState
+
+
+class StreamObserver:
+  """
+  Receives callbacks over the lifetime of a single stream. Every method is a
+  no-op, so subclasses only override what they need.
+  """
+
+  def run_started(self) -> None:
+    pass
+
+  def first_model_event(self) -> None:
+    pass
+
+  def text_delta(self) -> None:
+    pass
+
+  def first_frame(self) -> None:
+    pass
+
+  def tool_started(self, tool_call_id: str, tool_name: str) -> None:
+    pass
+
+  def tool_finished(
+    self, tool_call_id: str, tool_name: str, status: DataPartState
+  ) -> None:
+    pass
+
+  def result(self, output: Any) -> None:
+    pass
+
+  def run_failed(self, error: Exception) -> None:
+    pass
+
+  def run_cancelled(self) -> None:
+    pass
+
+  def closed(self, frames: int, bytes: int) -> None:
+    pass
+
+
+class MetricsSink:
+  """Base for app-wide sinks aggregating the timings of many streams."""
+
+  def observe(self) -> StreamObserver:
+    return TimingObserver(self)
+
+  def record(
+    self, name: str, value: float, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    raise NotImplementedError
+
+  def add(
+    self, name: str, value: int, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    raise NotImplementedError
+
+
+class TimingObserver(StreamObserver):
+  """Turns stream callbacks into durations and counters reported to a sink."""
+
+  def __init__(self, sink: MetricsSink):
+    self.sink = sink
+    self.started_at = time.perf_counter()
+    self.last_delta_at: float | None = None
+    self.tools: dict[str, float] = {}
+    self.status = "completed"
+
+  def _since_start(self) -> float:
+    return time.perf_counter() - self.started_at
+
+  def run_started(self) -> None:
+    self.started_at = time.perf_counter()
+
+  def first_model_event(self) -> None:
+    self.sink.record("time_to_first_token", self._since_start())
+
+  def text_delta(self) -> None:
+    now = time.perf_counter()
+    if self.last_delta_at is not None:
+      self.sink.record("inter_token_latency", now - self.last_delta_at)
+    self.last_delta_at = now
+
+  def first_frame(self) -> None:
+    self.sink.record("time_to_first_frame", self._since_start())
+
+  def tool_started(self, tool_call_id: str, tool_name: str) -> None:
+    self.tools[tool_call_id] = time.perf_counter()
+
+  def tool_finished(
+    self, tool_call_id: str, tool_name: str, status: DataPartState
+  ) -> None:
+    started_at = self.tools.pop(tool_call_id, None)
+    if started_at is not None:
+      self.sink.record(
+        "tool_duration",
+        time.perf_counter() - started_at,
+        {"tool_name": tool_name, "status": status},
+      )
+
+  def run_failed(self, error: Exception) -> None:
+    self.status = "error"
+
+  def run_cancelled(self) -> None:
+    self.status = "cancelled"
+
+  def closed(self, frames: int, bytes: int) -> None:
+    attributes = {"status": self.status}
+    self.sink.record("stream_duration", self._since_start(), attributes)
+    self.sink.add("streams", 1, attributes)
+    self.sink.add("frames", frames)
+    self.sink.add("bytes", bytes)
+
+
+DEFAULT_BUCKETS = (
+  0.001,
+  0.0025,
+  0.005,
+  0.01,
+  0.025,
+  0.05,
+  0.1,
+  0.25,
+  0.5,
+  1.0,
+  2.5,
+  5.0,
+  10.0,
+  30.0,
+  60.0,
+)
+
+
+class Histogram:
+  def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+    self.buckets = buckets
+    # the last count is the overflow bucket, above the largest bound
+    self.counts = [0] * (len(buckets) + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.min = float("inf")
+    self.max = float("-inf")
+
+  def record(self, value: float) -> None:
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.count += 1
+    self.sum += value
+    self.min = min(self.min, value)
+    self.max = max(self.max, value)
+
+  @property
+  def mean(self) -> float:
+    return self.sum / self.count if self.count else 0.0
+
+  def quantile(self, q: float) -> float:
+    """Upper bound of the bucket holding the q-th quantile."""
+    if not self.count:
+      return 0.0
+
+    rank = q * self.count
+    seen = 0
+    for bound, count in zip(self.buckets, self.counts, strict=False):
+      seen += count
+      if seen >= rank:
+        return min(bound, self.max)
+    return self.max
+
+
+type _Key = tuple[str, frozenset[tuple[str, str]]]
+
+
+class InMemoryMetrics(MetricsSink):
+  """Keeps histograms and counters in process, e.g. for a `/metrics` endpoint."""
+
+  def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+    self.buckets = buckets
+    self.histograms: dict[_Key, Histogram] = {}
+    self.counters: dict[_Key, int] = {}
+
+  @staticmethod
+  def _key(name: str, attributes: Mapping[str, str] | None) -> _Key:
+    return name, frozenset((attributes or {}).items())
+
+  def record(
+    self, name: str, value: float, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    key = self._key(name, attributes)
+    histogram = self.histograms.get(key)
+    if histogram is None:
+      histogram = self.histograms[key] = Histogram(self.buckets)
+    histogram.record(value)
+
+  def add(
+    self, name: str, value: int, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    key = self._key(name, attributes)
+    self.counters[key] = self.counters.get(key, 0) + value
+
+  def histogram(self, name: str, **attributes: str) -> Histogram | None:
+    return self.histograms.get(self._key(name, attributes))
+
+  def counter(self, name: str, **attributes: str) -> int:
+    return self.counters.get(self._key(name, attributes), 0)
+
+
+class OpenTelemetryMetrics(MetricsSink):
+  """Reports to OpenTelemetry instruments, prefixed with `namespace`."""
+
+  def __init__(self, meter: Any | None = None, namespace: str = "chat_ui"):
+    if meter is None:
+      from opentelemetry import metrics
+
+      meter = metrics.get_meter("pydantic_ai_chat_ui")
+
+    self.meter = meter
+    self.namespace = namespace
+    self.histograms: dict[str, Any] = {}
+    self.counters: dict[str, Any] = {}
+
+  def record(
+    self, name: str, value: float, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    histogram = self.histograms.get(name)
+    if histogram is None:
+      histogram = self.meter.create_histogram(f"{self.namespace}.{name}", unit="s")
+      self.histograms[name] = histogram
+    histogram.record(value, attributes=attributes)
+
+  def add(
+    self, name: str, value: int, attributes: Mapping[str, str] | None = None
+  ) -> None:
+    counter = self.counters.get(name)
+    if counter is None:
+      counter = self.meter.create_counter(f"{self.namespace}.{name}")
+      self.counters[name] = counter
+    counter.add(value, attributes=attributes)
@@ -0,0 +1,127 @@
+import asyncio
+import inspect
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_ai import messages as pydantic_ai_messages
+
+logger = logging.getLogger(__name__)
+
+
+StoreMessageHistory = Callable[
+  [pydantic_ai_messages.ModelMessage], Awaitable[None] | None
+]
+StoreMessages = Callable[
+  [list[pydantic_ai_messages.ModelMessage]], Awaitable[None] | None
+]
+
+
+async def _maybe_await(result: Awaitable[None] | None) -> None:
+  if inspect.isawaitable(result):
+    await result
+
+
+class WriteBehindQueue:
+  """
+  Persists message batches from a background worker so that a stream can close
+  as soon as its last frame is sent, rather than after the writes complete.
+
+  Create one per app and `aclose` it on shutdown to flush pending writes.
+  Writes are applied in submission order when `workers` is 1.
+  """
+
+  def __init__(self, workers: int = 1):
+    self._queue: asyncio.Queue[
+      tuple[MessageStore, list[pydantic_ai_messages.ModelMessage]]
+    ] = asyncio.Queue()
+    self._workers_count = workers
+    self._workers: list[asyncio.Task[None]] = []
+
+  def submit(
+    self, store: "MessageStore", messages: list[pydantic_ai_messages.ModelMessage]
+  ) -> None:
+    self._workers = [worker for worker in self._workers if not worker.done()]
+    while len(self._workers) < self._workers_count:
+      self._workers.append(asyncio.create_task(self._run()))
+
+    self._queue.put_nowait((store, messages))
+
+  async def _run(self) -> None:
+    while True:
+      store, messages = await self._queue.get()
+      try:
+        await store.write(messages)
+      except Exception:
+        logger.error("Failed to persist message history", exc_info=True)
+      finally:
+        self._queue.task_done()
+
+  @property
+  def pending(self) -> int:
+    return self._queue.qsize()
+
+  async def join(self) -> None:
+    """Waits until every submitted batch has been written."""
+    await self._queue.join()
+
+  async def aclose(self) -> None:
+    await self.join()
+    for worker in self._workers:
+      worker.cancel()
+    await asyncio.gather(*self._workers, return_exceptions=True)
+    self._workers = []
+
+
+@dataclass(frozen=True)
+class MessageStore:
+  """
+  Configures how `stream_results` persists the new messages of a run.
+
+  `store` is called once per message, or once with the whole list when `bulk` is
+  set, and may be sync or async. Sync callables can be run in a worker thread
+  with `to_thread` to keep blocking I/O off the event loop. With a
+  `write_behind` queue, the write happens in the background after the stream
+  has closed.
+  """
+
+  store: StoreMessageHistory | StoreMessages
+  bulk: bool = False
+  to_thread: bool = False
+  write_behind: WriteBehindQueue | None = None
+
+  async def write(self, messages: list[pydantic_ai_messages.ModelMessage]) -> None:
+    store: Callable[[Any], Awaitable[None] | None] = self.store
+
+    if self.to_thread:
+      if self.bulk:
+        await asyncio.to_thread(store, messages)
+      else:
+        # one thread hop for the whole batch rather than one per message
+        await asyncio.to_thread(lambda: [store(m) for m in messages])
+      return
+
+    if self.bulk:
+      await _maybe_await(store(messages))
+      return
+
+    for message in messages:
+      await _maybe_await(store(message))
+
+  async def save(self, messages: list[pydantic_ai_messages.ModelMessage]) -> None:
+    if self.write_behind is not None:
+      self.write_behind.submit(self, messages)
+      return
+
+    await self.write(messages)
+
+
+async def store_messages(
+  store: StoreMessageHistory | MessageStore,
+  messages: Sequence[pydantic_ai_messages.ModelMessage],
+) -> None:
+  if not isinstance(store, MessageStore):
+    store = MessageStore(store)
+
+  await store.save(list(messages))
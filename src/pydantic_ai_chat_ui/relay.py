@@ -0,0 +1,177 @@
+"""
+Relays the frames of a run between processes, so the worker executing the
+agent doesn't have to be the one holding the client's connection.
+
+The worker publishes the frames of `stream_results` under a run id:
+
+  asyncio.create_task(relay.publish(run_id, stream_results(...)))
+
+and any process sharing the channel serves them:
+
+  StreamingResponse(relay.subscribe(run_id), media_type="text/event-stream")
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import aclosing, suppress
+from pathlib import Path
+
+from pydantic_ai_chat_ui.resume import (
+  InMemoryReplayStore,
+  ReplayStore,
+  ReplayUnavailable,
+)
+
+logger = logging.getLogger(__name__)
+
+# frames are SSE frames, which end with a blank line and never contain one
+FRAME_SEPARATOR = b"\n\n"
+# largest frame a subscriber reads, e.g. an artifact sent whole
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class Relay:
+  """
+  Channel carrying the frames of runs to subscribers, possibly in other
+  processes. Frames are counted from 1 per run, like SSE event ids.
+  """
+
+  async def open(self, run_id: str) -> None:
+    raise NotImplementedError
+
+  async def send(self, run_id: str, frame: str) -> None:
+    raise NotImplementedError
+
+  async def close(self, run_id: str) -> None:
+    raise NotImplementedError
+
+  def subscribe(self, run_id: str, after: int = 0) -> AsyncIterator[str]:
+    """
+    Yields the frames of the run after the first `after`, following it until it
+    ends. Raises `ReplayUnavailable` if the run can't be found.
+    """
+    raise NotImplementedError
+
+  async def publish(self, run_id: str, frames: AsyncIterator[str]) -> None:
+    """Sends every frame of `frames` under `run_id`, then ends the run."""
+    await self.open(run_id)
+    try:
+      async with aclosing(frames):
+        async for frame in frames:
+          await self.send(run_id, frame)
+    finally:
+      await self.close(run_id)
+
+
+class UnixSocketRelay(Relay):
+  """
+  Serves each run published by this process on a Unix domain socket in
+  `directory`, which every process using the relay must share. Frames are kept
+  in `store` so subscribers can join late; the socket stays up for `linger`
+  seconds after the run ends. Subscribers read frames of up to `max_frame_bytes`.
+  """
+
+  def __init__(
+    self,
+    directory: str | os.PathLike[str],
+    store: ReplayStore | None = None,
+    linger: float = 30.0,
+    max_frame_bytes: int = MAX_FRAME_BYTES,
+  ):
+    self.directory = Path(directory)
+    self.store = store or InMemoryReplayStore()
+    self.linger = linger
+    self.max_frame_bytes = max_frame_bytes
+    self._servers: dict[str, asyncio.Server] = {}
+    self._event_ids: dict[str, int] = {}
+    self._retiring: set[asyncio.Task[None]] = set()
+
+  def path(self, run_id: str) -> Path:
+    # run ids are hashed to keep paths short and safe, sockets cap them at ~100
+    digest = hashlib.sha256(run_id.encode()).hexdigest()[:32]
+    return self.directory / f"{digest}.sock"
+
+  async def open(self, run_id: str) -> None:
+    await self.store.start(run_id)
+    self._event_ids[run_id] = 0
+
+    if run_id not in self._servers:
+      path = self.path(run_id)
+      path.unlink(missing_ok=True)
+      self._servers[run_id] = await asyncio.start_unix_server(
+        lambda reader, writer: self._serve(run_id, reader, writer), path
+      )
+
+  async def send(self, run_id: str, frame: str) -> None:
+    event_id = self._event_ids[run_id] = self._event_ids[run_id] + 1
+    await self.store.append(run_id, event_id, frame)
+
+  async def close(self, run_id: str) -> None:
+    await self.store.finish(run_id)
+    self._event_ids.pop(run_id, None)
+
+    task = asyncio.create_task(self._retire(run_id))
+    self._retiring.add(task)
+    task.add_done_callback(self._retiring.discard)
+
+  async def _retire(self, run_id: str) -> None:
+    await asyncio.sleep(self.linger)
+    # the run id may have been reopened for a new turn meanwhile
+    if run_id not in self._event_ids:
+      self._stop(run_id)
+
+  def _stop(self, run_id: str) -> None:
+    server = self._servers.pop(run_id, None)
+    if server is not None:
+      server.close()
+      self.path(run_id).unlink(missing_ok=True)
+
+  async def _serve(
+    self, run_id: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+  ) -> None:
+    try:
+      after = int(await reader.readline() or 0)
+      async with aclosing(self.store.read(run_id, after)) as frames:
+        async for frame in frames:
+          writer.write(frame.encode())
+          await writer.drain()
+    except (ReplayUnavailable, ConnectionError):
+      pass
+    except Exception:
+      logger.error("Failed to relay run %s", run_id, exc_info=True)
+    finally:
+      writer.close()
+      with suppress(ConnectionError):
+        await writer.wait_closed()
+
+  async def subscribe(self, run_id: str, after: int = 0) -> AsyncIterator[str]:
+    try:
+      reader, writer = await asyncio.open_unix_connection(
+        self.path(run_id), limit=self.max_frame_bytes
+      )
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+      raise ReplayUnavailable(f"Unknown run {run_id!r}") from e
+
+    try:
+      writer.write(f"{after}\n".encode())
+      await writer.drain()
+      while True:
+        try:
+          frame = await reader.readuntil(FRAME_SEPARATOR)
+        except asyncio.IncompleteReadError:
+          return
+        yield frame.decode()
+    finally:
+      writer.close()
+      with suppress(ConnectionError):
+        await writer.wait_closed()
+
+  async def aclose(self) -> None:
+    """Stops serving every run, e.g. on app shutdown."""
+    for task in list(self._retiring):
+      task.cancel()
+    for run_id in list(self._servers):
+      self._stop(run_id)
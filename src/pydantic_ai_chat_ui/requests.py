@@ -1,8 +1,124 @@
-from pydantic import BaseModel
+"""
+Request bodies sent by `useChat`, which posts the whole conversation each turn.
 
-from pydantic_ai_chat_ui.messages.full import UIMessage
+`stream_results` only needs the newest message, as history is loaded from your
+own store, so `LazyChatRequest` validates just that one. Earlier messages keep
+their id and role, with their parts validated only if asked for:
+
+  chat_request = parse_lazy_chat_request(await request.body(), RequestLimits())
+  stream_results(chat_request.message, agent, deps, message_history=...)
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, model_validator
+
+from pydantic_ai_chat_ui.messages.full import MessageRole, UIMessage
 
 
 class ChatRequest[U](BaseModel):
+  model_config = ConfigDict(defer_build=True)
+
   id: U | None = None
   messages: list[UIMessage]
+
+
+class RequestTooLarge(ValueError):
+  """A request body over one of its `RequestLimits`."""
+
+
+@dataclass(frozen=True)
+class RequestLimits:
+  """
+  Bounds checked before a body is validated: `max_bytes` before it's even
+  parsed, `max_messages` once it's parsed. `None` disables a limit.
+  """
+
+  max_bytes: int | None = 4 * 1024 * 1024
+  max_messages: int | None = 1000
+
+
+class HistoryMessage(BaseModel):
+  """An earlier message, with its parts left as sent until validated."""
+
+  model_config = ConfigDict(defer_build=True)
+
+  id: str
+  role: MessageRole
+  parts: list[Any] = []
+
+  def to_ui_message(self) -> UIMessage:
+    return UIMessage.model_validate(
+      {"id": self.id, "role": self.role, "parts": self.parts}
+    )
+
+
+class LazyChatRequest[U](BaseModel):
+  """A `ChatRequest` fully validating only its last message."""
+
+  model_config = ConfigDict(defer_build=True)
+
+  id: U | None = None
+  history: list[HistoryMessage]
+  message: UIMessage
+
+  @model_validator(mode="before")
+  @classmethod
+  def _split_messages(cls, data: Any) -> Any:
+    if isinstance(data, dict) and isinstance(data.get("messages"), list):
+      *history, message = data["messages"] or [None]
+      data = {**data, "history": history, "message": message}
+    return data
+
+  @cached_property
+  def messages(self) -> list[UIMessage]:
+    """Every message, validated as `ChatRequest` would."""
+    return [*(message.to_ui_message() for message in self.history), self.message]
+
+
+CHAT_REQUEST_ADAPTER: TypeAdapter[ChatRequest[Any]] = TypeAdapter(ChatRequest[Any])
+LAZY_CHAT_REQUEST_ADAPTER: TypeAdapter[LazyChatRequest[Any]] = TypeAdapter(
+  LazyChatRequest[Any]
+)
+_JSON_ADAPTER: TypeAdapter[Any] = TypeAdapter(Any)
+
+
+def _check_limits(body: bytes | str, limits: RequestLimits) -> Any:
+  """The parsed body, unless it's over `limits`."""
+  if limits.max_bytes is not None and len(body) > limits.max_bytes:
+    raise RequestTooLarge(f"Request body is over {limits.max_bytes} bytes")
+
+  data = _JSON_ADAPTER.validate_json(body)
+  messages = data.get("messages") if isinstance(data, dict) else None
+  if (
+    limits.max_messages is not None
+    and isinstance(messages, list)
+    and len(messages) > limits.max_messages
+  ):
+    raise RequestTooLarge(f"Request has over {limits.max_messages} messages")
+  return data
+
+
+def parse_chat_request(
+  body: bytes | str, limits: RequestLimits | None = None
+) -> ChatRequest[Any]:
+  """
+  Validates a raw request body straight from JSON, skipping the intermediate
+  dict a framework would otherwise build with `json.loads`:
+
+    chat_request = parse_chat_request(await request.body())
+  """
+  if limits is None:
+    return CHAT_REQUEST_ADAPTER.validate_json(body)
+  return CHAT_REQUEST_ADAPTER.validate_python(_check_limits(body, limits))
+
+
+def parse_lazy_chat_request(
+  body: bytes | str, limits: RequestLimits | None = None
+) -> LazyChatRequest[Any]:
+  """Like `parse_chat_request`, but only validating the last message."""
+  if limits is None:
+    return LAZY_CHAT_REQUEST_ADAPTER.validate_json(body)
+  return LAZY_CHAT_REQUEST_ADAPTER.validate_python(_check_limits(body, limits))
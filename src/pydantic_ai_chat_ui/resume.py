@@ -0,0 +1,280 @@
+"""
+Resumable streams: frames carry SSE event ids and are kept in a replay buffer,
+so a client that loses its connection can reconnect with `Last-Event-ID`, get
+the frames it missed, and carry on following the live run instead of
+regenerating the whole answer.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import Unpack
+
+from pydantic_ai import Agent
+from pydantic_ai.output import OutputDataT
+from pydantic_ai.tools import AgentDepsT
+
+from pydantic_ai_chat_ui.heartbeat import Heartbeat
+from pydantic_ai_chat_ui.history import MessageHistory
+from pydantic_ai_chat_ui.messages.full import UIMessage
+from pydantic_ai_chat_ui.messages.streamed import StreamedPart
+from pydantic_ai_chat_ui.metrics import StreamObserver
+from pydantic_ai_chat_ui.streaming import (
+  StreamOptions,
+  _keepalive_frames,
+  _stream_batches,
+  format_event,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayUnavailable(LookupError):
+  """The run is unknown, or the requested frames are no longer buffered."""
+
+
+class ReplayStore:
+  """
+  Backend keeping the frames of each run for replay. Event ids are assigned by
+  the writer, starting at 1 and increasing by one per frame.
+  """
+
+  async def start(self, run_id: str) -> None:
+    """Begins a run, discarding any frames a previous run with the id left."""
+    raise NotImplementedError
+
+  async def append(self, run_id: str, event_id: int, frame: str) -> None:
+    raise NotImplementedError
+
+  async def finish(self, run_id: str) -> None:
+    raise NotImplementedError
+
+  async def check(self, run_id: str, after: int = 0) -> None:
+    """
+    Raises `ReplayUnavailable` if the frames after event id `after` can't be
+    replayed, before any response is started for them.
+    """
+    raise NotImplementedError
+
+  def read(self, run_id: str, after: int = 0) -> AsyncIterator[str]:
+    """
+    Yields the frames after event id `after`, then follows the run live until it
+    finishes. Raises `ReplayUnavailable` if those frames can't be replayed.
+    """
+    raise NotImplementedError
+
+
+class _BufferedRun:
+  def __init__(self, max_frames: int):
+    self.frames: deque[str] = deque(maxlen=max_frames)
+    # event id of self.frames[0]
+    self.first_id = 1
+    self.last_id = 0
+    self.finished_at: float | None = None
+    self.changed = asyncio.Condition()
+
+
+class InMemoryReplayStore(ReplayStore):
+  """
+  Keeps the last `max_frames` frames of every run in a ring buffer. Finished
+  runs stay resumable for `retention` seconds.
+  """
+
+  def __init__(self, max_frames: int = 4096, retention: float = 300.0):
+    self.max_frames = max_frames
+    self.retention = retention
+    self._runs: dict[str, _BufferedRun] = {}
+
+  def _purge(self) -> None:
+    expires_before = time.monotonic() - self.retention
+    for run_id, run in list(self._runs.items()):
+      if run.finished_at is not None and run.finished_at < expires_before:
+        del self._runs[run_id]
+
+  async def start(self, run_id: str) -> None:
+    self._purge()
+    previous = self._runs.get(run_id)
+    self._runs[run_id] = _BufferedRun(self.max_frames)
+    if previous is not None:
+      # release readers still following the replaced run
+      async with previous.changed:
+        previous.finished_at = time.monotonic()
+        previous.changed.notify_all()
+
+  async def append(self, run_id: str, event_id: int, frame: str) -> None:
+    run = self._runs[run_id]
+    async with run.changed:
+      if len(run.frames) == run.frames.maxlen:
+        run.first_id += 1
+      run.frames.append(frame)
+      run.last_id = event_id
+      run.changed.notify_all()
+
+  async def finish(self, run_id: str) -> None:
+    run = self._runs.get(run_id)
+    if run is None:
+      return
+
+    async with run.changed:
+      run.finished_at = time.monotonic()
+      run.changed.notify_all()
+
+  def _run(self, run_id: str, after: int) -> _BufferedRun:
+    run = self._runs.get(run_id)
+    if run is None:
+      raise ReplayUnavailable(f"Unknown run {run_id!r}")
+    if after + 1 < run.first_id:
+      raise ReplayUnavailable(f"Frames after {after} of run {run_id!r} expired")
+    return run
+
+  async def check(self, run_id: str, after: int = 0) -> None:
+    self._run(run_id, after)
+
+  async def read(self, run_id: str, after: int = 0) -> AsyncIterator[str]:
+    run = self._run(run_id, after)
+    cursor = after
+    while True:
+      async with run.changed:
+        while cursor >= run.last_id and run.finished_at is None:
+          await run.changed.wait()
+
+        if cursor + 1 < run.first_id:
+          raise ReplayUnavailable(f"Reader of run {run_id!r} fell behind")
+
+        start = cursor + 1 - run.first_id
+        pending = [run.frames[i] for i in range(start, len(run.frames))]
+        cursor = run.last_id
+        finished = run.finished_at is not None
+
+      for frame in pending:
+        yield frame
+
+      if finished and cursor >= run.last_id:
+        return
+
+
+def parse_last_event_id(value: str | int | None) -> int:
+  """Event id from a `Last-Event-ID` header, 0 when missing or malformed."""
+  if value is None:
+    return 0
+
+  try:
+    return max(int(value), 0)
+  except ValueError:
+    return 0
+
+
+class ResumableRuns:
+  """
+  Runs agent turns in background tasks, independent of any one connection,
+  recording their frames in a `ReplayStore`. Create one per app.
+
+  A run carries on to completion (including persisting its messages) even when
+  every client has disconnected, unless it is cancelled with `cancel`.
+  """
+
+  def __init__(self, store: ReplayStore | None = None):
+    self.store = store or InMemoryReplayStore()
+    self._tasks: dict[str, asyncio.Task[None]] = {}
+
+  async def _record(
+    self,
+    run_id: str,
+    batches: AsyncIterator[list[StreamedPart]],
+    observer: StreamObserver | None,
+    started: asyncio.Event,
+  ) -> None:
+    event_id = size = 0
+    try:
+      started.set()
+      async with aclosing(batches):
+        async for batch in batches:
+          for part in batch:
+            event_id += 1
+            frame = format_event(part, event_id)
+            if observer is not None:
+              if event_id == 1:
+                observer.first_frame()
+              size += len(frame.encode())
+            await self.store.append(run_id, event_id, frame)
+    except Exception:
+      logger.error("Failed to record run %s", run_id, exc_info=True)
+    finally:
+      await self.store.finish(run_id)
+      if observer is not None:
+        observer.closed(event_id, size)
+
+  async def start[D: AgentDepsT, R: OutputDataT](
+    self,
+    run_id: str,
+    user_message: UIMessage,
+    agent: Agent[D, R],
+    deps: D,
+    message_history: MessageHistory,
+    **options: Unpack[StreamOptions],
+  ) -> AsyncIterator[str]:
+    """
+    Starts a run and returns its frames from the beginning, see `stream_results`
+    for the options. Any earlier run with the same id is cancelled. Heartbeats
+    are sent to the reader, outside the event ids.
+    """
+    previous = self._tasks.get(run_id)
+    if previous is not None:
+      # let it finish its frames before the store is reset for the new run
+      previous.cancel()
+      await asyncio.gather(previous, return_exceptions=True)
+    await self.store.start(run_id)
+
+    heartbeat = options.pop("heartbeat", None)
+    batches = _stream_batches(user_message, agent, deps, message_history, **options)
+    started = asyncio.Event()
+    task = asyncio.create_task(
+      self._record(run_id, batches, options.get("observer"), started)
+    )
+    self._tasks[run_id] = task
+    task.add_done_callback(lambda _: self._forget(run_id, task))
+    # a task cancelled before it starts skips its cleanup, leaving readers waiting
+    await started.wait()
+
+    return _keepalive_frames(self.store.read(run_id), heartbeat)
+
+  def _forget(self, run_id: str, task: asyncio.Task[None]) -> None:
+    if self._tasks.get(run_id) is task:
+      del self._tasks[run_id]
+
+  async def resume(
+    self,
+    run_id: str,
+    last_event_id: str | int | None,
+    heartbeat: Heartbeat | None = None,
+  ) -> AsyncIterator[str]:
+    """
+    Replays the frames after `last_event_id`, then follows the live run, with
+    `heartbeat`s while it's idle. Raises `ReplayUnavailable` up front, so the app
+    can fall back to loading persisted history before starting a response.
+    """
+    after = parse_last_event_id(last_event_id)
+    await self.store.check(run_id, after)
+    return _keepalive_frames(self.store.read(run_id, after), heartbeat)
+
+  def is_running(self, run_id: str) -> bool:
+    task = self._tasks.get(run_id)
+    return task is not None and not task.done()
+
+  def cancel(self, run_id: str) -> bool:
+    task = self._tasks.get(run_id)
+    if task is None or task.done():
+      return False
+
+    task.cancel()
+    return True
+
+  async def aclose(self) -> None:
+    """Cancels every run still going, e.g. on app shutdown."""
+    tasks = list(self._tasks.values())
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,251 @@
+"""
+Admission control for agent runs, so spikes queue up rather than every stream
+slowing down together against the model provider's rate limits.
+
+A `Scheduler` admits at most `max_runs` runs at once, and `max_runs_per_key`
+for each key, e.g. a user or tenant. Runs over the limits wait, in arrival order
+or weighted fair between keys, for up to `queue_timeout` seconds. Meanwhile the
+stream shows a pending event, so users see they're queued.
+"""
+
+import asyncio
+import enum
+import itertools
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator, Mapping
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Unpack
+
+from pydantic_ai import Agent
+from pydantic_ai.output import OutputDataT
+from pydantic_ai.tools import AgentDepsT
+
+from pydantic_ai_chat_ui.history import MessageHistory
+from pydantic_ai_chat_ui.messages.full import UIMessage
+from pydantic_ai_chat_ui.messages.streamed import ChatEvent, ErrorPart, EventPart
+from pydantic_ai_chat_ui.metrics import MetricsSink
+from pydantic_ai_chat_ui.streaming import (
+  StreamOptions,
+  _heartbeat_frame,
+  format_event,
+  stream_results,
+)
+from pydantic_ai_chat_ui.tools import DataPartState
+
+
+@enum.verify(enum.UNIQUE)
+class QueuePolicy(enum.StrEnum):
+  FIFO = "fifo"  # in arrival order
+  FAIR = "fair"  # weighted fair between keys, whatever their arrival order
+
+
+@dataclass(frozen=True)
+class Admission:
+  """
+  Limits on concurrent runs, and how long and in what order runs over them wait.
+  With `QueuePolicy.FAIR`, keys get admitted in proportion to their `weights`,
+  1 when missing.
+  """
+
+  max_runs: int = 16
+  max_runs_per_key: int | None = None
+  policy: QueuePolicy = QueuePolicy.FIFO
+  weights: Mapping[str, float] = field(default_factory=dict)
+  queue_timeout: float = 30.0
+  queued_title: str = "Waiting to start"
+  started_title: str = "Started"
+  timeout_message: str = "Too many requests, try again later"
+
+
+class QueueTimeout(Exception):
+  """A run waited longer than `Admission.queue_timeout` to be admitted."""
+
+
+class _Waiter:
+  def __init__(self, key: str, tag: float, enqueued_at: float):
+    self.key = key
+    # waiters are admitted lowest tag first
+    self.tag = tag
+    self.enqueued_at = enqueued_at
+    self.admitted: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+
+class _Key:
+  def __init__(self):
+    self.waiting: deque[_Waiter] = deque()
+    self.running = 0
+    # virtual time the key's latest waiter finishes at, with fair queuing
+    self.finish = 0.0
+
+
+class Scheduler:
+  """
+  Admits agent runs within the limits of `admission`, reporting queue waits to
+  `metrics`. Create one per app, or per worker process.
+  """
+
+  def __init__(
+    self, admission: Admission | None = None, metrics: MetricsSink | None = None
+  ):
+    self.admission = admission or Admission()
+    self.metrics = metrics
+    self._keys: dict[str, _Key] = {}
+    self._running = 0
+    self._queued = 0
+    self._sequence = itertools.count()
+    # virtual time of fair queuing: the tag of the last admitted waiter
+    self._virtual = 0.0
+
+  @property
+  def running(self) -> int:
+    return self._running
+
+  @property
+  def queued(self) -> int:
+    """Runs waiting to be admitted, e.g. to scale workers on."""
+    return self._queued
+
+  def queued_for(self, key: str) -> int:
+    state = self._keys.get(key)
+    return len(state.waiting) if state is not None else 0
+
+  def oldest_wait(self) -> float:
+    """Seconds the longest waiting run has been queued for, 0 with none."""
+    now = asyncio.get_running_loop().time()
+    return max(
+      (
+        now - state.waiting[0].enqueued_at
+        for state in self._keys.values()
+        if state.waiting
+      ),
+      default=0.0,
+    )
+
+  def _tag(self, key: str, state: _Key) -> float:
+    if self.admission.policy == QueuePolicy.FIFO:
+      return next(self._sequence)
+
+    weight = self.admission.weights.get(key, 1.0)
+    state.finish = max(self._virtual, state.finish) + 1 / weight
+    return state.finish
+
+  def _enqueue(self, key: str) -> _Waiter:
+    state = self._keys.get(key)
+    if state is None:
+      state = self._keys[key] = _Key()
+
+    waiter = _Waiter(key, self._tag(key, state), asyncio.get_running_loop().time())
+    state.waiting.append(waiter)
+    self._queued += 1
+    self._admit()
+    return waiter
+
+  def _admit(self) -> None:
+    limit = self.admission.max_runs_per_key
+    while self._running < self.admission.max_runs:
+      heads = [
+        state
+        for state in self._keys.values()
+        if state.waiting and (limit is None or state.running < limit)
+      ]
+      if not heads:
+        return
+
+      state = min(heads, key=lambda state: state.waiting[0].tag)
+      waiter = state.waiting.popleft()
+      self._queued -= 1
+      self._running += 1
+      state.running += 1
+      self._virtual = max(self._virtual, waiter.tag)
+      waiter.admitted.set_result(None)
+
+  def _leave(self, waiter: _Waiter) -> None:
+    """Frees the waiter's slot once its run is done, or its place in the queue."""
+    state = self._keys[waiter.key]
+    if waiter.admitted.done():
+      self._running -= 1
+      state.running -= 1
+    else:
+      waiter.admitted.cancel()
+      state.waiting.remove(waiter)
+      self._queued -= 1
+
+    if not state.waiting and not state.running:
+      # idle keys don't bank credit with fair queuing
+      del self._keys[waiter.key]
+    self._admit()
+
+  def _record_wait(self, waiter: _Waiter, status: str) -> None:
+    if self.metrics is not None:
+      waited = asyncio.get_running_loop().time() - waiter.enqueued_at
+      self.metrics.record("queue_wait", waited, {"status": status})
+      self.metrics.add("admissions", 1, {"status": status})
+
+  async def _wait(self, waiter: _Waiter, interval: float | None) -> AsyncIterator[None]:
+    """Waits to be admitted, yielding every `interval` seconds meanwhile."""
+    deadline = waiter.enqueued_at + self.admission.queue_timeout
+    loop = asyncio.get_running_loop()
+    while not waiter.admitted.done():
+      remaining = deadline - loop.time()
+      if remaining <= 0:
+        raise QueueTimeout(self.admission.timeout_message)
+
+      timeout = remaining if interval is None else min(remaining, interval)
+      done, _ = await asyncio.wait({waiter.admitted}, timeout=timeout)
+      if not done and loop.time() < deadline:
+        yield
+
+  async def stream[D: AgentDepsT, R: OutputDataT](
+    self,
+    key: str,
+    user_message: UIMessage,
+    agent: Agent[D, R],
+    deps: D,
+    message_history: MessageHistory,
+    **options: Unpack[StreamOptions],
+  ) -> AsyncIterator[str]:
+    """
+    `stream_results` once admitted under `key`. While queued, a pending event is
+    shown, and heartbeats are sent with `heartbeat`. Runs that time out waiting
+    end with an error part.
+    """
+    heartbeat = options.get("heartbeat")
+    waiter = self._enqueue(key)
+    try:
+      if not waiter.admitted.done():
+        event_id = f"queue-{uuid.uuid4()}"
+        try:
+          yield format_event(self._event(event_id, DataPartState.PENDING))
+          async with aclosing(
+            self._wait(waiter, heartbeat.interval if heartbeat is not None else None)
+          ) as waiting:
+            async for _ in waiting:
+              yield _heartbeat_frame(heartbeat)
+        except QueueTimeout as e:
+          self._record_wait(waiter, "timeout")
+          yield format_event(self._event(event_id, DataPartState.ERROR))
+          yield format_event(ErrorPart(error_text=str(e)))
+          return
+        except (asyncio.CancelledError, GeneratorExit):
+          # the client went away while queued
+          self._record_wait(waiter, "cancelled")
+          raise
+        yield format_event(self._event(event_id, DataPartState.SUCCESS))
+
+      self._record_wait(waiter, "admitted")
+      frames = stream_results(user_message, agent, deps, message_history, **options)
+      async with aclosing(frames):
+        async for frame in frames:
+          yield frame
+    finally:
+      self._leave(waiter)
+
+  def _event(self, event_id: str, status: DataPartState) -> EventPart:
+    title = {
+      DataPartState.PENDING: self.admission.queued_title,
+      DataPartState.SUCCESS: self.admission.started_title,
+      DataPartState.ERROR: self.admission.timeout_message,
+    }[status]
+    return EventPart(id=event_id, data=ChatEvent(title=title, status=status))
@@ -0,0 +1,93 @@
+"""
+Fast-path JSON serialization for the streamed part types.
+
+The hot streaming parts always have the same shape, so their JSON is written
+directly from pre-built per-type/per-id prefixes instead of going through
+pydantic's generic serializer. Output is byte-identical to
+`model_dump_json(by_alias=True)`; anything without a fast path falls back to it.
+"""
+
+from collections.abc import Callable
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Any
+
+from pydantic_core import to_json
+
+from pydantic_ai_chat_ui.messages.streamed import (
+  ChatEvent,
+  ErrorPart,
+  EventPart,
+  StreamedPart,
+  StreamedPartType,
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+
+_ERROR_PREFIX = f'{{"type":"{StreamedPartType.ERROR}","errorText":'
+
+
+@lru_cache(maxsize=4096)
+def _prefix(part_type: StreamedPartType, id: str) -> str:
+  return f'{{"type":"{part_type}","id":{encode_basestring(id)}'
+
+
+def _text_start(part: TextPartStart) -> str:
+  return _prefix(StreamedPartType.TEXT_START, part.id) + "}"
+
+
+def _text_delta(part: TextPartDelta) -> str:
+  return (
+    _prefix(StreamedPartType.TEXT_DELTA, part.id)
+    + ',"delta":'
+    + encode_basestring(part.delta)
+    + "}"
+  )
+
+
+def _text_end(part: TextPartEnd) -> str:
+  return _prefix(StreamedPartType.TEXT_END, part.id) + "}"
+
+
+def _event_data(data: Any) -> str:
+  if data is None:
+    return ""
+  return ',"data":' + to_json(data).decode()
+
+
+def _event(part: EventPart) -> str:
+  if type(part.data) is not ChatEvent:
+    return part.model_dump_json(by_alias=True)
+
+  return (
+    _prefix(StreamedPartType.EVENT, part.id)
+    + ',"data":{"title":'
+    + encode_basestring(part.data.title)
+    + ',"status":'
+    + encode_basestring(part.data.status)
+    + _event_data(part.data.data)
+    + "}}"
+  )
+
+
+def _error(part: ErrorPart) -> str:
+  return _ERROR_PREFIX + encode_basestring(part.error_text) + "}"
+
+
+_SERIALIZERS: dict[type, Callable[..., str]] = {
+  TextPartStart: _text_start,
+  TextPartDelta: _text_delta,
+  TextPartEnd: _text_end,
+  EventPart: _event,
+  ErrorPart: _error,
+}
+
+
+def serialize_part(part: StreamedPart) -> str:
+  # exact type lookup: subclasses may add fields the fast paths don't know about
+  serializer = _SERIALIZERS.get(type(part))
+  if serializer is None:
+    return part.model_dump_json(by_alias=True)
+
+  return serializer(part)
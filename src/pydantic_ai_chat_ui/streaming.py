@@ -1,35 +1,79 @@
+import asyncio
 import logging
 import uuid
-from collections.abc import AsyncIterator, Callable
-from datetime import datetime
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from contextlib import aclosing, contextmanager, suppress
+from contextvars import ContextVar
+from typing import Any, TypedDict, Unpack
 
 from pydantic_ai import Agent
 from pydantic_ai import messages as pydantic_ai_messages
+from pydantic_ai.agent import AgentRun
 from pydantic_ai.output import OutputDataT
 from pydantic_ai.result import FinalResult
 from pydantic_ai.tools import AgentDepsT
 
+from pydantic_ai_chat_ui.artifacts import (
+  ArtifactChunking,
+  ArtifactStream,
+  ArtifactStreaming,
+  artifact_part,
+  artifact_type,
+  frame_artifact,
+)
+from pydantic_ai_chat_ui.buffering import Buffering, decouple
+from pydantic_ai_chat_ui.coalescing import Coalescing, coalesce_text_deltas
+from pydantic_ai_chat_ui.compaction import (
+  Compaction,
+  compact_history,
+  refresh_in_background,
+)
+from pydantic_ai_chat_ui.heartbeat import (
+  COMMENT_FRAME,
+  HEARTBEAT_PART,
+  Heartbeat,
+  keepalive,
+)
+from pydantic_ai_chat_ui.history import HistoryBudget, MessageHistory, load_history
 from pydantic_ai_chat_ui.messages.full import (
-  ArtifactType,
   DataPartState,
   UIMessage,
   from_ui_message,
 )
 from pydantic_ai_chat_ui.messages.streamed import (
+  ArtifactChunkPart,
   ArtifactPart,
   ChatEvent,
-  CodeArtifact,
   CodeArtifactData,
-  DocumentArtifact,
   DocumentArtifactData,
   ErrorPart,
   EventPart,
-  StreamedMessagePartBase,
+  StreamedPart,
+  SuggestedQuestionsData,
+  SuggestionPart,
   TextPartDelta,
   TextPartEnd,
   TextPartStart,
 )
-from pydantic_ai_chat_ui.tools import ToolMessages, get_tool_message
+from pydantic_ai_chat_ui.metrics import StreamObserver
+from pydantic_ai_chat_ui.persistence import (
+  MessageStore,
+  StoreMessageHistory,
+  store_messages,
+)
+from pydantic_ai_chat_ui.serialization import serialize_part
+from pydantic_ai_chat_ui.suggestions import (
+  Suggestions,
+  suggest_questions,
+  wait_for_questions,
+)
+from pydantic_ai_chat_ui.tool_args import ToolArgsStream, ToolArgsStreaming
+from pydantic_ai_chat_ui.tools import (
+  ToolMessages,
+  ToolMessageTable,
+  as_tool_message_table,
+  get_tool_message,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -37,28 +81,197 @@ logger = logging.getLogger(__name__)
 DATA_PREFIX = "data"
 
 
-def format_event(event: StreamedMessagePartBase) -> str:
-  return f"{DATA_PREFIX}: {event}\n\n"
+def format_event(event: StreamedPart, event_id: int | None = None) -> str:
+  if event_id is None:
+    return f"{DATA_PREFIX}: {serialize_part(event)}\n\n"
+  return f"id: {event_id}\n{DATA_PREFIX}: {serialize_part(event)}\n\n"
 
 
-async def stream_results[D: AgentDepsT, R: OutputDataT](
+# Set while a run executes tools. Pydantic AI runs tool calls in their own tasks,
+# which inherit this, so they can be found and cancelled if the client goes away.
+_tool_scope: ContextVar[object | None] = ContextVar("_tool_scope", default=None)
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+@contextmanager
+def _tool_tasks_scope(scope: object) -> Iterator[None]:
+  token = _tool_scope.set(scope)
+  try:
+    yield
+  finally:
+    # a generator closed from another task runs this in a different context
+    with suppress(ValueError):
+      _tool_scope.reset(token)
+
+
+def _cancel_tool_tasks(scope: object) -> None:
+  current = asyncio.current_task()
+  for task in asyncio.all_tasks():
+    if (
+      task is not current
+      and not task.done()
+      and task.get_context().get(_tool_scope) is scope
+    ):
+      task.cancel()
+
+
+def _track_text(
+  event: pydantic_ai_messages.ModelResponseStreamEvent, partial_text: list[str]
+) -> None:
+  match event:
+    case pydantic_ai_messages.PartStartEvent(
+      part=pydantic_ai_messages.TextPart(content=content)
+    ):
+      partial_text.append(content)
+    case pydantic_ai_messages.PartDeltaEvent(
+      delta=pydantic_ai_messages.TextPartDelta(content_delta=content_delta)
+    ):
+      partial_text.append(content_delta)
+
+
+def _start_suggestions(
+  user_message: UIMessage, answer_text: list[str], suggestions: Suggestions
+) -> "asyncio.Task[list[str]]":
+  question = from_ui_message(user_message)
+  return asyncio.create_task(
+    suggest_questions(
+      question if isinstance(question, str) else "",
+      "".join(answer_text),
+      suggestions,
+    )
+  )
+
+
+def _partial_messages(
+  agent_run: AgentRun, partial_text: list[str]
+) -> list[pydantic_ai_messages.ModelMessage]:
+  """Messages completed before a run was cancelled, plus any partial answer."""
+  messages = agent_run.ctx.state.message_history[agent_run.ctx.deps.new_message_index :]
+
+  # a response whose tool calls never got results can't be replayed to a model
+  if (
+    messages
+    and isinstance(messages[-1], pydantic_ai_messages.ModelResponse)
+    and any(
+      isinstance(part, pydantic_ai_messages.ToolCallPart) for part in messages[-1].parts
+    )
+  ):
+    messages = messages[:-1]
+
+  if partial_text:
+    messages.append(
+      pydantic_ai_messages.ModelResponse(
+        parts=[pydantic_ai_messages.TextPart(content="".join(partial_text))]
+      )
+    )
+
+  return messages
+
+
+async def _store_partial_messages(
+  store: StoreMessageHistory | MessageStore,
+  messages: list[pydantic_ai_messages.ModelMessage],
+) -> None:
+  try:
+    await store_messages(store, messages)
+  except Exception:
+    logger.error("Failed to persist partial message history", exc_info=True)
+
+
+def _in_background(write: Coroutine[Any, Any, None]) -> asyncio.Task[None]:
+  task = asyncio.create_task(write)
+  _background_tasks.add(task)
+  task.add_done_callback(_background_tasks.discard)
+  return task
+
+
+def _persist_in_background(
+  store: StoreMessageHistory | MessageStore,
+  messages: list[pydantic_ai_messages.ModelMessage],
+) -> None:
+  # the cancelled task can't await the write: cancel scopes (e.g. starlette's)
+  # would cancel it again, so the write gets a task of its own
+  _in_background(_store_partial_messages(store, messages))
+
+
+def _frame_artifact(
+  part: ArtifactPart, chunking: ArtifactChunking | None
+) -> Iterator[ArtifactPart | ArtifactChunkPart]:
+  # partial artifacts too, or they'd grow past the frame size as they stream
+  if chunking is None:
+    yield part
+  else:
+    yield from frame_artifact(part, chunking)
+
+
+def _tool_event(
+  tool_call_id: str,
+  tool_name: str,
+  status: DataPartState,
+  tool_message_table: ToolMessageTable,
+  args: object = None,
+) -> EventPart:
+  return EventPart(
+    id=tool_call_id,
+    data=ChatEvent(
+      title=tool_message_table.get(tool_name, status),
+      status=status,
+      data=args,
+    ),
+  )
+
+
+async def _stream_parts[D: AgentDepsT, R: OutputDataT](
   user_message: UIMessage,
   agent: Agent[D, R],
   deps: D,
-  message_history: list[pydantic_ai_messages.ModelMessage],
-  tool_messages: ToolMessages | None = None,
-  store_message_history: Callable[[pydantic_ai_messages.ModelMessage], None]
-  | None = None,
-) -> AsyncIterator[str]:
+  message_history: MessageHistory,
+  tool_messages: ToolMessages | ToolMessageTable | None = None,
+  store_message_history: StoreMessageHistory | MessageStore | None = None,
+  observer: StreamObserver | None = None,
+  history_budget: HistoryBudget | None = None,
+  compaction: Compaction | None = None,
+  tool_args: ToolArgsStreaming | None = None,
+  artifacts: ArtifactStreaming | None = None,
+  artifact_chunking: ArtifactChunking | None = None,
+  suggestions: Suggestions | None = None,
+) -> AsyncIterator[StreamedPart]:
   message_started = False
   message_streamed = False
+  model_responded = False
   active_tool_ids = {}
+  agent_run: AgentRun | None = None
+  # text of the model response currently streaming, not yet in the run history
+  partial_text: list[str] = []
+  tool_scope = object()
+  # arguments of tool calls as they're generated, when streamed
+  arguments = ToolArgsStream(tool_args) if tool_args is not None else None
+  # artifacts output by output tools, as they're generated, when streamed
+  artifact_updates = ArtifactStream(artifacts) if artifacts is not None else None
+  # the answer so far, until suggestions are started from it
+  answer_text: list[str] = []
+  answer_size = 0
+  suggestion_task: asyncio.Task[list[str]] | None = None
+  # whether the run's messages are being written, so not as partial ones again
+  storing = False
 
   try:
+    tool_message_table = as_tool_message_table(tool_messages)
+    if observer is not None:
+      observer.run_started()
+
+    if history_budget is not None or not isinstance(message_history, list):
+      message_history = await load_history(message_history, history_budget)
+
+    prompt_history = message_history
+    if compaction is not None:
+      prompt_history = await compact_history(message_history, compaction)
+
     async with agent.iter(
       from_ui_message(user_message),
       deps=deps,
-      message_history=message_history,
+      message_history=prompt_history,
     ) as agent_run:
       # pydantic ai text messages don't have ids, it doesn't matter for the
       # consuming frontend, as long as they are consistent between data parts
@@ -69,150 +282,457 @@ async def stream_results[D: AgentDepsT, R: OutputDataT](
           continue
 
         elif Agent.is_model_request_node(node):
+          # tool call deltas may only identify their part by its index
+          tool_call_ids: dict[int, str] = {}
           async with node.stream(agent_run.ctx) as stream:
             async for event in stream:
+              if store_message_history is not None:
+                _track_text(event, partial_text)
+
+              if suggestions is not None and suggestion_task is None:
+                tracked = len(answer_text)
+                _track_text(event, answer_text)
+                if len(answer_text) > tracked:
+                  answer_size += len(answer_text[-1])
+                if answer_size >= suggestions.after:
+                  # overlaps the rest of the answer
+                  suggestion_task = _start_suggestions(
+                    user_message, answer_text, suggestions
+                  )
+
+              if not model_responded:
+                model_responded = True
+                if observer is not None:
+                  observer.first_model_event()
+
               if isinstance(event, pydantic_ai_messages.PartStartEvent):
                 match event.part:
                   case pydantic_ai_messages.TextPart():
                     message_started = True
-                    yield format_event(TextPartStart(id=message_id))
+                    yield TextPartStart(id=message_id)
 
                   case pydantic_ai_messages.ToolCallPart(
                     tool_call_id=tool_call_id,
                     tool_name=tool_name,
                   ):
                     active_tool_ids[tool_call_id] = tool_name
-                    title = get_tool_message(
-                      tool_name, DataPartState.PENDING, tool_messages
-                    )
-                    yield format_event(
-                      EventPart(
-                        id=tool_call_id,
-                        data=ChatEvent(
-                          title=title,
-                          status=DataPartState.PENDING,
-                        ),
-                      )
+                    tool_call_ids[event.index] = tool_call_id
+                    title = tool_message_table.get(tool_name, DataPartState.PENDING)
+                    tool_def = None
+                    if arguments is not None or artifact_updates is not None:
+                      tool_manager = agent_run.ctx.deps.tool_manager
+                      tool_def = tool_manager.get_tool_def(tool_name)
+                    if (
+                      arguments is not None
+                      and tool_def is not None
+                      and tool_def.kind == "output"
+                    ):
+                      # the arguments are the output, e.g. an artifact, not shown
+                      arguments.skip(tool_call_id)
+                    yield EventPart(
+                      id=tool_call_id,
+                      data=ChatEvent(
+                        title=title,
+                        status=DataPartState.PENDING,
+                        data=arguments.feed(tool_call_id, event.part.args)
+                        if arguments is not None
+                        else None,
+                      ),
                     )
 
+                    if artifact_updates is not None:
+                      kind = artifact_type(tool_def)
+                      if kind is not None:
+                        artifact_updates.start(tool_call_id, kind)
+                        update = artifact_updates.feed(tool_call_id, event.part.args)
+                        if update is not None:
+                          for frame in _frame_artifact(update, artifact_chunking):
+                            yield frame
+
               elif isinstance(
                 event, pydantic_ai_messages.PartDeltaEvent
               ) and isinstance(event.delta, pydantic_ai_messages.TextPartDelta):
                 message_streamed = True
-                yield format_event(
-                  TextPartDelta(
-                    id=message_id, delta=event.delta.content_delta
-                  )  # pragma: no cover
+                if observer is not None:
+                  observer.text_delta()
+                yield TextPartDelta(
+                  id=message_id, delta=event.delta.content_delta
+                )  # pragma: no cover
+
+              elif isinstance(
+                event, pydantic_ai_messages.PartDeltaEvent
+              ) and isinstance(event.delta, pydantic_ai_messages.ToolCallPartDelta):
+                tool_call_id = event.delta.tool_call_id or tool_call_ids.get(
+                  event.index
                 )
+                if tool_call_id is not None and artifact_updates is not None:
+                  update = artifact_updates.feed(tool_call_id, event.delta.args_delta)
+                  if update is not None:
+                    for frame in _frame_artifact(update, artifact_chunking):
+                      yield frame
+
+                if arguments is not None and tool_call_id in active_tool_ids:
+                  args = arguments.feed(tool_call_id, event.delta.args_delta)
+                  if args is not None:
+                    yield _tool_event(
+                      tool_call_id,
+                      active_tool_ids[tool_call_id],
+                      DataPartState.PENDING,
+                      tool_message_table,
+                      args,
+                    )
+
+          if arguments is not None:
+            # the last arguments of each call, if held back by the interval
+            for tool_call_id, args in arguments.flush():
+              if tool_call_id in active_tool_ids:
+                yield _tool_event(
+                  tool_call_id,
+                  active_tool_ids[tool_call_id],
+                  DataPartState.PENDING,
+                  tool_message_table,
+                  args,
+                )
+
+          partial_text.clear()
 
         elif Agent.is_call_tools_node(node):
-          async with node.stream(agent_run.ctx) as stream:
-            async for event in stream:
-              match event:
-                case pydantic_ai_messages.FunctionToolCallEvent(part=part):
-                  # Tool call starting - send pending status
-                  active_tool_ids[part.tool_call_id] = part.tool_name
-                  yield format_event(
-                    EventPart(
-                      id=part.tool_call_id,
-                      data=ChatEvent(
-                        title=get_tool_message(
-                          part.tool_name, DataPartState.PENDING, tool_messages
-                        ),
-                        status=DataPartState.PENDING,
-                      ),
+          with _tool_tasks_scope(tool_scope):
+            async with node.stream(agent_run.ctx) as stream:
+              async for event in stream:
+                match event:
+                  case pydantic_ai_messages.FunctionToolCallEvent(part=part):
+                    # Tool call starting - send pending status
+                    active_tool_ids[part.tool_call_id] = part.tool_name
+                    if observer is not None:
+                      observer.tool_started(part.tool_call_id, part.tool_name)
+                    yield _tool_event(
+                      part.tool_call_id,
+                      part.tool_name,
+                      DataPartState.PENDING,
+                      tool_message_table,
+                      arguments.args(part.tool_call_id)
+                      if arguments is not None
+                      else None,
                     )
-                  )
 
-                case pydantic_ai_messages.FunctionToolResultEvent(
-                  tool_call_id=tool_call_id, result=result
-                ):
-                  # Tool call completed - send success status
-                  del active_tool_ids[tool_call_id]
-                  yield format_event(
-                    EventPart(
-                      id=tool_call_id,
-                      data=ChatEvent(
-                        title=get_tool_message(
-                          result.tool_name, DataPartState.SUCCESS, tool_messages
-                        ),
-                        status=DataPartState.SUCCESS,
-                      ),
+                  case pydantic_ai_messages.FunctionToolResultEvent(
+                    tool_call_id=tool_call_id, result=result
+                  ):
+                    # Tool call completed - send success status
+                    del active_tool_ids[tool_call_id]
+                    if observer is not None:
+                      observer.tool_finished(
+                        tool_call_id,
+                        result.tool_name,
+                        DataPartState.ERROR
+                        if isinstance(result, pydantic_ai_messages.RetryPromptPart)
+                        else DataPartState.SUCCESS,
+                      )
+                    yield _tool_event(
+                      tool_call_id,
+                      result.tool_name,
+                      DataPartState.SUCCESS,
+                      tool_message_table,
+                      arguments.pop(tool_call_id) if arguments is not None else None,
                     )
-                  )
 
         elif Agent.is_end_node(node) and isinstance(node.data, FinalResult):
+          if observer is not None:
+            observer.result(node.data.output)
+
           if node.data.tool_call_id:
             active_tool_ids.pop(node.data.tool_call_id, None)
-            yield format_event(
-              EventPart(
-                id=node.data.tool_call_id,
-                data=ChatEvent(
-                  title=get_tool_message(
-                    node.data.tool_name, DataPartState.SUCCESS, tool_messages
-                  ),
-                  status=DataPartState.SUCCESS,
-                ),
-              )
+            yield _tool_event(
+              node.data.tool_call_id,
+              node.data.tool_name,
+              DataPartState.SUCCESS,
+              tool_message_table,
+              arguments.pop(node.data.tool_call_id) if arguments is not None else None,
             )
 
           if not message_started:
-            yield format_event(TextPartStart(id=message_id))
+            yield TextPartStart(id=message_id)
 
           if isinstance(node.data.output, str) and not message_streamed:
-            yield format_event(
-              TextPartDelta(
-                id=message_id, delta=node.data.output.lstrip()
-              )  # pragma: no cover
-            )
-
-          elif isinstance(node.data.output, CodeArtifactData):
-            yield format_event(
-              ArtifactPart(
-                id=node.data.tool_call_id,
-                data=CodeArtifact(
-                  data=node.data.output,
-                  created_at=int(datetime.now().timestamp()),
-                  type=ArtifactType.CODE,
-                ),
-              )
-            )
+            yield TextPartDelta(
+              id=message_id, delta=node.data.output.lstrip()
+            )  # pragma: no cover
 
-          elif isinstance(node.data.output, DocumentArtifactData):
-            yield format_event(
-              ArtifactPart(
-                id=node.data.tool_call_id,
-                data=DocumentArtifact(
-                  data=node.data.output,
-                  created_at=int(datetime.now().timestamp()),
-                  type=ArtifactType.DOCUMENT,
-                ),
-              )
+          elif isinstance(node.data.output, CodeArtifactData | DocumentArtifactData):
+            # replaces any partial artifact sent while it was generated
+            final = artifact_part(
+              node.data.tool_call_id,
+              node.data.output,
+              artifact_updates.pop(node.data.tool_call_id)
+              if artifact_updates is not None
+              else None,
             )
+            for frame in _frame_artifact(final, artifact_chunking):
+              yield frame
 
           # End of message: close text and reset per-message state
-          yield format_event(TextPartEnd(id=message_id))
+          yield TextPartEnd(id=message_id)
           active_tool_ids.clear()
           message_streamed = False
 
-      for message in agent_run.result.new_messages():
-        if store_message_history is not None:
-          store_message_history(message)
+      if suggestions is not None:
+        if suggestion_task is None:
+          suggestion_task = _start_suggestions(user_message, answer_text, suggestions)
+        questions = await wait_for_questions(suggestion_task, suggestions.timeout)
+        if questions:
+          yield SuggestionPart(
+            id=str(uuid.uuid4()), data=SuggestedQuestionsData(questions=questions)
+          )
+
+      if store_message_history is not None:
+        # a disconnect mid-write leaves the write to finish in the background
+        storing = True
+        await asyncio.shield(
+          _in_background(
+            store_messages(store_message_history, agent_run.result.new_messages())
+          )
+        )
+
+      if compaction is not None:
+        # summarize for the next turn, off the critical path of this one
+        refresh_in_background(
+          [*message_history, *agent_run.result.new_messages()], compaction
+        )
 
   except Exception as e:
     logger.error("Streaming failed", exc_info=True)
+    if observer is not None:
+      observer.run_failed(e)
 
     # clear out active tool calls, otherwise they'll be stuck as pending
     for tool_id, tool_name in active_tool_ids.items():
-      yield format_event(
-        EventPart(
-          id=tool_id,
-          data=ChatEvent(
-            title=get_tool_message(tool_name, DataPartState.ERROR, tool_messages),
-            status=DataPartState.ERROR,
-            # TODO: with optional args/data
-          ),
-        )
+      if observer is not None:
+        observer.tool_finished(tool_id, tool_name, DataPartState.ERROR)
+      yield EventPart(
+        id=tool_id,
+        data=ChatEvent(
+          title=get_tool_message(tool_name, DataPartState.ERROR, tool_messages),
+          status=DataPartState.ERROR,
+          data=arguments.args(tool_id) if arguments is not None else None,
+        ),
+      )
+
+    yield ErrorPart(error_text=str(e))
+
+  except (asyncio.CancelledError, GeneratorExit):
+    # the client went away: stop in-flight tools rather than letting them run on
+    _cancel_tool_tasks(tool_scope)
+    if observer is not None:
+      observer.run_cancelled()
+
+    if store_message_history is not None and agent_run is not None and not storing:
+      _persist_in_background(
+        store_message_history, _partial_messages(agent_run, partial_text)
       )
 
-    yield format_event(ErrorPart(error_text=str(e)))
+    raise
+
+  finally:
+    if suggestion_task is not None:
+      suggestion_task.cancel()
+
+
+class StreamOptions(TypedDict, total=False):
+  """Optional keyword arguments shared by `stream_results` and its variants."""
+
+  tool_messages: ToolMessages | ToolMessageTable | None
+  store_message_history: StoreMessageHistory | MessageStore | None
+  coalesce: Coalescing | None
+  observer: StreamObserver | None
+  buffer: Buffering | None
+  heartbeat: Heartbeat | None
+  history_budget: HistoryBudget | None
+  compaction: Compaction | None
+  tool_args: ToolArgsStreaming | None
+  artifacts: ArtifactStreaming | None
+  artifact_chunking: ArtifactChunking | None
+  suggestions: Suggestions | None
+
+
+async def _single_parts(
+  parts: AsyncIterator[StreamedPart],
+) -> AsyncIterator[list[StreamedPart]]:
+  async with aclosing(parts):
+    async for part in parts:
+      yield [part]
+
+
+def _heartbeat_frame(heartbeat: Heartbeat | None) -> str:
+  if heartbeat is not None and heartbeat.data_part:
+    return format_event(HEARTBEAT_PART)
+  return COMMENT_FRAME
+
+
+def _keepalive_frames(
+  frames: AsyncIterator[str], heartbeat: Heartbeat | None
+) -> AsyncIterator[str]:
+  """
+  `frames` with a heartbeat frame after every idle interval, for readers apart
+  from the run, whose heartbeats aren't the run's empty batches.
+  """
+  if heartbeat is None:
+    return frames
+  return keepalive(frames, heartbeat.interval, _heartbeat_frame(heartbeat))
+
+
+def _stream_batches[D: AgentDepsT, R: OutputDataT](
+  user_message: UIMessage,
+  agent: Agent[D, R],
+  deps: D,
+  message_history: MessageHistory,
+  tool_messages: ToolMessages | ToolMessageTable | None = None,
+  store_message_history: StoreMessageHistory | MessageStore | None = None,
+  coalesce: Coalescing | None = None,
+  observer: StreamObserver | None = None,
+  buffer: Buffering | None = None,
+  heartbeat: Heartbeat | None = None,
+  history_budget: HistoryBudget | None = None,
+  compaction: Compaction | None = None,
+  tool_args: ToolArgsStreaming | None = None,
+  artifacts: ArtifactStreaming | None = None,
+  artifact_chunking: ArtifactChunking | None = None,
+  suggestions: Suggestions | None = None,
+) -> AsyncIterator[list[StreamedPart]]:
+  """
+  Runs the agent and yields its parts grouped by flush. With `heartbeat`, an
+  empty batch marks each idle interval.
+  """
+  parts = _stream_parts(
+    user_message,
+    agent,
+    deps,
+    message_history,
+    tool_messages=tool_messages,
+    store_message_history=store_message_history,
+    observer=observer,
+    history_budget=history_budget,
+    compaction=compaction,
+    tool_args=tool_args,
+    artifacts=artifacts,
+    artifact_chunking=artifact_chunking,
+    suggestions=suggestions,
+  )
+
+  if buffer is not None:
+    parts = decouple(parts, buffer)
+
+  if coalesce is not None:
+    batches = coalesce_text_deltas(parts, coalesce)
+  else:
+    batches = _single_parts(parts)
+
+  if heartbeat is not None:
+    batches = keepalive(batches, heartbeat.interval, [])
+  return batches
+
+
+async def stream_results[D: AgentDepsT, R: OutputDataT](
+  user_message: UIMessage,
+  agent: Agent[D, R],
+  deps: D,
+  message_history: MessageHistory,
+  tool_messages: ToolMessages | ToolMessageTable | None = None,
+  store_message_history: StoreMessageHistory | MessageStore | None = None,
+  coalesce: Coalescing | None = None,
+  observer: StreamObserver | None = None,
+  buffer: Buffering | None = None,
+  heartbeat: Heartbeat | None = None,
+  history_budget: HistoryBudget | None = None,
+  compaction: Compaction | None = None,
+  tool_args: ToolArgsStreaming | None = None,
+  artifacts: ArtifactStreaming | None = None,
+  artifact_chunking: ArtifactChunking | None = None,
+  suggestions: Suggestions | None = None,
+) -> AsyncIterator[str]:
+  batches = _stream_batches(
+    user_message,
+    agent,
+    deps,
+    message_history,
+    tool_messages=tool_messages,
+    store_message_history=store_message_history,
+    coalesce=coalesce,
+    observer=observer,
+    buffer=buffer,
+    heartbeat=heartbeat,
+    history_budget=history_budget,
+    compaction=compaction,
+    tool_args=tool_args,
+    artifacts=artifacts,
+    artifact_chunking=artifact_chunking,
+    suggestions=suggestions,
+  )
+  beat = _heartbeat_frame(heartbeat)
+
+  if observer is None:
+    async with aclosing(batches):
+      async for batch in batches:
+        if not batch:
+          yield beat
+        for part in batch:
+          yield format_event(part)
+    return
+
+  frames = size = 0
+  try:
+    async with aclosing(batches):
+      async for batch in batches:
+        if not batch:
+          yield beat
+        for part in batch:
+          frame = format_event(part)
+          if not frames:
+            observer.first_frame()
+          frames += 1
+          size += len(frame.encode())
+          yield frame
+  finally:
+    observer.closed(frames, size)
+
+
+async def stream_results_bytes[D: AgentDepsT, R: OutputDataT](
+  user_message: UIMessage,
+  agent: Agent[D, R],
+  deps: D,
+  message_history: MessageHistory,
+  join_frames: bool = True,
+  **options: Unpack[StreamOptions],
+) -> AsyncIterator[bytes]:
+  """
+  Same as `stream_results`, but yields UTF-8 encoded frames ready to be written
+  to an ASGI server as-is. With `join_frames`, every frame of a flush (see
+  `coalesce`) is written as one chunk, saving a write per frame.
+  """
+  batches = _stream_batches(user_message, agent, deps, message_history, **options)
+  observer = options.get("observer")
+  beat = _heartbeat_frame(options.get("heartbeat")).encode()
+
+  frames = size = 0
+  try:
+    async with aclosing(batches):
+      async for batch in batches:
+        if not batch:
+          yield beat
+          continue
+
+        if join_frames:
+          chunks = ["".join(map(format_event, batch)).encode()]
+        else:
+          chunks = [format_event(part).encode() for part in batch]
+
+        for chunk in chunks:
+          if observer is not None:
+            if not frames:
+              observer.first_frame()
+            frames += len(batch) if join_frames else 1
+            size += len(chunk)
+          yield chunk
+  finally:
+    if observer is not None:
+      observer.closed(frames, size)
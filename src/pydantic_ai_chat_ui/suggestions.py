@@ -0,0 +1,67 @@
+"""
+Follow-up questions suggested alongside the answer, rather than by a second call
+once the stream has ended.
+
+A suggester agent starts as soon as enough of the answer has streamed, so it runs
+while the rest is generated. Its questions are sent as a
+`data-suggested_questions` part before the stream closes, or left out if they
+aren't ready within `timeout` of the answer ending.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_ai import Agent
+
+logger = logging.getLogger(__name__)
+
+SUGGESTIONS_PROMPT = (
+  "Suggest {count} short follow-up questions the user could ask next, based on "
+  "their question and the start of the answer below. Write them as the user "
+  "would, without repeating what's already answered."
+)
+
+
+@dataclass(frozen=True)
+class Suggestions:
+  """
+  Suggests up to `count` questions with `suggester`, starting once `after`
+  characters of the answer have streamed, or when it ends if it's shorter. The
+  stream waits at most `timeout` seconds for them after the answer.
+  """
+
+  suggester: Agent[Any, list[str]]
+  count: int = 3
+  after: int = 400
+  timeout: float = 2.0
+  prompt: str = SUGGESTIONS_PROMPT
+
+
+async def suggest_questions(
+  question: str, answer: str, suggestions: Suggestions
+) -> list[str]:
+  prompt = suggestions.prompt.format(count=suggestions.count)
+  result = await suggestions.suggester.run(
+    f"{prompt}\n\nUser: {question}\n\nAssistant: {answer}"
+  )
+  questions = [q.strip() for q in result.output if q.strip()]
+  return questions[: suggestions.count]
+
+
+async def wait_for_questions(
+  task: "asyncio.Task[list[str]]", timeout: float
+) -> list[str] | None:
+  """The suggested questions, or None if they failed or took too long."""
+  done, _ = await asyncio.wait({task}, timeout=timeout)
+  if not done:
+    task.cancel()
+    logger.info("Suggested questions timed out after %ss", timeout)
+    return None
+
+  try:
+    return task.result()
+  except Exception:
+    logger.error("Failed to suggest questions", exc_info=True)
+    return None
@@ -0,0 +1,229 @@
+"""
+Tool call arguments streamed while the model generates them, so the UI can show
+what a tool is about to be called with rather than a static pending event.
+"""
+
+import math
+import re
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_core import from_json
+
+
+@dataclass(frozen=True)
+class ToolArgsStreaming:
+  """
+  Sends the arguments parsed so far as the `data` of the call's pending event,
+  at most every `interval` seconds per tool call, and no more than `rate` bytes
+  of them a second. Output tools' arguments aren't sent.
+  """
+
+  interval: float = 0.1
+  rate: int = 256 * 1024
+
+
+# characters that matter outside and inside of strings
+_STRUCTURE = re.compile(r'[{}\[\]",]')
+_STRING_END = re.compile(r'["\\]')
+# a backslash escape cut off by the end of a chunk, e.g. `\` or `\u00`
+_TRAILING_ESCAPE = re.compile(r"(\\+)(u[0-9a-fA-F]{0,3})?$")
+
+
+class PartialJson:
+  """
+  A JSON document arriving in chunks, parsed as far as it goes.
+
+  Only new text is scanned for structure. Complete members of the top-level
+  object or array are parsed once and kept, so reading `value` re-parses just
+  the member still arriving, and only that member's text is held on to.
+  """
+
+  def __init__(self):
+    # text of the member still arriving, as it came in
+    self._chunks: list[str] = []
+    self._depth = 0
+    self._in_string = False
+    self._escaped = False
+    self._root: dict[str, Any] | list[Any] | None = None
+    self._scalar = False
+    self._closed = False
+
+  def feed(self, chunk: str) -> None:
+    if self._closed or not chunk:
+      return
+
+    if self._root is None and not self._scalar:
+      stripped = chunk.lstrip()
+      if not stripped:
+        return
+      if stripped[0] not in "{[":
+        # not a container, so there are no members to split off
+        self._scalar = True
+    if self._scalar:
+      self._chunks.append(chunk)
+    else:
+      self._scan(chunk)
+
+  def _scan(self, chunk: str) -> None:
+    """Splits complete members off, carrying the scanner state across chunks."""
+    start = index = 0
+    while index < len(chunk):
+      if self._in_string:
+        if self._escaped:
+          index += 1
+          self._escaped = False
+          continue
+
+        match = _STRING_END.search(chunk, index)
+        if match is None:
+          break
+        index = match.end()
+        if match.group() == "\\":
+          self._escaped = True
+        else:
+          self._in_string = False
+        continue
+
+      match = _STRUCTURE.search(chunk, index)
+      if match is None:
+        break
+      index = match.end()
+
+      match match.group():
+        case '"':
+          self._in_string = True
+        case "{" | "[" as bracket:
+          self._depth += 1
+          if self._depth == 1:
+            self._root = {} if bracket == "{" else []
+            start = index
+        case "}" | "]":
+          self._depth -= 1
+          if self._depth == 0:
+            self._add_member(chunk[start : index - 1])
+            self._closed = True
+            return
+        case ",":
+          if self._depth == 1:
+            self._add_member(chunk[start : index - 1])
+            start = index
+
+    if self._root is not None:
+      self._chunks.append(chunk[start:])
+
+  def _add_member(self, text: str) -> None:
+    text = "".join(self._chunks) + text
+    self._chunks = []
+    if not text.strip():
+      return
+    if isinstance(self._root, dict):
+      self._root.update(from_json("{" + text + "}"))
+    elif self._root is not None:
+      self._root.append(from_json(text))
+
+  @property
+  def value(self) -> Any:
+    """Everything parsed so far, with incomplete strings and containers cut off."""
+    tail = "".join(self._chunks)
+    if self._in_string:
+      # partial parsing drops a string with a half escape, cut the escape instead
+      match = _TRAILING_ESCAPE.search(tail)
+      if match is not None and len(match.group(1)) % 2:
+        tail = tail[: match.end(1) - 1]
+    if self._scalar:
+      try:
+        return from_json(tail, allow_partial="trailing-strings")
+      except ValueError:
+        return None
+
+    if self._root is None or self._closed:
+      return self._root
+
+    opening = "{" if isinstance(self._root, dict) else "["
+    try:
+      partial = from_json(opening + tail, allow_partial="trailing-strings")
+    except ValueError:
+      partial = type(self._root)()
+    if isinstance(self._root, dict):
+      return {**self._root, **partial}
+    return [*self._root, *partial]
+
+
+class _Call:
+  def __init__(self):
+    self.json = PartialJson()
+    self.args: dict[str, Any] | None = None
+    # characters of arguments received, roughly what an update sends
+    self.size = 0
+    self.sent: Any = None
+    self.next_at = -math.inf
+
+  @property
+  def value(self) -> Any:
+    return self.args if self.args is not None else self.json.value
+
+
+class ToolArgsStream:
+  """The arguments of the tool calls in a run, and when they may next be sent."""
+
+  def __init__(self, streaming: ToolArgsStreaming):
+    self.streaming = streaming
+    self._calls: dict[str, _Call] = {}
+    self._skipped: set[str] = set()
+
+  def skip(self, tool_call_id: str) -> None:
+    """Leaves a call's arguments out, e.g. an output tool's."""
+    self._skipped.add(tool_call_id)
+
+  def feed(self, tool_call_id: str, args: str | dict[str, Any] | None) -> Any | None:
+    """Adds to a call's arguments, returning them if an update is due."""
+    if tool_call_id in self._skipped:
+      return None
+
+    call = self._calls.get(tool_call_id)
+    if call is None:
+      call = self._calls[tool_call_id] = _Call()
+
+    if isinstance(args, dict):
+      # providers sending arguments as objects send them in one go
+      call.args = {**(call.args or {}), **args}
+    elif args:
+      call.json.feed(args)
+      call.size += len(args)
+    else:
+      return None
+
+    now = time.monotonic()
+    if now < call.next_at:
+      return None
+    return self._send(call, now)
+
+  def _send(self, call: _Call, now: float) -> Any | None:
+    value = call.value
+    # nothing worth showing yet, e.g. just an opening brace
+    if value in (None, {}, []) or value == call.sent:
+      return None
+    call.sent = value
+    # every update sends the arguments whole, so large ones are sent less often
+    call.next_at = now + max(self.streaming.interval, call.size / self.streaming.rate)
+    return value
+
+  def flush(self) -> Iterator[tuple[str, Any]]:
+    """Arguments held back by the interval, for every call."""
+    now = time.monotonic()
+    for tool_call_id, call in self._calls.items():
+      value = self._send(call, now)
+      if value is not None:
+        yield tool_call_id, value
+
+  def args(self, tool_call_id: str) -> Any | None:
+    call = self._calls.get(tool_call_id)
+    return call.value if call is not None else None
+
+  def pop(self, tool_call_id: str) -> Any | None:
+    self._skipped.discard(tool_call_id)
+    call = self._calls.pop(tool_call_id, None)
+    return call.value if call is not None else None
@@ -1,4 +1,5 @@
 import enum
+from functools import lru_cache
 
 
 @enum.verify(enum.UNIQUE)
@@ -10,26 +11,77 @@ class DataPartState(enum.StrEnum):
 
 ToolMessages = dict[str, dict[DataPartState, str] | str]
 
+_DEFAULT_MESSAGES: dict[DataPartState, str] = {
+  DataPartState.PENDING: "Calling `{}`",
+  DataPartState.SUCCESS: "Called `{}` successfully",
+  DataPartState.ERROR: "Error while calling `{}`",
+}
+
+
+# tool names come from model output, so the memo of their messages is bounded
+@lru_cache(maxsize=4096)
+def _default_message(tool_name: str, state: DataPartState) -> str:
+  return _DEFAULT_MESSAGES[state].format(tool_name)
+
+
+def _resolve_message(
+  tool_name: str, state: DataPartState, override: dict[DataPartState, str] | str
+) -> str:
+  if isinstance(override, str):
+    return override
+  elif isinstance(override, dict):
+    message = override.get(state)
+    return _default_message(tool_name, state) if message is None else message
+  else:
+    raise NotImplementedError("Unsupported tool_message override")
+
+
+class ToolMessageTable:
+  """
+  Compiled form of `ToolMessages`, resolving every override and default into a
+  flat `(tool_name, state) -> message` lookup. Build it once per app and pass it
+  wherever `ToolMessages` is accepted; messages for tools without overrides are
+  memoized in a bounded LRU shared by every table.
+  """
+
+  __slots__ = ("_messages",)
+
+  def __init__(self, tool_messages: ToolMessages | None = None):
+    self._messages: dict[tuple[str, DataPartState], str] = {}
+
+    for tool_name, override in (tool_messages or {}).items():
+      for state in DataPartState:
+        self._messages[tool_name, state] = _resolve_message(tool_name, state, override)
+
+  def get(self, tool_name: str, state: DataPartState) -> str:
+    message = self._messages.get((tool_name, state))
+    if message is None:
+      return _default_message(tool_name, state)
+    return message
+
+
+def as_tool_message_table(
+  tool_messages: ToolMessages | ToolMessageTable | None,
+) -> ToolMessageTable:
+  if isinstance(tool_messages, ToolMessageTable):
+    return tool_messages
+
+  return ToolMessageTable(tool_messages)
+
 
 def get_tool_message(
-  tool_name: str, state: DataPartState, tool_messages: ToolMessages | None
+  tool_name: str,
+  state: DataPartState,
+  tool_messages: ToolMessages | ToolMessageTable | None,
 ) -> str:
-  default_messages: dict[DataPartState, str] = {
-    DataPartState.PENDING: f"Calling `{tool_name}`",
-    DataPartState.SUCCESS: f"Called `{tool_name}` successfully",
-    DataPartState.ERROR: f"Error while calling `{tool_name}`",
-  }
+  if isinstance(tool_messages, ToolMessageTable):
+    return tool_messages.get(tool_name, state)
 
   if tool_messages is None:
-    return default_messages[state]
+    return _default_message(tool_name, state)
 
   overridden_message = tool_messages.get(tool_name, None)
   if overridden_message is None:
-    return default_messages[state]
+    return _default_message(tool_name, state)
 
-  if isinstance(overridden_message, str):
-    return overridden_message
-  elif isinstance(overridden_message, dict):
-    return overridden_message.get(state, default_messages[state])
-  else:
-    raise NotImplementedError("Unsupported tool_message override")
+  return _resolve_message(tool_name, state, overridden_message)
@@ -0,0 +1,221 @@
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.tools import ToolDefinition
+
+from pydantic_ai_chat_ui import artifacts as artifacts_module
+from pydantic_ai_chat_ui.artifacts import (
+  ArtifactChunking,
+  ArtifactStream,
+  ArtifactStreaming,
+  artifact_part,
+  artifact_type,
+  frame_artifact,
+)
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.shared import (
+  ArtifactRef,
+  ArtifactType,
+  CodeArtifactData,
+  DocumentArtifactData,
+  content_hash,
+)
+from pydantic_ai_chat_ui.streaming import stream_results
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+CODE = {"file_name": "app.py", "code": "print('hello')\n" * 20, "language": "python"}
+
+
+def chunks(text, size):
+  return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_artifact_type_of_output_tools():
+  def tool_def(title, kind):
+    return ToolDefinition(
+      name="tool", parameters_json_schema={"title": title}, kind=kind
+    )
+
+  assert artifact_type(tool_def("CodeArtifactData", "output")) == ArtifactType.CODE
+  assert artifact_type(tool_def("CodeArtifactData", "function")) is None
+  assert artifact_type(tool_def("Other", "output")) is None
+
+
+def test_updates_are_rate_capped(monkeypatch):
+  now = 0.0
+  monkeypatch.setattr(artifacts_module.time, "monotonic", lambda: now)
+  stream = ArtifactStream(ArtifactStreaming(interval=1, rate=10))
+  stream.start("call", ArtifactType.CODE)
+
+  update = stream.feed("call", '{"file_name": "a.py", "code": "0123456789')
+  assert update.data.data.code == "0123456789"
+  assert update.data.data.language == ""
+
+  # 10 characters at 10 bytes a second hold the next update back for a second
+  now = 0.5
+  assert stream.feed("call", "01234567890123456789") is None
+  now = 1.0
+  assert len(stream.feed("call", "0").data.data.code) == 31
+  # then for 3.1 seconds
+  now = 4.0
+  assert stream.feed("call", "0") is None
+  now = 4.1
+  assert len(stream.feed("call", '", "language": "py"}').data.data.code) == 32
+
+
+def artifact_agent(output: dict, size: int):
+  output_type = "CodeArtifactData" if "code" in output else "DocumentArtifactData"
+
+  async def stream(messages, info: AgentInfo):
+    tool = next(t for t in info.output_tools if t.name.endswith(output_type))
+    yield {0: DeltaToolCall(name=tool.name, tool_call_id="artifact")}
+    for chunk in chunks(json.dumps(output), size):
+      yield {0: DeltaToolCall(json_args=chunk)}
+
+  return Agent(
+    FunctionModel(stream_function=stream),
+    output_type=[str, CodeArtifactData, DocumentArtifactData],
+  )
+
+
+def artifact_frames(frames):
+  parts = [json.loads(f.removeprefix("data: ")) for f in frames]
+  return [p for p in parts if p["type"] == "data-artifact"]
+
+
+@pytest.mark.asyncio
+async def test_stream_results_streams_artifacts_progressively():
+  frames = [
+    f
+    async for f in stream_results(
+      UI,
+      artifact_agent(CODE, 40),
+      None,
+      message_history=[],
+      artifacts=ArtifactStreaming(interval=0, rate=10**9),
+    )
+  ]
+  updates = artifact_frames(frames)
+  codes = [u["data"]["data"]["code"] for u in updates]
+
+  assert len(updates) > 5
+  assert all(CODE["code"].startswith(code) for code in codes)
+  assert codes == sorted(codes, key=len)
+  # the validated artifact comes last, replacing the partial ones
+  assert updates[-1]["data"] == {
+    "type": "code",
+    "data": CODE,
+    "created_at": updates[0]["data"]["created_at"],
+  }
+  assert {u["id"] for u in updates} == {"artifact"}
+
+
+@pytest.mark.asyncio
+async def test_documents_stream_too_and_are_off_by_default():
+  document = {"title": "Notes", "content": "Lorem ipsum. " * 20, "type": "markdown"}
+
+  async def run(**options):
+    agent = artifact_agent(document, 30)
+    frames = [
+      f async for f in stream_results(UI, agent, None, message_history=[], **options)
+    ]
+    return artifact_frames(frames)
+
+  assert [u["data"]["data"] for u in await run()] == [{**document, "sources": None}]
+
+  updates = await run(artifacts=ArtifactStreaming(interval=0))
+  assert len(updates) > 2
+  assert updates[0]["data"]["data"]["content"] == ""
+  assert updates[-1]["data"]["data"] == {**document, "sources": None}
+
+
+def test_frame_artifact_keeps_small_artifacts_whole():
+  part = artifact_part("a", CodeArtifactData(**CODE))
+  assert list(frame_artifact(part, ArtifactChunking())) == [part]
+
+
+def test_frame_artifact_chunks_content_within_frames():
+  code = 'print("é\\n")\n' * 2000
+  part = artifact_part("a", CodeArtifactData(**{**CODE, "code": code}))
+  frames = list(frame_artifact(part, ArtifactChunking(frame_bytes=4096)))
+
+  *chunk_parts, final = frames
+  assert len(chunk_parts) > 5
+  assert all(len(p.model_dump_json()) <= 4096 for p in frames)
+  assert [p.data.index for p in chunk_parts] == list(range(len(chunk_parts)))
+  assert "".join(p.data.text for p in chunk_parts) == code
+  assert all(p.transient for p in chunk_parts)
+
+  assert final.id == "a"
+  assert final.data.data.code == ""
+  assert final.data.data.file_name == "app.py"
+  assert final.data.ref == ArtifactRef(
+    hash=content_hash(code), size=len(code), chunks=len(chunk_parts)
+  )
+
+
+def test_frame_artifact_references_known_content():
+  part = artifact_part("a", CodeArtifactData(**CODE))
+  known = ArtifactChunking(known={content_hash(CODE["code"])})
+  [final] = frame_artifact(part, known)
+  assert final.data.data.code == ""
+  assert final.data.ref.chunks == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_results_sends_large_artifacts_in_chunks():
+  code = {**CODE, "code": "x = 1\n" * 1000}
+  frames = [
+    json.loads(f.removeprefix("data: "))
+    async for f in stream_results(
+      UI,
+      artifact_agent(code, 500),
+      None,
+      message_history=[],
+      artifact_chunking=ArtifactChunking(frame_bytes=2048),
+    )
+  ]
+  chunk_parts = [f for f in frames if f["type"] == "data-artifact_chunk"]
+  [artifact] = [f for f in frames if f["type"] == "data-artifact"]
+
+  assert "".join(c["data"]["text"] for c in chunk_parts) == code["code"]
+  assert frames.index(artifact) > frames.index(chunk_parts[-1])
+  assert artifact["data"]["ref"]["chunks"] == len(chunk_parts)
+  assert artifact["data"]["data"]["code"] == ""
+
+
+@pytest.mark.asyncio
+async def test_partial_artifacts_are_chunked_too():
+  code = {**CODE, "code": "x = 1\n" * 1000}
+  frames = [
+    f
+    async for f in stream_results(
+      UI,
+      artifact_agent(code, 500),
+      None,
+      message_history=[],
+      artifacts=ArtifactStreaming(interval=0, rate=10**9),
+      artifact_chunking=ArtifactChunking(frame_bytes=2048),
+    )
+  ]
+  assert max(len(f) for f in frames) < 2048 + 100
+
+  parts = [json.loads(f.removeprefix("data: ")) for f in frames]
+  updates = artifact_frames(frames)
+  assert len(updates) > 5
+  # each references content reassembled from the chunks sent before it
+  texts = {}
+  for part in parts:
+    if part["type"] == "data-artifact_chunk":
+      chunk = part["data"]
+      texts.setdefault(chunk["hash"], {})[chunk["index"]] = chunk["text"]
+  contents = [
+    "".join(texts[u["data"]["ref"]["hash"]].values())
+    if u["data"].get("ref")
+    else u["data"]["data"]["code"]
+    for u in updates
+  ]
+  assert all(code["code"].startswith(content) for content in contents)
+  assert contents[-1] == code["code"]
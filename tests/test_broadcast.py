@@ -0,0 +1,172 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_chat_ui.broadcast import (
+  Broadcast,
+  Broadcasts,
+  Snapshot,
+  SubscriberLagged,
+)
+from pydantic_ai_chat_ui.buffering import Buffering, OverflowPolicy
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.streamed import (
+  ChatEvent,
+  DataPartState,
+  ErrorPart,
+  EventPart,
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+def event(status):
+  return EventPart(id="t1", data=ChatEvent(title="search", status=status))
+
+
+def text(frames):
+  payloads = [json.loads(f[len("data: ") : -2]) for f in frames]
+  return "".join(p["delta"] for p in payloads if p["type"] == "text-delta")
+
+
+def test_snapshot_compacts_text_and_keeps_latest_data_parts():
+  snapshot = Snapshot()
+  for part in [
+    TextPartStart(id="m"),
+    TextPartDelta(id="m", delta="Hel"),
+    event(DataPartState.PENDING),
+    TextPartDelta(id="m", delta="lo"),
+    event(DataPartState.SUCCESS),
+    TextPartEnd(id="m"),
+    ErrorPart(errorText="boom"),
+  ]:
+    snapshot.add(part)
+
+  parts = snapshot.parts()
+  assert [type(p) for p in parts] == [
+    TextPartStart,
+    TextPartDelta,
+    TextPartEnd,
+    EventPart,
+    ErrorPart,
+  ]
+  assert parts[1].delta == "Hello"
+  assert parts[3].data.status == DataPartState.SUCCESS
+
+
+def tool_agent(release):
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    if isinstance(messages[-1].parts[-1], pa.ToolReturnPart):
+      yield "So "
+      yield "the "
+      await release.wait()
+      yield "answer"
+      return
+    yield "Let me "
+    yield "check. "
+    yield {0: DeltaToolCall(name="search", json_args="{}", tool_call_id="call")}
+
+  agent = Agent(FunctionModel(stream_function=stream))
+
+  @agent.tool_plain
+  def search() -> str:
+    return "found"
+
+  return agent
+
+
+@pytest.mark.asyncio
+async def test_late_joiners_get_text_from_before_and_after_a_tool_call():
+  release = asyncio.Event()
+  broadcasts = Broadcasts()
+
+  first = broadcasts.start("chat", UI, tool_agent(release), None, [])
+  received = [await anext(first)]
+  while '"the "' not in received[-1]:
+    received.append(await anext(first))
+
+  late = broadcasts.join("chat")
+  caught_up = [await anext(late)]
+  release.set()
+
+  received += [f async for f in first]
+  caught_up += [f async for f in late]
+
+  assert text(received) == text(caught_up)
+  assert text(caught_up).endswith("check. the answer")
+  # text starts again after the tool's events, as it did live
+  types = [json.loads(f[len("data: ") : -2])["type"] for f in caught_up]
+  assert types.index("data-event") < len(types) - 1 - types[::-1].index("text-start")
+
+
+def slow_agent(calls, release):
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    calls.append(1)
+    yield "zero "
+    yield "one "
+    await release.wait()
+    yield "two"
+
+  return Agent(FunctionModel(stream_function=stream))
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_one_run_and_late_joiners_catch_up():
+  calls, release = [], asyncio.Event()
+  broadcasts = Broadcasts()
+
+  first = broadcasts.start("chat", UI, slow_agent(calls, release), None, [])
+  received = [await anext(first)]
+  while "text-delta" not in received[-1]:
+    received.append(await anext(first))
+
+  late = broadcasts.join("chat")
+  caught_up = [await anext(late)]
+  release.set()
+
+  received += [f async for f in first]
+  caught_up += [f async for f in late]
+
+  assert calls == [1]
+  assert text(received) == text(caught_up)
+  assert text(caught_up).endswith("one two")
+  with pytest.raises(KeyError):
+    broadcasts.join("chat")
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped_without_stalling_others():
+  async def run():
+    for i in range(20):
+      yield [event(DataPartState.PENDING).model_copy(update={"id": f"t{i}"})]
+      await asyncio.sleep(0)
+
+  broadcast = Broadcast(run(), Buffering(maxsize=2, policy=OverflowPolicy.BLOCK))
+  slow, fast = broadcast.subscribe(), broadcast.subscribe()
+  await anext(slow)
+  received = [await anext(fast)] + [p async for p in fast]
+
+  assert len(received) == 20
+  with pytest.raises(SubscriberLagged):
+    async for _ in slow:
+      pass
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_when_the_last_subscriber_leaves():
+  calls, release = [], asyncio.Event()
+  broadcasts = Broadcasts()
+
+  frames = broadcasts.start("chat", UI, slow_agent(calls, release), None, [])
+  await anext(frames)
+  await frames.aclose()
+  await asyncio.sleep(0.01)
+
+  assert broadcasts.get("chat") is None
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_chat_ui._utils import _END
+from pydantic_ai_chat_ui.buffering import (
+  Buffering,
+  OverflowPolicy,
+  PartBuffer,
+  decouple,
+)
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.streamed import (
+  ChatEvent,
+  DataPartState,
+  EventPart,
+  TextPartDelta,
+  TextPartStart,
+)
+from pydantic_ai_chat_ui.streaming import stream_results
+
+
+def event(id, status):
+  return EventPart(id=id, data=ChatEvent(title=id, status=status))
+
+
+async def drain(buffer):
+  items = []
+  while buffer.qsize():
+    items.append(await buffer.get())
+  return items
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room():
+  buffer = PartBuffer(1, OverflowPolicy.BLOCK)
+  await buffer.put(TextPartDelta(id="m", delta="a"))
+
+  put = asyncio.create_task(buffer.put(TextPartDelta(id="m", delta="b")))
+  await asyncio.sleep(0.01)
+  assert not put.done()
+
+  assert (await buffer.get()).delta == "a"
+  await put
+  assert (await buffer.get()).delta == "b"
+
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_merges_deltas_into_the_tail_when_full():
+  buffer = PartBuffer(2, OverflowPolicy.COALESCE)
+  await buffer.put(TextPartStart(id="m"))
+  await buffer.put(TextPartDelta(id="m", delta="a"))
+  await buffer.put(TextPartDelta(id="m", delta="b"))
+  await buffer.put(TextPartDelta(id="m", delta="c"))
+  # the end of the run is accepted even when full
+  await buffer.put(_END)
+
+  items = await drain(buffer)
+  assert isinstance(items[0], TextPartStart)
+  assert items[1].delta == "abc"
+  assert items[2] is _END
+
+
+@pytest.mark.asyncio
+async def test_summarize_policy_keeps_latest_state_per_id():
+  buffer = PartBuffer(3, OverflowPolicy.SUMMARIZE)
+  await buffer.put(TextPartDelta(id="m", delta="a"))
+  await buffer.put(event("t1", DataPartState.PENDING))
+  await buffer.put(event("t2", DataPartState.PENDING))
+  await buffer.put(event("t1", DataPartState.SUCCESS))
+  await buffer.put(TextPartDelta(id="m", delta="b"))
+
+  items = await drain(buffer)
+  assert [i.id for i in items] == ["m", "t1", "t2"]
+  assert items[0].delta == "ab"
+  assert items[1].data.status == DataPartState.SUCCESS
+
+
+@pytest.mark.asyncio
+async def test_summarize_policy_keeps_text_after_a_restart():
+  buffer = PartBuffer(3, OverflowPolicy.SUMMARIZE)
+  await buffer.put(TextPartDelta(id="m", delta="first "))
+  await buffer.put(event("t1", DataPartState.PENDING))
+  await buffer.put(TextPartStart(id="m"))
+
+  # merging into "first " would move it ahead of the event and the restart
+  assert not await buffer.offer(TextPartDelta(id="m", delta="second"))
+  put = asyncio.create_task(buffer.put(TextPartDelta(id="m", delta="second")))
+  await asyncio.sleep(0)
+  assert not put.done()
+
+  items = [await buffer.get()]
+  await put
+  items += await drain(buffer)
+  assert [(type(i), getattr(i, "delta", None)) for i in items[:4]] == [
+    (TextPartDelta, "first "),
+    (EventPart, None),
+    (TextPartStart, None),
+    (TextPartDelta, "second"),
+  ]
+
+
+@pytest.mark.asyncio
+async def test_decouple_lets_the_run_finish_before_a_slow_consumer():
+  produced = asyncio.Event()
+
+  async def run():
+    yield TextPartStart(id="m")
+    for i in range(100):
+      yield TextPartDelta(id="m", delta=str(i % 10))
+    produced.set()
+
+  parts = decouple(run(), Buffering(maxsize=4))
+  first = await anext(parts)
+  await asyncio.wait_for(produced.wait(), 1)
+
+  rest = [part async for part in parts]
+  assert isinstance(first, TextPartStart)
+  assert len(rest) < 100
+  assert "".join(p.delta for p in rest) == "0123456789" * 10
+
+
+@pytest.mark.asyncio
+async def test_stream_results_with_buffer_matches_direct_run():
+  agent = Agent(model=TestModel(custom_output_text="one two three"))
+  ui = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+  async def text(buffer):
+    payloads = [
+      json.loads(c[len("data: ") : -2])
+      async for c in stream_results(
+        user_message=ui, agent=agent, deps=None, message_history=[], buffer=buffer
+      )
+    ]
+    assert payloads[-1]["type"] == "text-end"
+    return "".join(p["delta"] for p in payloads if p["type"] == "text-delta")
+
+  assert await text(Buffering(maxsize=2)) == await text(None) == "one two three"
+
+
+@pytest.mark.asyncio
+async def test_offer_gives_up_instead_of_waiting_and_copies_merged_deltas():
+  buffer = PartBuffer(1, OverflowPolicy.COALESCE)
+  shared = TextPartDelta(id="m", delta="a")
+  assert await buffer.offer(shared)
+  assert await buffer.offer(TextPartDelta(id="m", delta="b"))
+  assert not await buffer.offer(TextPartStart(id="n"))
+
+  assert (await buffer.get()).delta == "ab"
+  assert shared.delta == "a"
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_chat_ui import streaming
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.metrics import InMemoryMetrics
+from pydantic_ai_chat_ui.persistence import MessageStore
+from pydantic_ai_chat_ui.streaming import stream_results
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+async def background_writes():
+  await asyncio.gather(*streaming._background_tasks)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_mid_answer_persists_partial_text():
+  model_blocked, model_cancelled = asyncio.Event(), asyncio.Event()
+
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    yield "partial "
+    yield "answer"
+    model_blocked.set()
+    try:
+      await asyncio.Event().wait()
+    except asyncio.CancelledError:
+      model_cancelled.set()
+      raise
+
+  agent = Agent(FunctionModel(stream_function=stream))
+  stored = []
+  metrics = InMemoryMetrics()
+
+  frames = stream_results(
+    user_message=UI,
+    agent=agent,
+    deps=None,
+    message_history=[],
+    store_message_history=stored.append,
+    observer=metrics.observe(),
+  )
+  async for frame in frames:
+    if "answer" in frame:
+      break
+  # the client goes away while the server waits on the model for more
+  waiting = asyncio.ensure_future(anext(frames))
+  await model_blocked.wait()
+  waiting.cancel()
+  with pytest.raises(asyncio.CancelledError):
+    await waiting
+  await frames.aclose()
+  await background_writes()
+
+  assert model_cancelled.is_set()
+  assert isinstance(stored[0], pa.ModelRequest)
+  assert isinstance(stored[-1], pa.ModelResponse)
+  assert stored[-1].parts[0].content == "partial answer"
+  assert metrics.counter("streams", status="cancelled") == 1
+
+
+@pytest.mark.asyncio
+async def test_disconnect_mid_tool_cancels_tool_and_drops_dangling_call():
+  tool_started = asyncio.Event()
+  tool_cancelled = asyncio.Event()
+  agent = Agent(model=TestModel(call_tools="all"))
+
+  @agent.tool_plain
+  async def slow() -> str:
+    tool_started.set()
+    try:
+      await asyncio.Event().wait()
+    except asyncio.CancelledError:
+      tool_cancelled.set()
+      raise
+    return "never"
+
+  stored = []
+
+  async def respond():
+    # what an ASGI server does: write frames until the client disconnects and
+    # the response task gets cancelled
+    async for _ in stream_results(
+      user_message=UI,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      store_message_history=stored.append,
+    ):
+      pass
+
+  response = asyncio.create_task(respond())
+  await asyncio.wait_for(tool_started.wait(), 1)
+  response.cancel()
+  with pytest.raises(asyncio.CancelledError):
+    await response
+  await background_writes()
+
+  await asyncio.wait_for(tool_cancelled.wait(), 1)
+  # the response calling the tool has no result, so only the prompt is kept
+  assert len(stored) == 1 and isinstance(stored[0], pa.ModelRequest)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_while_persisting_writes_the_turn_once():
+  writing, release = threading.Event(), threading.Event()
+  stored = []
+
+  def slow_bulk(messages):
+    writing.set()
+    release.wait(1)
+    stored.extend(messages)
+
+  async def respond():
+    async for _ in stream_results(
+      user_message=UI,
+      agent=Agent(TestModel(custom_output_text="done")),
+      deps=None,
+      message_history=[],
+      store_message_history=MessageStore(slow_bulk, bulk=True, to_thread=True),
+    ):
+      pass
+
+  response = asyncio.create_task(respond())
+  await asyncio.to_thread(writing.wait, 1)
+  response.cancel()
+  with pytest.raises(asyncio.CancelledError):
+    await response
+  release.set()
+  await background_writes()
+
+  assert [type(m) for m in stored] == [pa.ModelRequest, pa.ModelResponse]
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from pydantic_ai_chat_ui.coalescing import Coalescing, coalesce_text_deltas
+from pydantic_ai_chat_ui.messages.streamed import (
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+
+
+async def scripted(*items):
+  for item in items:
+    if isinstance(item, float):
+      await asyncio.sleep(item)
+    else:
+      yield item
+
+
+async def collect(parts, coalescing):
+  return [batch async for batch in coalesce_text_deltas(parts, coalescing)]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_deltas_and_flushes_on_other_parts():
+  parts = scripted(
+    TextPartStart(id="m"),
+    TextPartDelta(id="m", delta="a"),
+    TextPartDelta(id="m", delta="b"),
+    TextPartDelta(id="m", delta="c"),
+    TextPartEnd(id="m"),
+  )
+
+  batches = await collect(parts, Coalescing(window=10))
+
+  assert [[type(p) for p in b] for b in batches] == [
+    [TextPartStart],
+    [TextPartDelta, TextPartEnd],
+  ]
+  assert batches[1][0].delta == "abc"
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_after_window_while_source_is_quiet():
+  parts = scripted(
+    TextPartDelta(id="m", delta="a"),
+    TextPartDelta(id="m", delta="b"),
+    0.2,
+    TextPartDelta(id="m", delta="c"),
+  )
+
+  batches = await collect(parts, Coalescing(window=0.01))
+
+  assert [[p.delta for p in b] for b in batches] == [["ab"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_on_byte_threshold_and_message_change():
+  parts = scripted(
+    TextPartDelta(id="m1", delta="é"),
+    TextPartDelta(id="m1", delta="é"),
+    TextPartDelta(id="m1", delta="x"),
+    TextPartDelta(id="m2", delta="y"),
+  )
+
+  batches = await collect(parts, Coalescing(window=10, max_bytes=4))
+
+  flat = [(p.id, p.delta) for b in batches for p in b]
+  assert flat == [("m1", "éé"), ("m1", "x"), ("m2", "y")]
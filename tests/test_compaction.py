@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from pydantic_ai_chat_ui import compaction as compaction_module
+from pydantic_ai_chat_ui.compaction import (
+  SUMMARY_HEADER,
+  Compaction,
+  compact_history,
+  refresh_summary,
+)
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.streaming import stream_results
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+def turns(*texts, system=None):
+  messages = []
+  for i, text in enumerate(texts):
+    parts = [pa.SystemPromptPart(system)] if system and i == 0 else []
+    messages.append(pa.ModelRequest(parts=[*parts, pa.UserPromptPart(text)]))
+    messages.append(pa.ModelResponse(parts=[pa.TextPart(f"re: {text}")]))
+  return messages
+
+
+def summarizer(prompts):
+  def summarize(messages: list[pa.ModelMessage], info: AgentInfo):
+    prompts.append(messages[-1].parts[-1].content)
+    return pa.ModelResponse(parts=[pa.TextPart(f"summary {len(prompts)}")])
+
+  return Agent(FunctionModel(summarize))
+
+
+def compaction(prompts):
+  # every message counts 10 tokens: keep the last turn once over 5 messages
+  return Compaction(
+    summarizer(prompts), threshold=50, keep=20, estimate=lambda message: 10
+  )
+
+
+@pytest.mark.asyncio
+async def test_short_history_is_left_alone():
+  prompts = []
+  history = turns("a", "b")
+  await refresh_summary(history, compaction(prompts))
+  assert await compact_history(history, compaction(prompts)) is history
+  assert prompts == []
+
+
+@pytest.mark.asyncio
+async def test_folds_older_turns_into_the_cached_summary():
+  prompts = []
+  config = compaction(prompts)
+  history = turns("a", "b", "c", "d", system="be nice")
+
+  # nothing is summarized on the critical path
+  assert await compact_history(history, config) == history
+
+  await refresh_summary(history, config)
+  assert "User: a" in prompts[0] and "Assistant: re: c" in prompts[0]
+  assert "User: d" not in prompts[0]
+
+  compacted = await compact_history(history, config)
+  assert compacted[1:] == history[-1:]
+  assert compacted[0].parts[0] == history[0].parts[0]
+  assert compacted[0].parts[1].content == SUMMARY_HEADER + "summary 1"
+  assert compacted[0].parts[2:] == history[-2].parts
+
+  # computed once
+  await refresh_summary(history, config)
+  assert len(prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_summary_is_extended_incrementally():
+  prompts = []
+  config = compaction(prompts)
+  history = turns("a", "b", "c", "d")
+  await refresh_summary(history, config)
+
+  longer = history + turns("e", "f")
+  # until refreshed, the previous summary is used with the newer turns verbatim
+  stale = await compact_history(longer, config)
+  assert stale[0].parts[0].content == SUMMARY_HEADER + "summary 1"
+  assert stale[1:] == longer[7:]
+
+  await refresh_summary(longer, config)
+  assert "Summary so far:\nsummary 1" in prompts[1]
+  assert "User: a" not in prompts[1] and "User: e" in prompts[1]
+  assert (await compact_history(longer, config))[1:] == longer[-1:]
+
+
+@pytest.mark.asyncio
+async def test_stream_results_refreshes_in_the_background():
+  prompts, seen = [], []
+
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    seen.append(messages)
+    yield "ok"
+
+  agent = Agent(FunctionModel(stream_function=stream))
+  config = compaction(prompts)
+  history = turns("a", "b", "c")
+
+  async def turn():
+    frames = stream_results(
+      user_message=UI,
+      agent=agent,
+      deps=None,
+      message_history=list(history),
+      store_message_history=history.append,
+      compaction=config,
+    )
+    [f async for f in frames]
+    await asyncio.gather(*compaction_module._background_tasks)
+
+  await turn()
+  assert seen[0][:-1] == history[:6]
+  assert len(prompts) == 1
+
+  await turn()
+  assert seen[1][0].parts[0].content == SUMMARY_HEADER + "summary 1"
+  assert seen[1][1:-1] == history[7:8]
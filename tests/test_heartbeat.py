@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_chat_ui.broadcast import Broadcasts
+from pydantic_ai_chat_ui.heartbeat import COMMENT_FRAME, Heartbeat, keepalive
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.resume import ResumableRuns
+from pydantic_ai_chat_ui.streaming import stream_results, stream_results_bytes
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+@pytest.mark.asyncio
+async def test_keepalive_beats_only_while_idle():
+  async def items():
+    yield 1
+    yield 2
+    await asyncio.sleep(0.035)
+    yield 3
+
+  received = [i async for i in keepalive(items(), 0.01, 0)]
+  assert received[:2] == [1, 2]
+  assert received[-1] == 3
+  assert 1 <= received.count(0) <= 3
+
+
+def slow_tool_agent():
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    if isinstance(messages[-1].parts[-1], pa.ToolReturnPart):
+      yield "done "
+      yield "now"
+    else:
+      yield {0: DeltaToolCall(name="slow", json_args="{}", tool_call_id="call")}
+
+  agent = Agent(FunctionModel(stream_function=stream))
+
+  @agent.tool_plain
+  async def slow() -> str:
+    await asyncio.sleep(0.05)
+    return "ok"
+
+  return agent
+
+
+@pytest.mark.asyncio
+async def test_heartbeats_interleave_with_tool_events():
+  frames = [
+    f
+    async for f in stream_results(
+      user_message=UI,
+      agent=slow_tool_agent(),
+      deps=None,
+      message_history=[],
+      heartbeat=Heartbeat(interval=0.01),
+    )
+  ]
+
+  kinds = [
+    "beat" if f == COMMENT_FRAME else json.loads(f[len("data: ") : -2])["type"]
+    for f in frames
+  ]
+  first_beat, last_beat = kinds.index("beat"), len(kinds) - kinds[::-1].index("beat")
+  assert kinds[first_beat - 1] == "data-event"
+  assert kinds[last_beat] == "data-event"
+  assert kinds[last_beat:] == ["data-event", "text-start", "text-delta", "text-end"]
+
+
+@pytest.mark.asyncio
+async def test_no_heartbeat_without_idle_time():
+  frames = [
+    f
+    async for f in stream_results_bytes(
+      UI, slow_tool_agent(), None, [], heartbeat=Heartbeat(interval=1)
+    )
+  ]
+  assert not any(b"keepalive" in f or b"heartbeat" in f for f in frames)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_as_data_part():
+  frames = [
+    f
+    async for f in stream_results_bytes(
+      UI,
+      slow_tool_agent(),
+      None,
+      [],
+      heartbeat=Heartbeat(interval=0.01, data_part=True),
+    )
+  ]
+  beat = b'data: {"type":"data-heartbeat","id":"heartbeat","data":null}\n\n'
+  assert beat in frames
+
+
+@pytest.mark.asyncio
+async def test_broadcast_and_resumable_readers_get_heartbeats():
+  heartbeat = Heartbeat(interval=0.01)
+  broadcasts, runs = Broadcasts(), ResumableRuns()
+
+  shared = broadcasts.start(
+    "chat", UI, slow_tool_agent(), None, [], heartbeat=heartbeat
+  )
+  assert COMMENT_FRAME in [f async for f in shared]
+
+  started = await runs.start(
+    "run", UI, slow_tool_agent(), None, [], heartbeat=heartbeat
+  )
+  frames = [f async for f in started]
+  assert COMMENT_FRAME in frames
+  # beats aren't replayed, the event ids count the run's frames alone
+  replayed = [f async for f in await runs.resume("run", 0)]
+  assert replayed == [f for f in frames if f != COMMENT_FRAME]
@@ -0,0 +1,128 @@
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from pydantic_ai_chat_ui.history import (
+  HistoryBudget,
+  count_chars,
+  estimate_tokens,
+  load_history,
+)
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.streaming import stream_results
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+def request(text, system=None):
+  parts = [pa.SystemPromptPart(system)] if system else []
+  return pa.ModelRequest(parts=[*parts, pa.UserPromptPart(text)])
+
+
+def response(text):
+  return pa.ModelResponse(parts=[pa.TextPart(text)])
+
+
+FIRST = [request("a" * 400, system="be nice"), response("b" * 400)]
+WITH_TOOL = [
+  request("c" * 40),
+  pa.ModelResponse(
+    parts=[pa.ToolCallPart("search", {"q": "d" * 40}, tool_call_id="call")]
+  ),
+  pa.ModelRequest(parts=[pa.ToolReturnPart("search", "e" * 400, tool_call_id="call")]),
+  response("f" * 40),
+]
+LAST = [request("g" * 40), response("h" * 40)]
+HISTORY = [*FIRST, *WITH_TOOL, *LAST]
+
+
+def tokens(messages):
+  return sum(estimate_tokens(m) for m in messages)
+
+
+def test_estimates_cover_text_tool_args_and_returns():
+  assert count_chars(FIRST[0]) == 407
+  assert count_chars(WITH_TOOL[1]) == len('{"q":"' + "d" * 40 + '"}')
+  assert count_chars(WITH_TOOL[2]) == 400
+  assert estimate_tokens(FIRST[1]) == 100 + 4
+
+
+@pytest.mark.asyncio
+async def test_without_budget_history_is_returned_as_is():
+  assert await load_history(HISTORY) == HISTORY
+
+
+@pytest.mark.asyncio
+async def test_budget_keeps_whole_turns():
+  budget = tokens(WITH_TOOL + LAST)
+  messages = await load_history(HISTORY, HistoryBudget(budget))
+  assert messages[1:] == WITH_TOOL[1:] + LAST
+  # pydantic ai only adds system prompts to empty histories, so they're kept
+  assert messages[0].parts == [FIRST[0].parts[0], *WITH_TOOL[0].parts]
+
+  # the tool return and everything after it fit, but its call doesn't
+  messages = await load_history(HISTORY, HistoryBudget(budget - 1))
+  assert messages[1:] == LAST[1:]
+  assert messages[0].parts == [FIRST[0].parts[0], *LAST[0].parts]
+
+
+@pytest.mark.asyncio
+async def test_character_budget():
+  budget = HistoryBudget(sum(map(count_chars, LAST)), estimate=count_chars)
+  assert (await load_history(HISTORY, budget))[1:] == LAST[1:]
+
+
+@pytest.mark.asyncio
+async def test_provider_is_only_pulled_until_the_budget_is_spent():
+  pulled = []
+  closed = []
+
+  async def newest_first():
+    try:
+      for message in reversed(HISTORY):
+        pulled.append(message)
+        yield message
+    finally:
+      closed.append(True)
+
+  messages = await load_history(newest_first, HistoryBudget(tokens(LAST)))
+  assert messages == LAST
+  assert len(pulled) == len(LAST) + 1
+  assert closed
+
+  assert await load_history(newest_first()) == HISTORY
+
+
+@pytest.mark.asyncio
+async def test_callable_may_return_a_list():
+  async def load():
+    return HISTORY
+
+  messages = await load_history(load, HistoryBudget(tokens(LAST)))
+  assert messages[1:] == LAST[1:]
+
+
+@pytest.mark.asyncio
+async def test_stream_results_sends_the_trimmed_history():
+  seen = []
+
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    seen.extend(messages)
+    yield "ok"
+
+  async def newest_first():
+    for message in reversed(HISTORY):
+      yield message
+
+  frames = stream_results(
+    user_message=UI,
+    agent=Agent(FunctionModel(stream_function=stream)),
+    deps=None,
+    message_history=newest_first(),
+    history_budget=HistoryBudget(tokens(LAST)),
+  )
+  [f async for f in frames]
+
+  assert seen[:2] == LAST
+  assert seen[2].parts[-1].content == "hi"
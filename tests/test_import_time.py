@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import pytest
+
+# milliseconds spent importing, well above what's measured locally so only a
+# regression like eagerly importing pydantic ai again (~350ms more) trips them
+BUDGETS = {
+  "import pydantic_ai_chat_ui": 20,
+  "from pydantic_ai_chat_ui import ChatRequest, parse_lazy_chat_request": 300,
+}
+
+
+def import_times(statement: str) -> dict[str, int]:
+  """Microseconds spent importing each module for `statement`."""
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", statement],
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  times = {}
+  for line in result.stderr.splitlines():
+    if line.startswith("import time:") and "self [us]" not in line:
+      self_us, _, name = line.removeprefix("import time:").split("|")
+      times[name.strip()] = int(self_us)
+  return times
+
+
+@pytest.mark.parametrize("statement", BUDGETS)
+def test_import_budget(statement):
+  startup = import_times("pass").keys()
+  # best of a few runs, to ride out a busy machine
+  runs = [
+    {name: us for name, us in import_times(statement).items() if name not in startup}
+    for _ in range(3)
+  ]
+  elapsed = min(sum(run.values()) for run in runs) / 1e3
+
+  assert "pydantic_ai" not in runs[0]
+  assert elapsed < BUDGETS[statement], sorted(runs[0])
+
+
+def test_exports_load_on_first_use():
+  import pydantic_ai_chat_ui
+
+  assert set(pydantic_ai_chat_ui.__all__) <= set(dir(pydantic_ai_chat_ui))
+  assert (
+    pydantic_ai_chat_ui.stream_results.__module__ == "pydantic_ai_chat_ui.streaming"
+  )
+  with pytest.raises(AttributeError):
+    pydantic_ai_chat_ui.missing  # noqa: B018
@@ -1,3 +1,4 @@
+import pytest
 from pydantic_ai import messages as pa
 
 from pydantic_ai_chat_ui.messages import full as ui_messages
@@ -8,6 +9,7 @@ from pydantic_ai_chat_ui.messages.full import (
   TextPart,
   UIMessage,
 )
+from pydantic_ai_chat_ui.tools import ToolMessageTable
 
 
 def test_from_model_request_user_prompt_to_ui_text():
@@ -196,3 +198,240 @@ def test_from_ui_message_non_user_returns_none():
     parts=[ui_messages.TextPart(id="p", text="hi")],
   )
   assert ui_messages.from_ui_message(assistant_ui) is None
+
+
+def _thread():
+  return [
+    pa.ModelRequest(
+      parts=[pa.SystemPromptPart(content="sys"), pa.UserPromptPart(content="q1")]
+    ),
+    pa.ModelResponse(
+      parts=[
+        pa.TextPart(content="let me check"),
+        pa.ToolCallPart(tool_call_id="tc1", tool_name="tool"),
+      ]
+    ),
+    pa.ModelRequest(
+      parts=[pa.ToolReturnPart(tool_call_id="tc1", tool_name="tool", content="ok")]
+    ),
+    pa.ModelResponse(parts=[pa.TextPart(content="answer 1")]),
+    pa.ModelRequest(parts=[pa.UserPromptPart(content="q2")]),
+    pa.ModelResponse(parts=[pa.ToolCallPart(tool_call_id="tc2", tool_name="tool")]),
+    pa.ModelRequest(
+      parts=[pa.RetryPromptPart(tool_call_id="tc2", tool_name="tool", content="x")]
+    ),
+    pa.ModelResponse(parts=[pa.TextPart(content="answer 2")]),
+  ]
+
+
+def test_from_pydantic_ai_messages_groups_turns():
+  tool_messages = {"tool": {DataPartState.SUCCESS: "Did it"}}
+  uis = list(ui_messages.from_pydantic_ai_messages(_thread(), tool_messages))
+
+  assert [m.role for m in uis] == [
+    MessageRole.USER,
+    MessageRole.ASSISTANT,
+    MessageRole.USER,
+    MessageRole.ASSISTANT,
+  ]
+  assert [p.text for p in uis[0].parts] == ["q1"]
+
+  first_turn = uis[1].parts
+  assert [type(p) for p in first_turn] == [TextPart, EventPart, TextPart]
+  # the call and its return collapse into one event with the final status
+  assert first_turn[1].id == "tc1"
+  assert first_turn[1].data.status == DataPartState.SUCCESS
+  assert first_turn[1].data.title == "Did it"
+
+  second_turn = uis[3].parts
+  assert second_turn[0].id == "tc2"
+  assert second_turn[0].data.status == DataPartState.ERROR
+  assert second_turn[1].text == "answer 2"
+
+
+def test_from_pydantic_ai_messages_is_lazy():
+  consumed = []
+
+  def source():
+    for message in _thread():
+      consumed.append(message)
+      yield message
+
+  uis = ui_messages.from_pydantic_ai_messages(source())
+  first = next(uis)
+
+  assert first.role == MessageRole.USER
+  assert len(consumed) == 1
+
+
+def test_converters_accept_tool_message_table():
+  table = ToolMessageTable({"tool": "Using tool"})
+  resp = pa.ModelResponse(parts=[pa.ToolCallPart(tool_call_id="tc1", tool_name="tool")])
+
+  ui = ui_messages.from_pydantic_ai_message(resp, table)
+  assert ui.parts[0].data.title == "Using tool"
+
+  uis = list(ui_messages.from_pydantic_ai_messages([resp], table))
+  assert uis[0].parts[0].data.title == "Using tool"
+
+
+def _reloaded(messages):
+  # as if read back from storage
+  adapter = pa.ModelMessagesTypeAdapter
+  return adapter.validate_json(adapter.dump_json(messages))
+
+
+def _ids(uis):
+  return [(m.id, [p.id for p in m.parts]) for m in uis]
+
+
+def test_stable_ids_survive_reloading_history():
+  thread = _thread()
+  uis = list(ui_messages.from_pydantic_ai_messages(thread, stable_ids=True))
+  again = list(
+    ui_messages.from_pydantic_ai_messages(_reloaded(thread), stable_ids=True)
+  )
+
+  assert _ids(uis) == _ids(again)
+  assert len({m.id for m in uis}) == len(uis)
+  assert uis[1].parts[0].id != uis[1].parts[2].id
+  assert uis[1].parts[1].id == "tc1"
+
+  random = list(ui_messages.from_pydantic_ai_messages(thread))
+  assert _ids(random) != _ids(uis)
+
+  one = ui_messages.from_pydantic_ai_message(thread[0], stable_ids=True)
+  assert one == ui_messages.from_pydantic_ai_message(
+    _reloaded(thread)[0], stable_ids=True
+  )
+
+
+def test_conversion_cache_reuses_converted_turns():
+  thread = _thread()
+  cache = ui_messages.ConversionCache({"tool": "Using tool"})
+
+  uis = list(cache.thread(thread))
+  assert uis == list(
+    ui_messages.from_pydantic_ai_messages(
+      thread, {"tool": "Using tool"}, stable_ids=True
+    )
+  )
+
+  longer = _reloaded(thread) + [pa.ModelRequest(parts=[pa.UserPromptPart("q3")])]
+  again = list(cache.thread(longer))
+  assert all(a is b for a, b in zip(uis, again, strict=False))
+  assert again[-1].parts[0].text == "q3"
+
+  assert cache.message(thread[1]) is cache.message(_reloaded(thread)[1])
+
+
+def test_conversion_cache_evicts_least_recently_used():
+  cache = ui_messages.ConversionCache(maxsize=2)
+  first, second, third = (
+    pa.ModelRequest(parts=[pa.UserPromptPart(q)]) for q in ("a", "b", "c")
+  )
+  converted = cache.message(first)
+  cache.message(second)
+  cache.message(first)
+  cache.message(third)
+
+  assert cache.message(first) is converted
+  assert len(cache._converted) == 2
+
+
+def test_conversion_cache_keeps_messages_and_turns_apart():
+  cache = ui_messages.ConversionCache()
+  request = pa.ModelRequest(parts=[pa.UserPromptPart("a")])
+  converted = cache.message(request)
+  turn = list(cache.thread([request]))
+
+  for _ in range(3):
+    assert cache.message(request) is converted
+    assert all(a is b for a, b in zip(cache.thread([request]), turn, strict=True))
+  assert len(cache._converted) == 2
+
+
+def artifact_thread(code: str, tool_name: str = "final_result_CodeArtifactData"):
+  args = {"file_name": "app.py", "code": code, "language": "python"}
+  return [
+    pa.ModelRequest(parts=[pa.UserPromptPart(content="write it")]),
+    pa.ModelResponse(
+      parts=[pa.ToolCallPart(tool_name=tool_name, args=args, tool_call_id="out")]
+    ),
+  ]
+
+
+def test_output_tool_calls_convert_to_artifacts():
+  thread = artifact_thread("print(1)\n")
+  artifacts = [
+    part
+    for message in ui_messages.from_pydantic_ai_messages(thread)
+    for part in message.parts
+    if isinstance(part, ui_messages.ArtifactPart)
+  ]
+  assert len(artifacts) == 1
+  assert artifacts[0].id == "out"
+  assert artifacts[0].data.data.code == "print(1)\n"
+  assert artifacts[0].data.created_at == int(thread[1].timestamp.timestamp())
+
+  message = ui_messages.from_pydantic_ai_message(thread[1])
+  assert [p.type for p in message.parts] == ["data-event", "data-artifact"]
+
+
+@pytest.mark.parametrize("args", ["[1]", "null", "{not json", ""])
+def test_tool_calls_with_arguments_that_are_not_an_object_convert(args):
+  response = pa.ModelResponse(
+    parts=[pa.ToolCallPart(tool_name="final_result", args=args, tool_call_id="c")]
+  )
+  message = ui_messages.from_pydantic_ai_message(response)
+  assert [p.type for p in message.parts] == ["data-event"]
+  [message] = ui_messages.from_pydantic_ai_messages([response])
+  assert [p.type for p in message.parts] == ["data-event"]
+
+
+def test_only_artifact_output_tools_convert_to_artifacts():
+  # an ordinary tool whose arguments happen to fit a document
+  call = pa.ToolCallPart(
+    tool_name="create_ticket",
+    args={"title": "t", "content": "c", "type": "bug"},
+    tool_call_id="c",
+  )
+  response = pa.ModelResponse(parts=[call])
+  message = ui_messages.from_pydantic_ai_message(response)
+  assert [p.type for p in message.parts] == ["data-event"]
+  [message] = ui_messages.from_pydantic_ai_messages([response])
+  assert [p.type for p in message.parts] == ["data-event"]
+
+  # output tools the agent names itself, e.g. ToolOutput(..., name="write_code")
+  [_, response] = artifact_thread("x = 1\n", tool_name="write_code")
+  message = ui_messages.from_pydantic_ai_message(response)
+  assert [p.type for p in message.parts] == ["data-event"]
+  message = ui_messages.from_pydantic_ai_message(
+    response, artifact_tools={"write_code"}
+  )
+  assert [p.type for p in message.parts] == ["data-event", "data-artifact"]
+  cache = ui_messages.ConversionCache(artifact_tools={"write_code"})
+  assert cache.message(response).parts[-1].type == "data-artifact"
+
+
+def test_known_artifacts_are_referenced_by_hash():
+  cache = ui_messages.ConversionCache()
+  first = list(cache.thread(artifact_thread("a = 1\n")))
+  second = list(cache.thread(artifact_thread("b = 2\n")))
+  known = ui_messages.artifact_hashes(first)
+  assert len(known) == 1
+
+  referenced = list(ui_messages.reference_artifacts([*first, *second], known))
+  old, new = referenced[1].parts[-1], referenced[3].parts[-1]
+  assert old.data.data.code == ""
+  assert old.data.ref.hash in known
+  assert old.data.ref.size == len("a = 1\n")
+  assert new.data.data.code == "b = 2\n"
+  assert new.data.ref is None
+  # unchanged messages are passed through, cached ones aren't modified
+  assert referenced[3] is second[1]
+  assert first[1].parts[-1].data.data.code == "a = 1\n"
+  # and references keep their hash
+  assert ui_messages.artifact_hashes(referenced) == ui_messages.artifact_hashes(
+    [*first, *second]
+  )
@@ -0,0 +1,181 @@
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.tools import Tool
+
+from pydantic_ai_chat_ui.messages.full import (
+  DataPartState,
+  MessageRole,
+  TextPart,
+  UIMessage,
+)
+from pydantic_ai_chat_ui.metrics import (
+  Histogram,
+  InMemoryMetrics,
+  OpenTelemetryMetrics,
+  StreamObserver,
+)
+from pydantic_ai_chat_ui.streaming import stream_results, stream_results_bytes
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+class RecordingObserver(StreamObserver):
+  def __init__(self):
+    self.calls = []
+
+  def run_started(self):
+    self.calls.append("run_started")
+
+  def first_model_event(self):
+    self.calls.append("first_model_event")
+
+  def first_frame(self):
+    self.calls.append("first_frame")
+
+  def tool_started(self, tool_call_id, tool_name):
+    self.calls.append(("tool_started", tool_name))
+
+  def tool_finished(self, tool_call_id, tool_name, status):
+    self.calls.append(("tool_finished", tool_name, status))
+
+  def result(self, output):
+    self.calls.append("result")
+
+  def run_failed(self, error):
+    self.calls.append("run_failed")
+
+  def closed(self, frames, bytes):
+    self.calls.append(("closed", frames, bytes))
+
+
+def hello_tool():
+  def hello() -> str:
+    return "hello"
+
+  return Tool.from_schema(
+    function=hello,
+    name="hello",
+    description="say hello",
+    json_schema={"type": "object", "properties": {}, "required": []},
+  )
+
+
+@pytest.mark.asyncio
+async def test_observer_receives_lifecycle_callbacks():
+  agent = Agent(model=TestModel(call_tools="all"), tools=[hello_tool()])
+  observer = RecordingObserver()
+
+  chunks = [
+    c
+    async for c in stream_results(
+      user_message=UI,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      observer=observer,
+    )
+  ]
+
+  calls = observer.calls
+  assert calls[0] == "run_started"
+  assert calls.index("first_model_event") < calls.index("first_frame")
+  assert ("tool_started", "hello") in calls
+  assert ("tool_finished", "hello", DataPartState.SUCCESS) in calls
+  assert "result" in calls and "run_failed" not in calls
+  assert calls[-1] == ("closed", len(chunks), len("".join(chunks).encode()))
+
+
+@pytest.mark.asyncio
+async def test_observer_reports_failed_tools_and_runs():
+  def bad() -> str:
+    raise RuntimeError("boom")
+
+  tool = Tool.from_schema(
+    function=bad,
+    name="bad",
+    description="bad",
+    json_schema={"type": "object", "properties": {}, "required": []},
+  )
+  agent = Agent(model=TestModel(call_tools="all"), tools=[tool])
+  observer = RecordingObserver()
+
+  async for _ in stream_results_bytes(
+    user_message=UI, agent=agent, deps=None, message_history=[], observer=observer
+  ):
+    pass
+
+  assert ("tool_finished", "bad", DataPartState.ERROR) in observer.calls
+  assert "run_failed" in observer.calls
+  assert observer.calls[-1][0] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_in_memory_metrics_aggregates_streams():
+  metrics = InMemoryMetrics()
+  agent = Agent(model=TestModel(call_tools="all"), tools=[hello_tool()])
+
+  for _ in range(2):
+    async for _ in stream_results(
+      user_message=UI,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      observer=metrics.observe(),
+    ):
+      pass
+
+  assert metrics.counter("streams", status="completed") == 2
+  assert metrics.counter("frames") > 0 and metrics.counter("bytes") > 0
+  assert metrics.histogram("time_to_first_token").count == 2
+  assert metrics.histogram("time_to_first_frame").count == 2
+  assert metrics.histogram("stream_duration", status="completed").count == 2
+  tools = metrics.histogram("tool_duration", tool_name="hello", status="success")
+  assert tools.count == 2
+
+
+def test_histogram_buckets_and_quantiles():
+  histogram = Histogram(buckets=(1.0, 2.0, 5.0))
+  for value in (0.5, 1.5, 1.5, 4.0, 10.0):
+    histogram.record(value)
+
+  assert histogram.counts == [1, 2, 1, 1]
+  assert histogram.count == 5 and histogram.mean == pytest.approx(3.5)
+  assert histogram.quantile(0.5) == 2.0
+  assert histogram.quantile(1.0) == 10.0
+
+
+def test_open_telemetry_metrics_creates_instruments_once():
+  class Instrument:
+    def __init__(self):
+      self.values = []
+
+    def record(self, value, attributes=None):
+      self.values.append((value, attributes))
+
+    add = record
+
+  class Meter:
+    def __init__(self):
+      self.created = {}
+
+    def create_histogram(self, name, unit=""):
+      return self.created.setdefault(name, Instrument())
+
+    def create_counter(self, name):
+      return self.created.setdefault(name, Instrument())
+
+  meter = Meter()
+  metrics = OpenTelemetryMetrics(meter)
+  observer = metrics.observe()
+  observer.first_frame()
+  observer.first_frame()
+  observer.closed(3, 120)
+
+  assert len(meter.created["chat_ui.time_to_first_frame"].values) == 2
+  assert meter.created["chat_ui.frames"].values == [(3, None)]
+  assert meter.created["chat_ui.streams"].values == [(1, {"status": "completed"})]
+
+
+def test_open_telemetry_metrics_defaults_to_global_meter():
+  OpenTelemetryMetrics().observe().closed(1, 1)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.persistence import (
+  MessageStore,
+  WriteBehindQueue,
+  store_messages,
+)
+from pydantic_ai_chat_ui.streaming import stream_results
+
+MESSAGES = [
+  pa.ModelRequest(parts=[pa.UserPromptPart(content="hi")]),
+  pa.ModelResponse(parts=[pa.TextPart(content="hello")]),
+]
+
+
+@pytest.mark.asyncio
+async def test_store_messages_accepts_async_per_message_callable():
+  stored = []
+
+  async def store(message):
+    stored.append(message)
+
+  await store_messages(store, MESSAGES)
+  assert stored == MESSAGES
+
+
+@pytest.mark.asyncio
+async def test_bulk_store_receives_whole_list_once():
+  calls = []
+  await store_messages(MessageStore(calls.append, bulk=True), MESSAGES)
+  assert calls == [MESSAGES]
+
+
+@pytest.mark.asyncio
+async def test_to_thread_runs_sync_store_off_the_event_loop():
+  threads = []
+
+  def store(message):
+    threads.append(threading.get_ident())
+
+  await store_messages(MessageStore(store, to_thread=True), MESSAGES)
+  assert len(threads) == 2
+  assert threading.get_ident() not in threads
+
+
+@pytest.mark.asyncio
+async def test_write_behind_lets_stream_close_before_persistence_completes():
+  agent = Agent(model=TestModel())
+  ui = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+  release = asyncio.Event()
+  stored = []
+
+  async def slow_store(messages):
+    await release.wait()
+    stored.extend(messages)
+
+  queue = WriteBehindQueue()
+  chunks = [
+    c
+    async for c in stream_results(
+      user_message=ui,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      store_message_history=MessageStore(slow_store, bulk=True, write_behind=queue),
+    )
+  ]
+
+  assert '"type":"text-end"' in chunks[-1]
+  assert stored == []
+
+  release.set()
+  await queue.aclose()
+  assert len(stored) >= 2
+
+
+@pytest.mark.asyncio
+async def test_write_behind_logs_and_survives_failed_writes(caplog):
+  queue = WriteBehindQueue()
+  stored = []
+
+  def failing(messages):
+    raise RuntimeError("db down")
+
+  await MessageStore(failing, bulk=True, write_behind=queue).save(MESSAGES)
+  await MessageStore(stored.extend, bulk=True, write_behind=queue).save(MESSAGES)
+  await queue.aclose()
+
+  assert stored == MESSAGES
+  assert "Failed to persist message history" in caplog.text
@@ -0,0 +1,125 @@
+import asyncio
+import sys
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.relay import UnixSocketRelay
+from pydantic_ai_chat_ui.resume import ReplayUnavailable
+from pydantic_ai_chat_ui.streaming import stream_results
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+@pytest.fixture
+def short_tmp_path(tmp_path_factory):
+  # Unix socket paths are limited to ~100 characters
+  return tmp_path_factory.mktemp("relay", numbered=True)
+
+
+@pytest.mark.asyncio
+async def test_any_relay_on_the_directory_can_subscribe(short_tmp_path):
+  worker = UnixSocketRelay(short_tmp_path, linger=0.05)
+  frontend = UnixSocketRelay(short_tmp_path)
+  release = asyncio.Event()
+
+  async def frames():
+    yield "data: 1\n\n"
+    yield "id: 2\ndata: 2\n\n"
+    await release.wait()
+    yield "data: 3\n\n"
+
+  published = asyncio.create_task(worker.publish("run", frames()))
+  await asyncio.sleep(0.01)
+
+  live = frontend.subscribe("run")
+  assert await anext(live) == "data: 1\n\n"
+  late = frontend.subscribe("run", after=1)
+  assert await anext(late) == "id: 2\ndata: 2\n\n"
+
+  release.set()
+  await published
+  assert [f async for f in live] == ["id: 2\ndata: 2\n\n", "data: 3\n\n"]
+  assert [f async for f in late] == ["data: 3\n\n"]
+
+  await asyncio.sleep(0.1)
+  with pytest.raises(ReplayUnavailable):
+    await anext(frontend.subscribe("run"))
+  assert not list(short_tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_frames_over_the_default_stream_limit_are_relayed(short_tmp_path):
+  relay = UnixSocketRelay(short_tmp_path)
+  # e.g. an artifact sent whole, well over asyncio's 64 KiB default
+  frame = f"data: {'x' * 100_000}\n\n"
+
+  async def frames():
+    yield frame
+
+  await relay.publish("run", frames())
+  assert [f async for f in relay.subscribe("run")] == [frame]
+  await relay.aclose()
+
+
+@pytest.mark.asyncio
+async def test_relays_stream_results(short_tmp_path):
+  relay = UnixSocketRelay(short_tmp_path)
+  agent = Agent(model=TestModel(custom_output_text="one two"))
+
+  direct = [
+    f
+    async for f in stream_results(
+      user_message=UI, agent=agent, deps=None, message_history=[]
+    )
+  ]
+  await relay.publish(
+    "run",
+    stream_results(user_message=UI, agent=agent, deps=None, message_history=[]),
+  )
+
+  relayed = [f async for f in relay.subscribe("run")]
+  assert [f.split('"id"')[0] for f in relayed] == [f.split('"id"')[0] for f in direct]
+  await relay.aclose()
+
+
+SUBSCRIBER = """
+import asyncio, sys
+from pydantic_ai_chat_ui.relay import UnixSocketRelay
+
+async def main():
+  async for frame in UnixSocketRelay(sys.argv[1]).subscribe("run"):
+    print(frame, end="", flush=True)
+
+asyncio.run(main())
+"""
+
+
+@pytest.mark.asyncio
+async def test_subscriber_in_another_process(short_tmp_path):
+  relay = UnixSocketRelay(short_tmp_path)
+  release = asyncio.Event()
+
+  async def frames():
+    yield "data: 1\n\n"
+    await release.wait()
+    yield "data: 2\n\n"
+
+  published = asyncio.create_task(relay.publish("run", frames()))
+  await asyncio.sleep(0.01)
+  process = await asyncio.create_subprocess_exec(
+    sys.executable,
+    "-c",
+    SUBSCRIBER,
+    str(short_tmp_path),
+    stdout=asyncio.subprocess.PIPE,
+  )
+  assert await process.stdout.readuntil(b"\n\n") == b"data: 1\n\n"
+
+  release.set()
+  await published
+  assert await asyncio.wait_for(process.stdout.read(), 10) == b"data: 2\n\n"
+  assert await process.wait() == 0
+  await relay.aclose()
@@ -1,7 +1,23 @@
+import json
 import uuid
 
-from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
-from pydantic_ai_chat_ui.requests import ChatRequest
+import pytest
+from pydantic import ValidationError
+
+from pydantic_ai_chat_ui.messages.full import (
+  AnyPart,
+  EventPart,
+  MessageRole,
+  TextPart,
+  UIMessage,
+)
+from pydantic_ai_chat_ui.requests import (
+  ChatRequest,
+  RequestLimits,
+  RequestTooLarge,
+  parse_chat_request,
+  parse_lazy_chat_request,
+)
 
 
 def test_chat_request_instantiation():
@@ -14,3 +30,90 @@ def test_chat_request_instantiation():
   assert req.id == "abc"
   assert len(req.messages) == 1
   assert req.messages[0].role == MessageRole.USER
+
+
+def test_parses_raw_bytes_by_part_type():
+  body = (
+    b'{"id": "abc", "messages": [{"id": "m1", "role": "assistant", "parts": ['
+    b'{"type": "text", "id": "p1", "text": "hello"},'
+    b'{"type": "data-event", "id": "p2",'
+    b' "data": {"title": "Searching", "status": "success"}},'
+    b'{"type": "data-weather", "id": "p3", "data": {"celsius": 21}}]}]}'
+  )
+  req = parse_chat_request(body)
+  assert req.id == "abc"
+  text, event, weather = req.messages[0].parts
+  assert isinstance(text, TextPart) and text.text == "hello"
+  assert isinstance(event, EventPart) and event.data.title == "Searching"
+  assert isinstance(weather, AnyPart) and weather.data == {"celsius": 21}
+
+
+def test_known_type_with_unexpected_data_falls_back_to_any_part():
+  part = {"type": "data-event", "id": "p1", "data": {"progress": 0.5}}
+  message = UIMessage.model_validate({"id": "m1", "role": "user", "parts": [part]})
+  assert isinstance(message.parts[0], AnyPart)
+  assert message.parts[0].data == {"progress": 0.5}
+
+
+def test_parts_round_trip():
+  message = UIMessage(
+    id="m1",
+    role=MessageRole.ASSISTANT,
+    parts=[
+      TextPart(id="p1", text="hi"),
+      AnyPart(type="data-custom", id="p2", data=[1]),
+    ],
+  )
+  assert UIMessage.model_validate_json(message.model_dump_json()) == message
+
+
+THREAD = (
+  b'{"id": "abc", "messages": ['
+  b'{"id": "m1", "role": "user", "parts": [{"type": "text", "text": "hi"}]},'
+  b'{"id": "m2", "role": "assistant", "parts": [{"type": "text", "oops": 1}]},'
+  b'{"id": "m3", "role": "user", "parts": [{"type": "text", "text": "again"}]}]}'
+)
+
+
+def test_lazy_request_validates_only_the_last_message():
+  req = parse_lazy_chat_request(THREAD)
+  assert req.id == "abc"
+  assert req.message.parts[0].text == "again"
+  assert [(m.id, m.role) for m in req.history] == [
+    ("m1", MessageRole.USER),
+    ("m2", MessageRole.ASSISTANT),
+  ]
+  # parts of earlier messages are left as sent until asked for
+  assert req.history[1].parts == [{"type": "text", "oops": 1}]
+  assert isinstance(req.history[0].to_ui_message().parts[0], TextPart)
+
+  with pytest.raises(ValidationError):
+    parse_chat_request(THREAD)
+
+
+def test_lazy_request_rejects_an_invalid_last_message():
+  with pytest.raises(ValidationError):
+    parse_lazy_chat_request(b'{"messages": []}')
+  with pytest.raises(ValidationError):
+    parse_lazy_chat_request(b'{"messages": [{"id": "m1", "role": "user"}]}')
+
+
+@pytest.mark.parametrize("type_", [["x"], {"x": 1}])
+def test_unhashable_part_types_are_invalid(type_):
+  part = {"type": type_, "id": "a"}
+  body = json.dumps({"messages": [{"id": "1", "role": "user", "parts": [part]}]})
+  with pytest.raises(ValidationError):
+    parse_chat_request(body.encode())
+  with pytest.raises(ValidationError):
+    parse_lazy_chat_request(body.encode())
+
+
+def test_limits_reject_oversized_requests():
+  parse_lazy_chat_request(THREAD, RequestLimits(max_bytes=len(THREAD), max_messages=3))
+
+  with pytest.raises(RequestTooLarge, match="bytes"):
+    parse_chat_request(THREAD, RequestLimits(max_bytes=len(THREAD) - 1))
+  with pytest.raises(RequestTooLarge, match="messages"):
+    parse_lazy_chat_request(THREAD, RequestLimits(max_messages=2))
+  with pytest.raises(ValidationError):
+    parse_lazy_chat_request(b"{not json", RequestLimits())
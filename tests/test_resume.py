@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.streamed import TextPartDelta
+from pydantic_ai_chat_ui.resume import (
+  InMemoryReplayStore,
+  ReplayUnavailable,
+  ResumableRuns,
+  parse_last_event_id,
+)
+from pydantic_ai_chat_ui.streaming import format_event
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+def event_id(frame):
+  return int(frame.split("\n", 1)[0].removeprefix("id: "))
+
+
+def test_format_event_with_id():
+  frame = format_event(TextPartDelta(id="m", delta="a"), 7)
+  assert frame == 'id: 7\ndata: {"type":"text-delta","id":"m","delta":"a"}\n\n'
+
+
+@pytest.mark.parametrize(
+  "value, expected", [(None, 0), ("12", 12), (3, 3), ("nope", 0), ("-4", 0)]
+)
+def test_parse_last_event_id(value, expected):
+  assert parse_last_event_id(value) == expected
+
+
+@pytest.mark.asyncio
+async def test_store_replays_missed_frames_then_follows_live():
+  store = InMemoryReplayStore()
+  await store.start("r")
+  for i in (1, 2, 3):
+    await store.append("r", i, f"f{i}")
+
+  reader = store.read("r", after=1)
+  assert [await anext(reader), await anext(reader)] == ["f2", "f3"]
+
+  pending = asyncio.create_task(anext(reader))
+  await asyncio.sleep(0.01)
+  assert not pending.done()
+
+  await store.append("r", 4, "f4")
+  assert await pending == "f4"
+  await store.finish("r")
+  assert [f async for f in reader] == []
+
+
+@pytest.mark.asyncio
+async def test_store_rejects_evicted_or_unknown_runs():
+  store = InMemoryReplayStore(max_frames=2)
+  await store.start("r")
+  for i in (1, 2, 3):
+    await store.append("r", i, f"f{i}")
+  await store.finish("r")
+
+  assert [f async for f in store.read("r", after=1)] == ["f2", "f3"]
+  with pytest.raises(ReplayUnavailable):
+    await anext(store.read("r", after=0))
+  with pytest.raises(ReplayUnavailable):
+    await anext(store.read("other"))
+  with pytest.raises(ReplayUnavailable):
+    await store.check("r", after=0)
+  await store.check("r", after=1)
+
+
+@pytest.mark.asyncio
+async def test_finished_runs_expire_after_retention():
+  store = InMemoryReplayStore(retention=0)
+  await store.start("old")
+  await store.finish("old")
+  await asyncio.sleep(0.001)
+
+  await store.start("new")
+  with pytest.raises(ReplayUnavailable):
+    await anext(store.read("old"))
+
+
+@pytest.mark.asyncio
+async def test_resume_after_disconnect_continues_where_the_client_left_off():
+  agent = Agent(model=TestModel(custom_output_text="one two three four"))
+  runs = ResumableRuns()
+  stored = []
+
+  frames = await runs.start(
+    "chat", UI, agent, None, [], store_message_history=stored.append
+  )
+  received = [await anext(frames), await anext(frames)]
+  await frames.aclose()
+
+  received += [f async for f in await runs.resume("chat", event_id(received[-1]))]
+
+  ids = [event_id(f) for f in received]
+  assert ids == list(range(1, len(ids) + 1))
+  assert received == [f async for f in await runs.resume("chat", None)]
+  assert '"type":"text-end"' in received[-1]
+  assert stored and isinstance(stored[-1], pa.ModelResponse)
+
+
+@pytest.mark.asyncio
+async def test_run_outlives_its_readers_until_cancelled():
+  cancelled = asyncio.Event()
+
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    yield "thinking"
+    try:
+      await asyncio.Event().wait()
+    except asyncio.CancelledError:
+      cancelled.set()
+      raise
+
+  runs = ResumableRuns()
+  frames = await runs.start(
+    "chat", UI, Agent(FunctionModel(stream_function=stream)), None, []
+  )
+  await anext(frames)
+  await frames.aclose()
+
+  await asyncio.sleep(0.01)
+  assert runs.is_running("chat")
+
+  assert runs.cancel("chat")
+  await asyncio.wait_for(cancelled.wait(), 1)
+
+  async def replay():
+    return [f async for f in await runs.resume("chat", 1)]
+
+  # clients following the cancelled run are released
+  assert await asyncio.wait_for(replay(), 1) == []
+  await runs.aclose()
+  assert not runs.is_running("chat")
+
+
+@pytest.mark.asyncio
+async def test_resume_fails_before_any_frame_is_read():
+  runs = ResumableRuns(InMemoryReplayStore(max_frames=1))
+  agent = Agent(model=TestModel(custom_output_text="one two"))
+  frames = await runs.start("chat", UI, agent, None, [])
+  await frames.aclose()
+  while runs.is_running("chat"):
+    await asyncio.sleep(0.01)
+
+  # e.g. to load persisted history instead of starting a response
+  with pytest.raises(ReplayUnavailable):
+    await runs.resume("unknown", None)
+  with pytest.raises(ReplayUnavailable):
+    await runs.resume("chat", 0)
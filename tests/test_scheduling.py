@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from pydantic_ai_chat_ui.heartbeat import COMMENT_FRAME, Heartbeat
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.metrics import InMemoryMetrics
+from pydantic_ai_chat_ui.scheduling import Admission, QueuePolicy, Scheduler
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+
+def running(waiters, left=()):
+  return [
+    key for key, waiter in waiters if waiter.admitted.done() and waiter not in left
+  ]
+
+
+@pytest.mark.asyncio
+async def test_fifo_admits_in_arrival_order_within_limits():
+  scheduler = Scheduler(Admission(max_runs=2, max_runs_per_key=1))
+  waiters = [(key, scheduler._enqueue(key)) for key in ["a", "a", "b", "c", "b"]]
+
+  # the second "a" is over its key's limit, so "b" goes ahead of it
+  assert running(waiters) == ["a", "b"]
+  assert scheduler.running == 2
+  assert scheduler.queued == 3
+  assert scheduler.queued_for("a") == 1
+
+  left = [waiters[0][1]]
+  scheduler._leave(left[-1])
+  assert running(waiters, left) == ["a", "b"]
+  left.append(waiters[2][1])
+  scheduler._leave(left[-1])
+  assert running(waiters, left) == ["a", "c"]
+  assert scheduler.queued_for("b") == 1
+
+
+@pytest.mark.asyncio
+async def test_fair_queuing_shares_capacity_by_weight():
+  scheduler = Scheduler(
+    Admission(max_runs=1, policy=QueuePolicy.FAIR, weights={"big": 2})
+  )
+  first = scheduler._enqueue("busy")
+  # a burst from one key doesn't hold back the keys arriving after it
+  waiters = [scheduler._enqueue("busy") for _ in range(6)]
+  waiters += [scheduler._enqueue("big") for _ in range(4)]
+  waiters += [scheduler._enqueue("small") for _ in range(2)]
+
+  order = []
+  running = first
+  for _ in waiters:
+    scheduler._leave(running)
+    running = next(w for w in waiters if w.admitted.done() and w not in order)
+    order.append(running)
+
+  keys = [w.key for w in order]
+  assert keys == [
+    *["big", "busy", "big", "small", "big", "busy", "big", "small"],
+    *["busy"] * 4,
+  ]
+
+
+@pytest.mark.asyncio
+async def test_leaving_the_queue_gives_up_the_place():
+  scheduler = Scheduler(Admission(max_runs=1))
+  running = scheduler._enqueue("a")
+  gone, waiting = scheduler._enqueue("b"), scheduler._enqueue("c")
+
+  scheduler._leave(gone)
+  assert scheduler.queued == 1
+  scheduler._leave(running)
+  assert waiting.admitted.done()
+  assert scheduler.queued == 0
+
+
+def blocking_agent(release: asyncio.Event):
+  async def stream(messages, info: AgentInfo):
+    yield "started "
+    await release.wait()
+    yield "done"
+
+  return Agent(FunctionModel(stream_function=stream))
+
+
+def parse(frame):
+  return (
+    json.loads(frame.removeprefix("data: ")) if frame.startswith("data: ") else frame
+  )
+
+
+@pytest.mark.asyncio
+async def test_queued_streams_show_a_pending_event_until_admitted():
+  metrics = InMemoryMetrics()
+  scheduler = Scheduler(Admission(max_runs=1), metrics)
+  release = asyncio.Event()
+
+  first = scheduler.stream("a", UI, blocking_agent(release), None, [])
+  assert parse(await anext(first))["type"] == "text-start"
+
+  second = scheduler.stream("b", UI, blocking_agent(release), None, [])
+  queued = parse(await anext(second))
+  assert queued["type"] == "data-event"
+  assert queued["data"] == {"title": "Waiting to start", "status": "pending"}
+  assert scheduler.queued == 1
+  assert scheduler.oldest_wait() >= 0
+
+  release.set()
+  rest = [f async for f in first]
+  assert parse(rest[-1])["type"] == "text-end"
+
+  started = parse(await anext(second))
+  assert started["id"] == queued["id"]
+  assert started["data"] == {"title": "Started", "status": "success"}
+  assert [parse(f)["type"] async for f in second][-1] == "text-end"
+
+  assert scheduler.running == scheduler.queued == 0
+  assert metrics.counter("admissions", status="admitted") == 2
+  assert metrics.histogram("queue_wait", status="admitted").count == 2
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_ends_the_stream_with_an_error():
+  metrics = InMemoryMetrics()
+  scheduler = Scheduler(Admission(max_runs=1, queue_timeout=0.05), metrics)
+  release = asyncio.Event()
+
+  first = scheduler.stream("a", UI, blocking_agent(release), None, [])
+  await anext(first)
+
+  frames = [
+    parse(f)
+    async for f in scheduler.stream(
+      "a",
+      UI,
+      blocking_agent(release),
+      None,
+      [],
+      heartbeat=Heartbeat(interval=0.02),
+    )
+  ]
+  assert frames[0]["data"]["status"] == "pending"
+  assert COMMENT_FRAME in frames
+  assert frames[-2]["data"]["status"] == "error"
+  assert frames[-1] == {
+    "type": "error",
+    "errorText": "Too many requests, try again later",
+  }
+  assert scheduler.queued == 0
+  assert metrics.counter("admissions", status="timeout") == 1
+
+  release.set()
+  await first.aclose()
+  assert scheduler.running == 0
@@ -0,0 +1,81 @@
+import pytest
+
+from pydantic_ai_chat_ui.messages.shared import ArtifactType
+from pydantic_ai_chat_ui.messages.streamed import (
+  AnyPart,
+  ArtifactPart,
+  ChatEvent,
+  CodeArtifact,
+  CodeArtifactData,
+  DataPartState,
+  ErrorPart,
+  EventPart,
+  TextPartDelta,
+  TextPartEnd,
+  TextPartStart,
+)
+from pydantic_ai_chat_ui.serialization import serialize_part
+
+TRICKY_STRINGS = [
+  "",
+  "hello",
+  ' "quoted" ',
+  "back\\slash",
+  "new\nline\r\ttab\b\f",
+  "".join(chr(c) for c in range(0x20)),
+  "\x7f del",
+  "héllo wörld",
+  "emoji 🚀 and 中文",
+  "   separators",
+  "</script><!--",
+]
+
+
+@pytest.mark.parametrize("text", TRICKY_STRINGS)
+def test_fast_path_matches_pydantic_for_text_parts(text):
+  parts = [
+    TextPartStart(id=text),
+    TextPartDelta(id="m1", delta=text),
+    TextPartDelta(id=text, delta=text),
+    TextPartEnd(id=text),
+  ]
+  for part in parts:
+    assert serialize_part(part) == part.model_dump_json(by_alias=True)
+
+
+@pytest.mark.parametrize("text", TRICKY_STRINGS)
+@pytest.mark.parametrize("status", list(DataPartState))
+def test_fast_path_matches_pydantic_for_events(text, status):
+  part = EventPart(id=text, data=ChatEvent(title=text, status=status))
+  assert serialize_part(part) == part.model_dump_json(by_alias=True)
+
+
+@pytest.mark.parametrize("text", TRICKY_STRINGS)
+def test_fast_path_matches_pydantic_for_events_with_data(text):
+  data = {text: [text, 1, 2.5, None, True], "nested": {"key": text}}
+  part = EventPart(
+    id="call", data=ChatEvent(title="t", status=DataPartState.PENDING, data=data)
+  )
+  assert serialize_part(part) == part.model_dump_json(by_alias=True)
+
+
+@pytest.mark.parametrize("text", TRICKY_STRINGS)
+def test_fast_path_matches_pydantic_for_errors(text):
+  part = ErrorPart(error_text=text)
+  assert serialize_part(part) == part.model_dump_json(by_alias=True)
+
+
+def test_parts_without_fast_path_fall_back_to_pydantic():
+  parts = [
+    ArtifactPart(
+      id="a1",
+      data=CodeArtifact(
+        created_at=1,
+        type=ArtifactType.CODE,
+        data=CodeArtifactData(file_name="x.py", code="print('é')", language="py"),
+      ),
+    ),
+    AnyPart(type="data-custom", id="c1", data={"k": [1, "v"]}),
+  ]
+  for part in parts:
+    assert serialize_part(part) == part.model_dump_json(by_alias=True)
@@ -5,6 +5,7 @@ from pydantic_ai import Agent
 from pydantic_ai.models.test import TestModel
 from pydantic_ai.tools import Tool
 
+from pydantic_ai_chat_ui.coalescing import Coalescing
 from pydantic_ai_chat_ui.messages.full import (
   DataPartState,
   MessageRole,
@@ -16,7 +17,11 @@ from pydantic_ai_chat_ui.messages.streamed import (
   DocumentArtifactData,
   TextPartDelta,
 )
-from pydantic_ai_chat_ui.streaming import format_event, stream_results
+from pydantic_ai_chat_ui.streaming import (
+  format_event,
+  stream_results,
+  stream_results_bytes,
+)
 
 
 def test_format_event_wraps_with_data_prefix():
@@ -178,3 +183,80 @@ async def test_stream_results_store_message_history_called():
     pass
 
   assert len(stored) >= 1
+
+
+@pytest.mark.asyncio
+async def test_stream_results_coalesced_text_matches_uncoalesced():
+  agent = Agent(model=TestModel(custom_output_text="one two three four five"))
+  ui = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+  async def run(coalesce):
+    chunks = []
+    async for c in stream_results(
+      user_message=ui,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      coalesce=coalesce,
+    ):
+      chunks.append(json.loads(c[len("data: ") : -2]))
+    return chunks
+
+  plain = await run(None)
+  coalesced = await run(Coalescing(window=10))
+
+  def text(payloads):
+    return "".join(p["delta"] for p in payloads if p["type"] == "text-delta")
+
+  assert text(coalesced) == text(plain) == "one two three four five"
+  deltas = [p for p in coalesced if p["type"] == "text-delta"]
+  assert len(deltas) == 1
+  assert [p["type"] for p in coalesced][-1] == "text-end"
+
+
+@pytest.mark.asyncio
+async def test_stream_results_bytes_matches_str_frames():
+  agent = Agent(model=TestModel(custom_output_text="héllo wörld"))
+  ui = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+  frames = [
+    c
+    async for c in stream_results(
+      user_message=ui, agent=agent, deps=None, message_history=[]
+    )
+  ]
+  chunks = [
+    c
+    async for c in stream_results_bytes(
+      user_message=ui, agent=agent, deps=None, message_history=[], join_frames=False
+    )
+  ]
+
+  assert all(isinstance(c, bytes) for c in chunks)
+  # message ids are random per run, so compare without them
+  assert [json.loads(c[len("data: ") : -2])["type"] for c in frames] == [
+    json.loads(c[len(b"data: ") : -2])["type"] for c in chunks
+  ]
+  assert b"".join(chunks).decode().count("data: ") == len(frames)
+
+
+@pytest.mark.asyncio
+async def test_stream_results_bytes_joins_frames_per_flush():
+  agent = Agent(model=TestModel(custom_output_text="one two three"))
+  ui = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+  chunks = [
+    c
+    async for c in stream_results_bytes(
+      user_message=ui,
+      agent=agent,
+      deps=None,
+      message_history=[],
+      coalesce=Coalescing(window=10),
+    )
+  ]
+
+  # the coalesced delta and the text-end it was flushed by share one write
+  last = chunks[-1].decode()
+  assert last.count("data: ") == 2
+  assert '"type":"text-delta"' in last and '"type":"text-end"' in last
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.streaming import stream_results
+from pydantic_ai_chat_ui.suggestions import Suggestions
+
+UI = UIMessage(
+  id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="what is rust?")]
+)
+
+
+def suggester(prompts, delay=0.0, fail=False):
+  async def suggest(messages: list[pa.ModelMessage], info: AgentInfo):
+    prompts.append(messages[-1].parts[-1].content)
+    await asyncio.sleep(delay)
+    if fail:
+      raise RuntimeError("no ideas")
+    questions = ["Is it fast?", " ", "Who uses it?", "How do I start?", "Why?"]
+    return pa.ModelResponse(
+      parts=[
+        pa.ToolCallPart(info.output_tools[0].name, {"response": questions}),
+      ]
+    )
+
+  return Agent(FunctionModel(suggest), output_type=list[str])
+
+
+def answer_agent(chunks, delay=0.0):
+  async def stream(messages, info: AgentInfo):
+    for chunk in chunks:
+      await asyncio.sleep(delay)
+      yield chunk
+
+  return Agent(FunctionModel(stream_function=stream))
+
+
+async def run(agent, suggestions):
+  frames = [
+    f
+    async for f in stream_results(
+      UI, agent, None, message_history=[], suggestions=suggestions
+    )
+  ]
+  return [json.loads(f.removeprefix("data: ")) for f in frames]
+
+
+@pytest.mark.asyncio
+async def test_suggestions_start_during_the_answer():
+  prompts = []
+  parts = await run(
+    answer_agent(["Rust is ", "a systems ", "language. ", "It is fast."]),
+    Suggestions(suggester(prompts), after=15),
+  )
+
+  # started once 15 characters were in, overlapping the rest of the answer
+  assert len(prompts) == 1
+  assert prompts[0].endswith("User: what is rust?\n\nAssistant: Rust is a systems ")
+  assert parts[-1]["type"] == "data-suggested_questions"
+  assert parts[-1]["data"] == {
+    "questions": ["Is it fast?", "Who uses it?", "How do I start?"]
+  }
+  assert parts[-2]["type"] == "text-end"
+
+
+@pytest.mark.asyncio
+async def test_short_answers_get_suggestions_at_the_end():
+  prompts = []
+  parts = await run(
+    answer_agent(["Rust ", "is a language."]), Suggestions(suggester(prompts))
+  )
+  assert prompts[0].endswith("Assistant: Rust is a language.")
+  assert parts[-1]["type"] == "data-suggested_questions"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("slow, fail", [(True, False), (False, True)])
+async def test_late_or_failed_suggestions_are_left_out(slow, fail):
+  suggestions = Suggestions(
+    suggester([], delay=10 if slow else 0, fail=fail), after=1, timeout=0.05
+  )
+  loop = asyncio.get_running_loop()
+  started = loop.time()
+  parts = await run(answer_agent(["Rust ", "is a language."]), suggestions)
+
+  assert loop.time() - started < 1
+  assert parts[-1]["type"] == "text-end"
+  assert all(p["type"] != "data-suggested_questions" for p in parts)
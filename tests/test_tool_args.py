@@ -0,0 +1,186 @@
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai import messages as pa
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_chat_ui import tool_args as tool_args_module
+from pydantic_ai_chat_ui.messages.full import MessageRole, TextPart, UIMessage
+from pydantic_ai_chat_ui.messages.shared import CodeArtifactData
+from pydantic_ai_chat_ui.streaming import stream_results
+from pydantic_ai_chat_ui.tool_args import PartialJson, ToolArgsStream, ToolArgsStreaming
+
+UI = UIMessage(id="u1", role=MessageRole.USER, parts=[TextPart(id="p1", text="hi")])
+
+DOCUMENTS = [
+  {"path": "a.py", "code": 'print("}, ]")\n', "lines": [1, {"n": [2, 3]}, "x,"]},
+  [1, "two", [3, {"four": None}], True],
+  {},
+  "just a string",
+  12.5,
+]
+
+
+def chunks(text, size):
+  return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_partial_json_parses_documents_in_chunks(document, size):
+  parser = PartialJson()
+  for chunk in chunks(json.dumps(document), size):
+    parser.feed(chunk)
+    parser.value  # noqa: B018
+  assert parser.value == document
+
+
+def test_partial_json_reads_incomplete_documents():
+  parser = PartialJson()
+  parser.feed('{"path": "a.py", "code": "print(1)\\npri')
+  assert parser.value == {"path": "a.py", "code": "print(1)\npri"}
+
+  parser.feed('nt(2)", "lines": [1, 2')
+  assert parser.value == {"path": "a.py", "code": "print(1)\nprint(2)", "lines": [1, 2]}
+  # complete members are parsed once and only the last one's text is kept
+  assert "".join(parser._chunks) == ' "lines": [1, 2'
+
+
+def test_partial_json_keeps_strings_cut_in_an_escape():
+  text = json.dumps({"code": 'print("a\\b")\n\u00e9\\'})
+  parser = PartialJson()
+  values = []
+  for char in text:
+    parser.feed(char)
+    values.append(parser.value.get("code", ""))
+  assert all(b.startswith(a) for a, b in zip(values, values[1:], strict=False))
+  assert values[-1] == json.loads(text)["code"]
+
+
+def test_stream_throttles_updates_per_call():
+  stream = ToolArgsStream(ToolArgsStreaming(interval=60))
+  assert stream.feed("a", '{"q": "x') == {"q": "x"}
+  assert stream.feed("a", "yz") is None
+  assert stream.feed("b", {"n": 1}) == {"n": 1}
+  assert list(stream.flush()) == [("a", {"q": "xyz"})]
+  assert list(stream.flush()) == []
+  assert stream.pop("a") == {"q": "xyz"}
+
+
+def test_stream_caps_the_bytes_sent_per_call(monkeypatch):
+  now = 0.0
+  monkeypatch.setattr(tool_args_module.time, "monotonic", lambda: now)
+  stream = ToolArgsStream(ToolArgsStreaming(interval=1, rate=10))
+  assert stream.feed("a", '{"q": "0123456789') == {"q": "0123456789"}
+
+  # 17 characters at 10 bytes a second hold the next update back for 1.7s
+  now = 1.6
+  assert stream.feed("a", "0") is None
+  now = 1.7
+  assert stream.feed("a", "0") == {"q": "012345678900"}
+
+
+def test_stream_skips_calls():
+  stream = ToolArgsStream(ToolArgsStreaming(interval=0))
+  stream.skip("out")
+  assert stream.feed("out", '{"code": "x"') is None
+  assert list(stream.flush()) == []
+  assert stream.pop("out") is None
+
+
+def tool_call_agent(args: str, size: int):
+  async def stream(messages: list[pa.ModelMessage], info: AgentInfo):
+    if isinstance(messages[-1].parts[-1], pa.ToolReturnPart):
+      yield "ignored"
+      yield "done"
+      return
+
+    yield {0: DeltaToolCall(name="search", tool_call_id="call")}
+    for chunk in chunks(args, size):
+      yield {0: DeltaToolCall(json_args=chunk)}
+
+  agent = Agent(FunctionModel(stream_function=stream))
+
+  @agent.tool_plain
+  def search(query: str, limit: int) -> str:
+    return "found"
+
+  return agent
+
+
+def events(frames):
+  parts = [json.loads(f.removeprefix("data: ")) for f in frames]
+  return [p["data"] for p in parts if p["type"] == "data-event"]
+
+
+@pytest.mark.asyncio
+async def test_stream_results_streams_tool_arguments():
+  args = json.dumps({"query": "weather in paris", "limit": 3})
+  frames = [
+    f
+    async for f in stream_results(
+      UI,
+      tool_call_agent(args, 8),
+      None,
+      message_history=[],
+      tool_args=ToolArgsStreaming(interval=0, rate=10**9),
+    )
+  ]
+
+  full = {"query": "weather in paris", "limit": 3}
+  updates = [e.get("data") for e in events(frames) if e["status"] == "pending"]
+  # the query is shown while it's generated, in 8 character chunks
+  assert updates[1:4] == [
+    {"query": "weath"},
+    {"query": "weather in pa"},
+    {"query": "weather in paris"},
+  ]
+  # the call's own pending event and its result keep the arguments
+  assert updates[-2:] == [full, full]
+  assert events(frames)[-1] == {
+    "title": "Called `search` successfully",
+    "status": "success",
+    "data": full,
+  }
+
+
+@pytest.mark.asyncio
+async def test_tool_arguments_are_throttled_and_off_by_default():
+  args = json.dumps({"query": "weather in paris", "limit": 3})
+
+  async def run(**options):
+    agent = tool_call_agent(args, 2)
+    return events(
+      [f async for f in stream_results(UI, agent, None, message_history=[], **options)]
+    )
+
+  default = await run()
+  assert all("data" not in e for e in default)
+
+  throttled = await run(tool_args=ToolArgsStreaming(interval=60))
+  # the first arguments, then what was held back once the model is done
+  pending = [e.get("data") for e in throttled if e["status"] == "pending"]
+  full = {"query": "weather in paris", "limit": 3}
+  assert pending == [None, {"query": "w"}, full, full]
+
+
+@pytest.mark.asyncio
+async def test_output_tool_arguments_are_left_out():
+  code = {"file_name": "a.py", "code": "x = 1\n" * 50, "language": "python"}
+
+  async def stream(messages, info: AgentInfo):
+    tool = info.output_tools[0]
+    yield {0: DeltaToolCall(name=tool.name, tool_call_id="out")}
+    for chunk in chunks(json.dumps(code), 20):
+      yield {0: DeltaToolCall(json_args=chunk)}
+
+  agent = Agent(FunctionModel(stream_function=stream), output_type=CodeArtifactData)
+  frames = [
+    f
+    async for f in stream_results(
+      UI, agent, None, message_history=[], tool_args=ToolArgsStreaming(interval=0)
+    )
+  ]
+  assert events(frames)
+  assert all("data" not in e for e in events(frames))
@@ -1,7 +1,7 @@
 import pytest
 
 from pydantic_ai_chat_ui.messages.full import DataPartState
-from pydantic_ai_chat_ui.tools import get_tool_message
+from pydantic_ai_chat_ui.tools import ToolMessageTable, get_tool_message
 
 
 def test_get_tool_message_default_pending():
@@ -50,3 +50,32 @@ def test_get_tool_message_missing_tool_uses_default():
     get_tool_message("missing", DataPartState.PENDING, tool_messages)
     == "Calling `missing`"
   )
+
+
+def test_tool_message_table_matches_get_tool_message():
+  tool_messages = {
+    "search": "Running search",
+    "tool": {DataPartState.PENDING: "Starting"},
+  }
+  table = ToolMessageTable(tool_messages)
+
+  for tool_name in ("search", "tool", "unknown"):
+    for state in DataPartState:
+      assert table.get(tool_name, state) == get_tool_message(
+        tool_name, state, tool_messages
+      )
+      assert get_tool_message(tool_name, state, table) == table.get(tool_name, state)
+
+
+def test_tool_message_table_memoizes_unknown_tools():
+  table = ToolMessageTable()
+  first = table.get("x", DataPartState.PENDING)
+  assert first == "Calling `x`"
+  assert table.get("x", DataPartState.PENDING) is first
+  # names the model makes up don't grow the table
+  assert len(table._messages) == 0
+
+
+def test_tool_message_table_rejects_invalid_override_eagerly():
+  with pytest.raises(NotImplementedError):
+    ToolMessageTable({"x": 123})